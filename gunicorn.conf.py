@@ -0,0 +1,21 @@
+"""
+Gunicorn settings, loaded automatically from the working directory (`gunicorn index:app`).
+"""
+import os
+
+# the workers write their metrics samples here, /metrics aggregates them (see METRICS_MULTIPROC_DIR)
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', '/tmp/bvu_envoy_metrics')
+
+# no preload_app: every worker creates the app after the fork, its warm-up (WARMUP) opens its own DB connections
+preload_app = False
+
+
+def on_starting(server):
+    # the samples of the previous run would be added to the new ones
+    from src.base.helpers.metrics import clear_multiprocess_dir
+    clear_multiprocess_dir(os.environ['PROMETHEUS_MULTIPROC_DIR'])
+
+
+def child_exit(server, worker):
+    from src.base.helpers.metrics import mark_process_dead
+    mark_process_dead(worker.pid, os.environ['PROMETHEUS_MULTIPROC_DIR'])
@@ -0,0 +1,39 @@
+"""create EmailOutbox table
+
+Revision ID: 3c1f2a9d7e41
+Revises: b30e8b01a58f
+Create Date: 2026-10-18 09:12:04.118532
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c1f2a9d7e41'
+down_revision = 'b30e8b01a58f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('EmailOutbox',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('sender', sa.String(length=255), nullable=True),
+    sa.Column('recipients', sa.String(length=1000), nullable=False),
+    sa.Column('subject', sa.String(length=255), nullable=False),
+    sa.Column('html', sa.Text(), nullable=False),
+    sa.Column('status', sa.String(length=10), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('last_error', sa.String(length=1000), nullable=True),
+    sa.Column('created_time', sa.DateTime(), nullable=False),
+    sa.Column('next_attempt_time', sa.DateTime(), nullable=False),
+    sa.Column('sent_time', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_EmailOutbox_status_next_attempt_time', 'EmailOutbox', ['status', 'next_attempt_time'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_EmailOutbox_status_next_attempt_time', table_name='EmailOutbox')
+    op.drop_table('EmailOutbox')
@@ -0,0 +1,55 @@
+"""create UserSearch full-text index
+
+Revision ID: 5e2a7c9b1f36
+Revises: 8d4b6e0f2c17
+Create Date: 2026-10-18 13:05:48.201764
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5e2a7c9b1f36'
+down_revision = '8d4b6e0f2c17'
+branch_labels = None
+depends_on = None
+
+NAME_SQL = "replace(replace(coalesce({row}.last_name, '') || ' ' || coalesce({row}.first_name, ''), 'đ', 'd'), 'Đ', 'D')"
+
+
+def upgrade():
+    # FTS5 is SQLite only, the other databases use the LIKE search backend
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+
+    op.execute("""CREATE VIRTUAL TABLE "UserSearch" USING fts5(name, email, phone_number, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')""")
+    op.execute("""INSERT INTO "UserSearch" ("UserSearch", rank) VALUES ('rank', 'bm25(10.0, 2.0, 1.0)')""")
+
+    op.execute(f"""
+        CREATE TRIGGER "UserSearch_after_insert" AFTER INSERT ON "User" BEGIN
+            INSERT INTO "UserSearch" (rowid, name, email, phone_number)
+            VALUES (new.id, {NAME_SQL.format(row='new')}, new.email, new.phone_number);
+        END""")
+    op.execute(f"""
+        CREATE TRIGGER "UserSearch_after_update" AFTER UPDATE OF first_name, last_name, email, phone_number ON "User" BEGIN
+            UPDATE "UserSearch" SET name = {NAME_SQL.format(row='new')}, email = new.email, phone_number = new.phone_number
+            WHERE rowid = new.id;
+        END""")
+    op.execute("""
+        CREATE TRIGGER "UserSearch_after_delete" AFTER DELETE ON "User" BEGIN
+            DELETE FROM "UserSearch" WHERE rowid = old.id;
+        END""")
+
+    name_sql = NAME_SQL.format(row='"User"')
+    op.execute(f'INSERT INTO "UserSearch" (rowid, name, email, phone_number) SELECT id, {name_sql}, email, phone_number FROM "User"')
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+
+    op.execute('DROP TRIGGER IF EXISTS "UserSearch_after_delete"')
+    op.execute('DROP TRIGGER IF EXISTS "UserSearch_after_update"')
+    op.execute('DROP TRIGGER IF EXISTS "UserSearch_after_insert"')
+    op.execute('DROP TABLE IF EXISTS "UserSearch"')
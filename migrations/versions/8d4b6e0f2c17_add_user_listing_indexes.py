@@ -0,0 +1,31 @@
+"""add User listing indexes
+
+Revision ID: 8d4b6e0f2c17
+Revises: 3c1f2a9d7e41
+Create Date: 2026-10-18 10:41:27.530914
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d4b6e0f2c17'
+down_revision = '3c1f2a9d7e41'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # user.list: activated = 1 ORDER BY role_id, verified_time DESC, id
+    op.create_index('ix_User_listing_active', 'User', ['activated', 'role_id', sa.text('verified_time DESC'), 'id'], unique=False)
+    # user.disabled: activated = 0 AND verified_time IS NOT NULL ORDER BY created_time DESC, id
+    op.create_index('ix_User_listing_disabled', 'User', ['activated', sa.text('created_time DESC'), 'id'], unique=False)
+    # user.accounts_waiting: activated = 0 AND role_id = 3 AND verified_time IS NULL ORDER BY created_time DESC, id
+    op.create_index('ix_User_listing_waiting', 'User', ['activated', 'role_id', 'verified_time', sa.text('created_time DESC'), 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_User_listing_waiting', table_name='User')
+    op.drop_index('ix_User_listing_disabled', table_name='User')
+    op.drop_index('ix_User_listing_active', table_name='User')
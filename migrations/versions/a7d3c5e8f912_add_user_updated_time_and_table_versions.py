@@ -0,0 +1,36 @@
+"""add User.updated_time and TableVersion table
+
+Revision ID: a7d3c5e8f912
+Revises: 5e2a7c9b1f36
+Create Date: 2026-10-18 15:22:09.846302
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7d3c5e8f912'
+down_revision = '5e2a7c9b1f36'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('User', sa.Column('updated_time', sa.DateTime(), nullable=True))
+    table_version = op.create_table('TableVersion',
+    sa.Column('name', sa.String(length=64), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.Column('updated_time', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+    # the versioned tables get their row here, the bumps are plain UPDATEs
+    op.bulk_insert(table_version, [{'name': 'User', 'version': 0, 'updated_time': datetime.now()}])
+
+
+def downgrade():
+    op.drop_table('TableVersion')
+    with op.batch_alter_table('User', schema=None) as batch_op:
+        batch_op.drop_column('updated_time')
@@ -0,0 +1,36 @@
+"""create EmailTemplates table
+
+Revision ID: c4e9a1d2b7f3
+Revises: a7d3c5e8f912
+Create Date: 2026-10-18 17:41:26.503918
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4e9a1d2b7f3'
+down_revision = 'a7d3c5e8f912'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # the default templates are inserted by `flask seed`
+    op.create_table('EmailTemplates',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=50), nullable=False),
+    sa.Column('subject', sa.String(length=255), nullable=False),
+    sa.Column('content', sa.String(length=5000), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.Column('updated_time', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('content')
+    )
+    op.create_index(op.f('ix_EmailTemplates_name'), 'EmailTemplates', ['name'], unique=True)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_EmailTemplates_name'), table_name='EmailTemplates')
+    op.drop_table('EmailTemplates')
@@ -2,13 +2,12 @@ from flask import Flask
 import os
 from flask_limiter import Limiter
 from flask_sqlalchemy import SQLAlchemy
-from flask_principal import Principal, Identity, AnonymousIdentity, identity_loaded, UserNeed, RoleNeed
-from flask_mail import Mail
 
 
 class App(Flask):
     def __init__(self):
-        super(App, self).__init__(import_name=__name__)
+        # the shared fonts/icons live in src/base/static
+        super(App, self).__init__(import_name=__name__, static_folder='base/static')
 
 
     def load_environment_variables(self):
@@ -17,7 +16,6 @@ class App(Flask):
         """
         from dotenv import load_dotenv
         load_dotenv()  # take environment variables from .env file.
-        print('/n', os.environ)
 
         # USING DEFAULT CONFIG
         from .config import DefaultEnvironment
@@ -28,7 +26,19 @@ class App(Flask):
         assert environment_configuration is not None, "Please provide the CONFIG_FILE env"
         self.config.from_object(environment_configuration)
 
-        print('\n', self.config, '\n\n')
+        if self.config['BOOT_VERBOSE']:
+            print('\n', os.environ)
+            print('\n', self.config, '\n\n')
+
+
+    def resolve_boot_steps(self):
+        """
+        Defaulting the unset BOOT_CREATE_SCHEMA/BOOT_SEED to the boot profile: skipped on fast start.
+        Called after the create_app overrides, so create_app({'FAST_START': True}) skips them too.
+        """
+        for name in ('BOOT_CREATE_SCHEMA', 'BOOT_SEED'):
+            if self.config.get(name) is None:
+                self.config[name] = not self.config['FAST_START']
 
 
     def register_logger(self):
@@ -56,16 +66,172 @@ class App(Flask):
                 self.logger.addHandler(mail_handler)
 
 
+    def register_password_hashing(self):
+        """
+        Configuring the bcrypt work factor and the hashing thread pool.
+        """
+        from .base.helpers import passwords
+        passwords.configure(log_rounds=self.config['BCRYPT_LOG_ROUNDS'], workers=self.config['PASSWORD_HASH_WORKERS'])
+
+
+    def register_metrics(self):
+        """
+        Recording the requests latency, SQL statements, bcrypt/SMTP/template timings and rate limit rejections,
+        exposed in the Prometheus text format at /metrics (METRICS_MULTIPROC_DIR aggregates the gunicorn workers)
+        to METRICS_ALLOWED_NETWORKS and the scrapers sending METRICS_TOKEN.
+        """
+        if not self.config['METRICS_ENABLED']:
+            return
+
+        from time import perf_counter
+        from flask import Response, abort, g, request, before_render_template, template_rendered
+        from .base.helpers import metrics
+
+        metrics.configure(multiprocess_dir=self.config['METRICS_MULTIPROC_DIR'])
+        metrics.instrument_engines()
+        before_render_template.connect(metrics.before_render_template, self)
+        template_rendered.connect(metrics.template_rendered, self)
+
+        @self.before_request
+        def start_request_metrics():
+            g.metrics_started = perf_counter()
+            g.metrics_sql_statements = 0
+            g.metrics_sql_seconds = 0.0
+
+        @self.after_request
+        def record_request_metrics(response):
+            started = g.pop('metrics_started', None)
+            if started is None or request.endpoint == 'metrics':
+                return response
+
+            labels = {'blueprint': request.blueprint or '', 'endpoint': request.endpoint or 'unmatched'}
+            metrics.observe('request_seconds', perf_counter() - started, method=request.method, **labels)
+            metrics.increment('requests', method=request.method, status=str(response.status_code), **labels)
+            metrics.observe('sql_statements', g.metrics_sql_statements, **labels)
+            metrics.observe('sql_seconds', g.metrics_sql_seconds, **labels)
+
+            # 429 is only answered by the limiter
+            if response.status_code == 429:
+                metrics.increment('ratelimit_rejections', **labels)
+            return response
+
+        def metrics_view():
+            # answering as if there was nothing here to the others
+            if not metrics.is_scrape_allowed(
+                request.remote_addr, request.headers.get('Authorization'),
+                token=self.config['METRICS_TOKEN'], allowed_networks=self.config['METRICS_ALLOWED_NETWORKS'],
+            ):
+                abort(404)
+
+            output, content_type = metrics.render()
+            return Response(output, content_type=content_type)
+        self.add_url_rule('/metrics', 'metrics', metrics_view)
+
+
+    def register_compression(self):
+        """
+        Compressing the rendered responses (html, json...) in gzip/brotli, for the deployments without a compressing proxy.
+        The saved bytes and the CPU time are recorded in the metrics. The responses open to BREACH are not compressed.
+        """
+        if not self.config['COMPRESSION_ENABLED']:
+            return
+
+        from flask import request
+        from .base.helpers import metrics
+        from .base.helpers.compression import ResponseCompressor, may_leak_secrets
+
+        compressor = ResponseCompressor(
+            min_size=self.config['COMPRESSION_MIN_SIZE'],
+            level=self.config['COMPRESSION_LEVEL'],
+            brotli_quality=self.config['COMPRESSION_BROTLI_QUALITY'],
+        )
+
+        # registered after the metrics hook -> runs before it, the compression time counts in the request latency
+        @self.after_request
+        def compress_response(response):
+            if may_leak_secrets(self.config.get('WTF_CSRF_FIELD_NAME', 'csrf_token')):
+                return response
+
+            compressed = compressor.compress(response, request.accept_encodings)
+            if compressed is not None:
+                encoding, saved_bytes, cpu_seconds = compressed
+                labels = {'blueprint': request.blueprint or '', 'endpoint': request.endpoint or 'unmatched', 'encoding': encoding}
+                metrics.increment('compressed_responses', **labels)
+                metrics.increment('compression_saved_bytes', saved_bytes, **labels)
+                metrics.observe('compression_cpu_seconds', cpu_seconds, encoding=encoding)
+            return response
+
+
+    def register_sql_debug(self):
+        """
+        Detecting the N+1 patterns and the slow statements of every request (development/tests, SQL_DEBUG).
+        """
+        if not self.config['SQL_DEBUG']:
+            return
+
+        from flask import g, request
+        from .base.helpers import sql_debug
+        sql_debug.instrument_engines()
+
+        @self.before_request
+        def start_sql_debug():
+            g.sql_debug_queries = sql_debug.RequestQueries(
+                repeated_threshold=self.config['SQL_DEBUG_REPEATED_THRESHOLD'],
+                slow_ms=self.config['SQL_DEBUG_SLOW_MS'],
+            )
+
+        @self.after_request
+        def report_sql_debug(response):
+            queries = g.pop('sql_debug_queries', None)
+            if queries is not None:
+                sql_debug.report_repeated(queries, request.endpoint, raise_error=self.config['SQL_DEBUG_RAISE'])
+            return response
+
+
     def register_global_functions(self):
         """
         Registering jinja global functions (allow calling from any jinja templates)
         """
-        from .base.helpers.jinja_env_functions import extract_avatar_url, get_svg_content, server_name
+        from .base.helpers.jinja_env_functions import extract_avatar_url, get_svg_content, get_svg_sprite, server_name, preload_svg_icons
+
+        # caching the icons up front, so rendering does not read the disk
+        if self.config['SVG_ICONS_PRELOAD']:
+            preload_svg_icons(sprite_mode=self.config['SVG_SPRITE_MODE'])
+
         self.jinja_env.globals.update(extract_avatar_url=extract_avatar_url)
         self.jinja_env.globals.update(get_svg_content=get_svg_content)
+        self.jinja_env.globals.update(get_svg_sprite=get_svg_sprite)
         self.jinja_env.globals.update(server_name=server_name)
 
 
+    def register_template_cache(self):
+        """
+        Storing the compiled templates in a Jinja bytecode cache on disk (JINJA_BYTECODE_CACHE_DIR),
+        the workers after the first one load them instead of compiling.
+        """
+        if not self.config['JINJA_BYTECODE_CACHE_DIR']:
+            return
+
+        from .base.helpers.warmup import AtomicBytecodeCache
+        self.jinja_env.bytecode_cache = AtomicBytecodeCache(self.config['JINJA_BYTECODE_CACHE_DIR'])
+
+
+    def register_fragment_cache(self):
+        """
+        Enabling the {% cache key %}...{% endcache %} tag: the rendered fragments are kept in an in-process LRU,
+        and shared by the workers in FRAGMENT_CACHE_DIR if set.
+        """
+        from .base.helpers.fragment_cache import FragmentCache, FragmentCacheExtension
+
+        self.jinja_env.add_extension(FragmentCacheExtension)
+        if self.config['FRAGMENT_CACHE_ENABLED']:
+            self.jinja_env.fragment_cache = FragmentCache(
+                maxsize=self.config['FRAGMENT_CACHE_SIZE'],
+                ttl=self.config['FRAGMENT_CACHE_TTL'],
+                directory=self.config['FRAGMENT_CACHE_DIR'],
+            )
+
+
     def register_blueprints(self):
         """
         Registering the app's blueprints.
@@ -77,6 +243,65 @@ class App(Flask):
         self.register_blueprint(user, url_prefix="/users")
 
 
+    def register_static_assets(self):
+        """
+        Content-hashing the static files of the app and the blueprints at boot:
+        url_for('static'/'<blueprint>.static', filename=...) returns the hashed url, served with a 1 year immutable cache.
+        The precompressed .br/.gz siblings (`flask assets compress`) are served to the browsers accepting them.
+        """
+        if not self.config['STATIC_FINGERPRINT'] and not self.config['STATIC_PRECOMPRESSED']:
+            return
+
+        from flask import g
+        from .base.helpers.static_assets import StaticManifest, make_static_view
+
+        folders = {'static': self.static_folder}
+        folders.update({f'{name}.static': blueprint.static_folder for name, blueprint in self.blueprints.items() if blueprint.has_static_folder})
+        manifest = self.static_manifest = StaticManifest.build(folders)
+
+        if self.config['STATIC_PRECOMPRESSED']:
+            for endpoint, folder in folders.items():
+                if endpoint in self.view_functions and folder:
+                    self.view_functions[endpoint] = make_static_view(self, manifest, endpoint, folder)
+
+        if not self.config['STATIC_FINGERPRINT']:
+            return
+        cache_control = f"public, max-age={self.config['STATIC_FINGERPRINT_MAX_AGE']}, immutable"
+
+        @self.url_defaults
+        def fingerprint_static_url(endpoint, values):
+            hashed_filename = manifest.hashed_filename(endpoint, values.get('filename'))
+            if hashed_filename is not None:
+                values['filename'] = hashed_filename
+
+        @self.url_value_preprocessor
+        def resolve_fingerprinted_file(endpoint, values):
+            filename = manifest.original_filename(endpoint, values.get('filename')) if values else None
+            if filename is not None:
+                values['filename'] = filename
+                g.fingerprinted_static = True
+
+        @self.after_request
+        def cache_fingerprinted_file(response):
+            if g.pop('fingerprinted_static', False) and response.status_code in (200, 206, 304):
+                response.headers['Cache-Control'] = cache_control
+            return response
+
+
+    def register_commands(self):
+        """
+        Registering the app's `flask` CLI commands.
+        """
+        from .modules.email.email_commands import email_cli
+        from .modules.auth.auth_commands import auth_cli
+        from .base.assets_commands import assets_cli
+        from .seeding import seed_command
+        self.cli.add_command(email_cli)
+        self.cli.add_command(auth_cli)
+        self.cli.add_command(assets_cli)
+        self.cli.add_command(seed_command)
+
+
     def register_cors(self):
         """Adding CORS origins (all) for client ajax calling."""
         from flask_cors import CORS
@@ -95,6 +320,15 @@ class App(Flask):
         self.register_error_handler(500, ErrorHandler.server_error)
 
 
+    def register_session_store(self):
+        """
+        Opening the server-side session store (SESSION_STORE_URI): the pending registrations are kept there,
+        the cookie only carries their opaque id.
+        """
+        from .base.helpers.session_store import open_session_store
+        self.session_store = open_session_store(self.config['SESSION_STORE_URI'])
+
+
     def register_login_manager(self):
         """Adding login manager for the application."""
         from flask_login import LoginManager
@@ -105,35 +339,62 @@ class App(Flask):
 
         """This sets the callback for reloading a user from the session.
         The function you set should take a user ID (a unicode) and return a user object, or None if the user does not exist."""
+        from .modules.user.user_cache import UserCache, RoleCache, authenticated_users, principal_identities
+        authenticated_users.configure(maxsize=self.config['USER_CACHE_MAXSIZE'], ttl=self.config['USER_CACHE_TTL'])
+        principal_identities.configure(maxsize=self.config['USER_CACHE_MAXSIZE'], ttl=self.config['USER_CACHE_TTL'])
+        RoleCache.configure(ttl=self.config['ROLE_CACHE_TTL'])
+        UserCache.configure(check_interval=self.config['USER_CACHE_CHECK_INTERVAL'])
+
         @login_manager.user_loader
         def load_user(id):
-            from .modules.user.user_model import User, db
-            return db.session.query(User).filter(User.alternative_id == id).first()
+            return UserCache.load(id)
 
 
     ### INIT FUNCTIONS ###
-    def init_mail(self, mail: Mail):
-        mail.init_app(self)
-        self.mail = mail
+    def init_mail(self):
+        """
+        Initializing flask_mail, deferred to the first get_mail() call on fast start.
+        """
+        from .modules.setting.setting_cache import EmailTemplateCache
+        EmailTemplateCache.configure(check_interval=self.config['EMAIL_TEMPLATE_CHECK_INTERVAL'])
+
+        if not self.config['FAST_START']:
+            self.get_mail()
+
+
+    def get_mail(self):
+        if 'mail' not in self.extensions:
+            from . import mail
+            mail.init_app(self)
+            self.mail = mail
+        return self.mail
 
 
     def init_db(self, db: SQLAlchemy):
         """
         Initializing DB connnection.
-        Migrating models to DB schema/tables.
-        Seeding initial data.
+        Migrating models to DB schemas/tables (development only, unless BOOT_CREATE_SCHEMA is disabled).
         """
         db.init_app(app=self)
         self.db = db
 
+        # models that are not reachable from the blueprints
+        from .modules.email.email_model import EmailOutbox
+        from .modules.setting.setting_model import TableVersion, EmailTemplates
+
         # MIGRATING MODELS TO DB SCHEMAS
-        if self.config["FLASK_ENV"] == "development":
+        if self.config["FLASK_ENV"] == "development" and self.config['BOOT_CREATE_SCHEMA']:
             from flask_migrate import Migrate
             print("\n\n[MIGRATING THE DATABASE...]")
             migrate = Migrate()
             with self.app_context():
                 db.create_all()
 
+                # the search index of the databases created before it (new ones get it from create_all)
+                from .modules.user.user_search import install_user_search
+                with db.engine.begin() as connection:
+                    install_user_search(None, connection)
+
                 # allow dropping column for sqlite
                 if db.engine.url.drivername == 'sqlite':
                     migrate.init_app(self, db, render_as_batch=True)
@@ -144,10 +405,54 @@ class App(Flask):
             # ...
     
 
-    def init_protections(self, limiter: Limiter, principals: Principal):
+    def warm_up_templates(self):
+        """
+        Compiling all the templates of the app and the blueprints before the first request.
+        """
+        from .base.helpers.warmup import compile_templates
+
+        for name, error in compile_templates(self.jinja_env):
+            self.logger.warning(f'Warm-up: template {name} does not compile: {error}')
+
+
+    def warm_up_db_connections(self):
+        """
+        Opening the pooled DB connections (WARMUP_DB_CONNECTIONS) before the first request.
+        A DB that is down does not stop the boot, the requests report it.
+        """
+        from sqlalchemy.exc import SQLAlchemyError
+        from .base.helpers.warmup import open_db_connections
+
+        try:
+            with self.app_context():
+                open_db_connections(self.db.engine, self.config['WARMUP_DB_CONNECTIONS'])
+        except SQLAlchemyError as e:
+            self.logger.warning(f'Warm-up: no DB connection: {e}')
+
+
+    def warm_up_caches(self):
+        """
+        Filling the per-process caches read by every request: role table, release token of the ETags.
+        The SVG icons are preloaded by register_global_functions.
+        """
+        from sqlalchemy.exc import SQLAlchemyError
+        from .base.helpers.conditional import release_token
+        from .modules.user.user_cache import RoleCache
+
+        with self.app_context():
+            release_token()
+            try:
+                RoleCache.load()
+            except SQLAlchemyError as e:
+                self.logger.warning(f'Warm-up: roles not cached: {e}')
+
+
+    def init_protections(self, limiter: Limiter, principals):
         """
         Initializing application's protection/security extensions.
         """
+        # registering the shared rate limit storages (RATELIMIT_STORAGE_URI)
+        from .base.helpers import ratelimit_storage
         limiter.init_app(self)
         self.limiter = limiter
 
@@ -157,12 +462,16 @@ class App(Flask):
 
 
     def init_principal_user_provider(self):
+        from flask_principal import Identity, AnonymousIdentity, identity_loaded, UserNeed, RoleNeed
+        from .modules.user.user_cache import IdentityCache, RoleCache
+
         @self.principals.identity_loader
         def read_identity_from_flask_login():
             from flask_login import current_user
 
             if current_user.is_authenticated and current_user.activated:
-                return Identity(current_user.id)
+                # the needs already computed for this user, role and state: no identity_loaded handlers
+                return IdentityCache.get(current_user) or Identity(current_user.id)
 
             # user not logged in
             return AnonymousIdentity()
@@ -171,6 +480,10 @@ class App(Flask):
         def on_identity_loaded(sender, identity):
             from flask_login import current_user
 
+            # the cached identities already provide their needs
+            if getattr(identity, 'cached', False):
+                return
+
             # ensure the logged-in user is activated
             if hasattr(current_user, 'activated') and current_user.activated:
                 # Set the identity user object
@@ -180,12 +493,17 @@ class App(Flask):
                 if hasattr(current_user, 'id'):
                     identity.provides.add(UserNeed(current_user.id))
 
-                # Add the RoleNeed to the identity
-                if hasattr(current_user, 'role'):
-                    identity.provides.add(RoleNeed(current_user.role.code))
+                # Add the RoleNeed to the identity (from the in-memory role table), no role need for an unknown role
+                role = RoleCache.get(current_user.role_id) if hasattr(current_user, 'role_id') else None
+                if role is not None:
+                    identity.provides.add(RoleNeed(role.code))
+                    IdentityCache.set(current_user, identity)
 
     def start_seeding(self):
-        """Start seeding initial data"""
+        """Start seeding initial data (skipped on fast start, see `flask seed`)"""
+        if not self.config['BOOT_SEED']:
+            return
+
         with self.app_context():
             from .seeding import start_seeding
             start_seeding(self.db)
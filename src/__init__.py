@@ -2,11 +2,15 @@
 Entrypoint of the application.
 """
 
-from .App import App
+from .base.helpers.boot import BootReport
+import_report = BootReport() # import-time breakdown, reported by create_app
 
-from flask_mail import Mail
-from flask_limiter.util import get_remote_address
-from flask_limiter import Limiter
+with import_report.phase('import App'):
+    from .App import App
+
+with import_report.phase('import flask_limiter'):
+    from flask_limiter.util import get_remote_address
+    from flask_limiter import Limiter
 
 
 # INIT LOGGER
@@ -14,44 +18,94 @@ import logging as logger
 logger.basicConfig(format='%(asctime)s - %(message)s', level=logger.INFO,)
 
 # INIT DATABASE
-print("\n[DEFINING DATABASE INSTANCE...]")
-from .db import *
+with import_report.phase('import flask_sqlalchemy'):
+    from .db import *
 
 # INIT PRINCIPALS
-from .permissions import *
+with import_report.phase('import flask_principal'):
+    from .permissions import *
 
 # INIT RATE LIMITING
-print("\n[DEFINING RATE LIMITING INSTANCE...]")
 limiter = Limiter(key_func=get_remote_address)
 
-# INIT MAIL
-mail = Mail()
 
+def __getattr__(name: str):
+    """
+    Deferring the flask_mail import to the first use of `src.mail` (only the outbox worker sends emails).
+    """
+    if name == 'mail':
+        global mail
+        from flask_mail import Mail
+        mail = Mail()
+        return mail
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-def create_app():
+
+def create_app(config: dict = None):
     """
     Initializing the App and plug-in extensions.
     Return a runnable Flask application.
+    :config: overrides applied on top of the environment configuration (tests, benchmarks).
     """
-    print("\n[INITIALIZING THE APP...]")
     app = App()
+    report = app.boot_report = BootReport(import_report.phases)
 
     # loading environment variables
-    app.load_environment_variables()
+    with report.phase('load_environment_variables'):
+        app.load_environment_variables()
+        app.config.update(config or {})
+        app.resolve_boot_steps()
 
     # registering essential partials for the app
-    app.register_logger()
-    app.register_global_functions()
-    app.register_blueprints()
-    app.register_cors()
+    with report.phase('register_logger'):
+        app.register_logger()
+    with report.phase('register_password_hashing'):
+        app.register_password_hashing()
+    with report.phase('register_metrics'):
+        app.register_metrics()
+    with report.phase('register_compression'):
+        app.register_compression()
+    with report.phase('register_sql_debug'):
+        app.register_sql_debug()
+    with report.phase('register_global_functions'):
+        app.register_global_functions()
+    with report.phase('register_template_cache'):
+        app.register_template_cache()
+    with report.phase('register_fragment_cache'):
+        app.register_fragment_cache()
+    with report.phase('register_blueprints'):
+        app.register_blueprints()
+    with report.phase('register_static_assets'):
+        app.register_static_assets()
+    with report.phase('register_commands'):
+        app.register_commands()
+    with report.phase('register_cors'):
+        app.register_cors()
     # app.register_error_handlers()
-    app.register_login_manager()
+    with report.phase('register_session_store'):
+        app.register_session_store()
+    with report.phase('register_login_manager'):
+        app.register_login_manager()
+
+    with report.phase('init_db'):
+        app.init_db(db=db)
+    with report.phase('start_seeding'):
+        app.start_seeding()
 
-    app.init_db(db=db)
-    app.start_seeding()
+    with report.phase('init_protections'):
+        app.init_protections(limiter=limiter, principals=principals)
+    with report.phase('init_mail'):
+        app.init_mail()
 
-    app.init_protections(limiter=limiter, principals=principals)
-    app.init_mail(mail=mail)
+    # compiling/connecting/caching before the first request instead of during it
+    if app.config['WARMUP']:
+        with report.phase('warm_up_templates'):
+            app.warm_up_templates()
+        with report.phase('warm_up_db_connections'):
+            app.warm_up_db_connections()
+        with report.phase('warm_up_caches'):
+            app.warm_up_caches()
 
-    print('\n\n[NEW APP RETURNED...]')
+    if app.config['BOOT_REPORT']:
+        logger.info(f"App booted in {report.total_ms:.1f}ms ({'fast start' if app.config['FAST_START'] else 'full start'}):\n{report.format()}")
     return app
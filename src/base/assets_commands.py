@@ -0,0 +1,32 @@
+import click
+from flask import current_app
+from flask.cli import AppGroup, with_appcontext
+
+from src.base.helpers.static_assets import load_brotli, precompress_folder
+
+# defining the `flask assets ...` commands
+assets_cli = AppGroup('assets', help='Static files commands.')
+
+
+@assets_cli.command('compress')
+@click.option('--min-size', type=int, default=512, help='Smallest file (bytes) worth compressing.')
+@with_appcontext
+def compress(min_size):
+    """Writing the .gz/.br siblings of the static files, run at every deploy (the stale siblings are ignored)."""
+    if load_brotli() is None:
+        click.echo('brotli is not installed, writing the .gz siblings only (pip install brotli).')
+
+    folders = [current_app.static_folder]
+    folders += [blueprint.static_folder for blueprint in current_app.blueprints.values() if blueprint.has_static_folder]
+
+    totals = {} # encoding -> [original bytes, compressed bytes]
+    for folder in folders:
+        for path, encoding, original_size, compressed_size in precompress_folder(folder, min_size):
+            click.echo(f'{encoding:>4} {compressed_size:>9} / {original_size:<9} {path}')
+            total = totals.setdefault(encoding, [0, 0])
+            total[0], total[1] = total[0] + original_size, total[1] + compressed_size
+
+    click.echo('')
+    for encoding, (original_bytes, compressed_bytes) in totals.items():
+        click.echo(f'{encoding}: {compressed_bytes} / {original_bytes} bytes')
+    click.echo('Restart the workers to serve the new siblings.')
@@ -0,0 +1,28 @@
+import time
+from contextlib import contextmanager
+
+
+class BootReport:
+    """
+    Recording how long each import/boot phase of a process took.
+    """
+
+    def __init__(self, phases: list = None):
+        self.phases = list(phases or [])
+
+    @contextmanager
+    def phase(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, (time.perf_counter() - started) * 1000))
+
+    @property
+    def total_ms(self) -> float:
+        return sum(elapsed_ms for _, elapsed_ms in self.phases)
+
+    def format(self) -> str:
+        lines = [f'  {name:<32} {elapsed_ms:8.1f}ms' for name, elapsed_ms in self.phases]
+        lines.append(f'  {"total":<32} {self.total_ms:8.1f}ms')
+        return '\n'.join(lines)
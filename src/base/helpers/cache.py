@@ -0,0 +1,87 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """
+    A thread-safe, in-process LRU cache whose entries expire after `ttl` seconds.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None, validate=None):
+        """
+        Returning the entry, or :default if it is missing, expired, or rejected by :validate(value) (then deleted).
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic() or (validate is not None and not validate(entry[1])):
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return default
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def configure(self, maxsize: int = None, ttl: float = None):
+        with self._lock:
+            self.maxsize = maxsize if maxsize is not None else self.maxsize
+            self.ttl = ttl if ttl is not None else self.ttl
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self._entries)}
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def invalidate_on_commit(model, invalidate):
+    """
+    Calling :invalidate() after every commit that inserted, updated or deleted :model rows through the ORM
+    (the changes are flagged on the session, forgotten on rollback).
+    """
+    from sqlalchemy import event
+    from sqlalchemy.orm import Session, object_session
+
+    flag = f'{model.__name__}_changed'
+
+    def flag_changed(mapper, connection, target):
+        object_session(target).info[flag] = True
+
+    def invalidate_changed(session):
+        if session.info.pop(flag, False):
+            invalidate()
+
+    def forget_changed(session):
+        session.info.pop(flag, None)
+
+    for name in ('after_insert', 'after_update', 'after_delete'):
+        event.listen(model, name, flag_changed)
+    event.listen(Session, 'after_commit', invalidate_changed)
+    event.listen(Session, 'after_rollback', forget_changed)
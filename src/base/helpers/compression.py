@@ -0,0 +1,84 @@
+"""
+On-the-fly compression of the rendered responses (html, json...), for the deployments without a compressing proxy.
+"""
+import gzip
+import time
+
+from .static_assets import load_brotli, negotiate_encoding
+
+COMPRESSIBLE_MIMETYPES = (
+    'text/html', 'text/css', 'text/plain', 'text/xml', 'text/csv', 'text/javascript',
+    'application/json', 'application/javascript', 'application/xml', 'image/svg+xml',
+)
+# no body, or a body that is only a part of the representation
+UNCOMPRESSED_STATUSES = (204, 206, 304)
+
+
+class ResponseCompressor:
+    """
+    Compressing the responses in the encoding the client prefers, br (if installed) before gzip.
+    """
+
+    def __init__(self, min_size: int = 500, level: int = 6, brotli_quality: int = 4, mimetypes: tuple = COMPRESSIBLE_MIMETYPES):
+        self.min_size = min_size
+        self.mimetypes = mimetypes
+        self.compressors = {}
+
+        brotli = load_brotli()
+        if brotli is not None:
+            self.compressors['br'] = lambda data: brotli.compress(data, quality=brotli_quality)
+        self.compressors['gzip'] = lambda data: gzip.compress(data, compresslevel=level, mtime=0)
+        self.encodings = tuple(self.compressors)
+
+    def is_compressible(self, response) -> bool:
+        return (
+            response.mimetype in self.mimetypes
+            and 200 <= response.status_code and response.status_code not in UNCOMPRESSED_STATUSES
+            # send_file and generators: the body is not in memory
+            and not response.direct_passthrough and not response.is_streamed
+            and 'Content-Encoding' not in response.headers
+            and 'no-transform' not in response.headers.get('Cache-Control', '')
+        )
+
+    def compress(self, response, accept_encodings):
+        """
+        Compressing the response in place. Returning (encoding, bytes saved, cpu seconds), or None if it is sent as is.
+        """
+        if not self.is_compressible(response):
+            return None
+
+        # the same url is sent compressed or not depending on the client
+        response.vary.add('Accept-Encoding')
+        encoding = negotiate_encoding(accept_encodings, self.encodings)
+        data = response.get_data()
+        if encoding is None or len(data) < self.min_size:
+            return None
+
+        started = time.thread_time()
+        compressed = self.compressors[encoding](data)
+        cpu_seconds = time.thread_time() - started
+        if len(compressed) >= len(data):
+            return None
+
+        response.set_data(compressed)
+        response.headers['Content-Encoding'] = encoding
+        # a strong ETag identifies the exact bytes
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(f'{etag}-{encoding}')
+        return encoding, len(data) - len(compressed), cpu_seconds
+
+
+def may_leak_secrets(csrf_field_name: str = 'csrf_token') -> bool:
+    """
+    BREACH: the size of a compressed page tells whether a guess of a secret it holds matches text an attacker
+    got reflected next to it. So the responses to a request carrying input (query string, form: what a cross-site
+    request controls) are sent as is when they hold a secret: the session's CSRF token (a form's csrf_token field),
+    or the private data of a logged-in user. The pages without request input are compressed, forms included.
+    """
+    from flask import g, request
+    from flask_login import current_user
+
+    if not (request.args or request.form):
+        return False
+    return csrf_field_name in g or current_user.is_authenticated
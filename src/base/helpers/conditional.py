@@ -0,0 +1,76 @@
+"""
+Conditional GET: answering If-None-Match/If-Modified-Since with a 304 before a view queries or renders anything.
+"""
+import hashlib
+import os
+import time
+from datetime import datetime, timezone
+from functools import lru_cache
+
+from flask import Response, current_app, request, session
+
+
+@lru_cache(maxsize=1)
+def release_token() -> str:
+    """
+    Fingerprinting the deployed code and templates (paths, sizes, mtimes), so a release invalidates every ETag.
+    """
+    fingerprint = hashlib.sha1()
+    for directory, _, file_names in sorted(os.walk(current_app.root_path)):
+        for file_name in sorted(file_names):
+            if file_name.endswith(('.py', '.html')):
+                stat = os.stat(os.path.join(directory, file_name))
+                fingerprint.update(f'{directory}/{file_name}:{stat.st_size}:{stat.st_mtime_ns}'.encode())
+    return fingerprint.hexdigest()
+
+
+def make_etag(*validators) -> str:
+    """
+    Hashing everything the page depends on. The time bucket renews the pages every CONDITIONAL_GET_MAX_AGE
+    seconds, before the CSRF tokens they embed expire.
+    """
+    max_age = current_app.config['CONDITIONAL_GET_MAX_AGE']
+    validators = (release_token(), int(time.time() // max_age), *validators)
+    return hashlib.sha1(repr(validators).encode()).hexdigest()
+
+
+def to_http_date(value: datetime) -> datetime:
+    # the DB times are naive local times
+    return (value.astimezone() if value.tzinfo is None else value).astimezone(timezone.utc).replace(microsecond=0)
+
+
+def not_modified_response(etag: str, last_modified: datetime = None):
+    """
+    Returning a 304 response if the client's copy is still current, None if the view has to render.
+    """
+    if not current_app.config['CONDITIONAL_GET_ENABLED'] or request.method != 'GET':
+        return None
+
+    # the page would show the pending flash messages
+    if session.get('_flashes'):
+        return None
+
+    if request.if_none_match:
+        matched = request.if_none_match.contains_weak(etag)
+    elif last_modified is not None and request.if_modified_since is not None:
+        matched = to_http_date(last_modified) <= request.if_modified_since
+    else:
+        matched = False
+
+    if not matched:
+        return None
+    return add_validators(Response(status=304), etag, last_modified)
+
+
+def add_validators(response: Response, etag: str, last_modified: datetime = None) -> Response:
+    """
+    Adding the ETag/Last-Modified to the rendered page, the browser revalidates it on every visit.
+    """
+    if not current_app.config['CONDITIONAL_GET_ENABLED']:
+        return response
+
+    response.set_etag(etag, weak=True)
+    if last_modified is not None:
+        response.last_modified = to_http_date(last_modified)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
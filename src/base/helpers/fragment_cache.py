@@ -0,0 +1,167 @@
+"""
+Cache of rendered template fragments, keyed by what they show (view, page cursor, table version):
+
+    {% cache users_fragment_key %} ...rows... {% endcache %}
+
+A new table version makes new keys, the fragments of the old ones are evicted from the LRU / expire on disk.
+The fragments are shared by every viewer: no csrf_token() or current_user inside the block.
+"""
+import hashlib
+import os
+import tempfile
+import time
+
+from jinja2 import Undefined, nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+
+from .cache import TTLCache
+
+
+class DiskFragmentStore:
+    """
+    Fragments shared by the workers of a host, one file per key in :directory, expiring after `ttl` seconds.
+    """
+
+    PRUNE_EVERY = 100 # writes
+
+    def __init__(self, directory: str, ttl: float):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.ttl = ttl
+        self._writes = 0
+
+    def path(self, key) -> str:
+        return os.path.join(self.directory, hashlib.sha1(repr(key).encode()).hexdigest() + '.html')
+
+    def get(self, key):
+        path = self.path(key)
+        try:
+            if os.stat(path).st_mtime + self.ttl < time.time():
+                return None
+            with open(path, encoding='utf-8') as file:
+                return file.read()
+        except OSError:
+            return None
+
+    def set(self, key, html: str):
+        """
+        Writing the fragment aside and renaming it: the other workers never read a half-written fragment.
+        A failed write (disk full...) only leaves the fragment in the worker's memory, never a temporary file.
+        """
+        try:
+            file_descriptor, temporary_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        except OSError:
+            return
+
+        try:
+            with os.fdopen(file_descriptor, 'w', encoding='utf-8') as file:
+                file.write(html)
+            os.replace(temporary_path, self.path(key))
+        except BaseException as e:
+            try:
+                os.remove(temporary_path)
+            except OSError:
+                pass
+            if isinstance(e, OSError):
+                return
+            raise
+
+        self._writes += 1
+        if self._writes % self.PRUNE_EVERY == 0:
+            self.prune()
+
+    def prune(self):
+        expired = time.time() - self.ttl
+        for file_name in os.listdir(self.directory):
+            path = os.path.join(self.directory, file_name)
+            try:
+                if os.stat(path).st_mtime < expired:
+                    os.remove(path)
+            except OSError:
+                pass # removed by an other worker
+
+
+class FragmentCache:
+    """
+    Bounded in-process LRU of the rendered fragments, backed by the optional disk store.
+    """
+
+    def __init__(self, maxsize: int = 256, ttl: float = 3600, directory: str = None):
+        self.memory = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.disk = DiskFragmentStore(directory, ttl) if directory else None
+
+    def get_or_render(self, key, render) -> str:
+        html = self.memory.get(key)
+        if html is None and self.disk is not None:
+            html = self.disk.get(key)
+            if html is not None:
+                self.memory.set(key, html)
+
+        if html is None:
+            html = str(render())
+            self.memory.set(key, html)
+            if self.disk is not None:
+                self.disk.set(key, html)
+        return html
+
+    def clear(self):
+        self.memory.clear()
+
+
+class FragmentCacheExtension(Extension):
+    """
+    {% cache key, ... %}...{% endcache %}: rendering the block once per key, with the environment's fragment_cache.
+    Without a fragment_cache (disabled), or with an undefined/None key (a view not passing it), the block is rendered every time.
+    """
+
+    tags = {'cache'}
+
+    def __init__(self, environment):
+        super().__init__(environment)
+        environment.extend(fragment_cache=None)
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        key = [parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            key.append(parser.parse_expression())
+
+        body = parser.parse_statements(('name:endcache',), drop_needle=True)
+        return nodes.CallBlock(self.call_method('_render_cached', [nodes.List(key)]), [], [], body).set_lineno(lineno)
+
+    def _render_cached(self, key, caller):
+        fragment_cache = self.environment.fragment_cache
+        if fragment_cache is None or key[0] is None or isinstance(key[0], Undefined):
+            return caller()
+        # the block was rendered (and escaped) by the template itself
+        return Markup(fragment_cache.get_or_render(tuple(key), caller))
+
+
+class DeferredValue:
+    """
+    A view's result computed on first use, so a template serving it from the fragment cache skips the query.
+    """
+
+    def __init__(self, compute):
+        self._compute = compute
+        self._value = None
+        self._computed = False
+
+    @property
+    def value(self):
+        if not self._computed:
+            self._value, self._computed = self._compute(), True
+        return self._value
+
+    def __getattr__(self, name):
+        return getattr(self.value, name)
+
+    def __iter__(self):
+        return iter(self.value)
+
+    def __len__(self):
+        return len(self.value)
+
+    def __bool__(self):
+        return bool(self.value)
@@ -1,39 +1,116 @@
-import os
+import re
+import socket
+from functools import lru_cache
 from pathlib import Path
 from src import logger
 
+
+STATIC_DIR = (Path(__file__).parent / '../static').resolve()
+ICONS_DIR = STATIC_DIR / 'icons'
+
+# raw svg sources, keyed by the url relative to the static folder
+_svg_sources = {}
+
+# when enabled, get_svg_content emits <use> references into the sprite from get_svg_sprite()
+_svg_sprite_mode = False
+
+
+@lru_cache(maxsize=1024)
 def extract_avatar_url(full_avatar_url: str):
-    print(f'\nExtracting avatar url: {full_avatar_url}...')
     try:
-        the_url = full_avatar_url.split('/static')[1]
-        print(f'Extracted the avatar url: {the_url}...')
-        return the_url
+        return full_avatar_url.split('/static')[1]
     except Exception as ect:
-        print(f'Error to extract url [{full_avatar_url}]:', ect)
+        logger.warning(f'Error to extract url [{full_avatar_url}]: {ect}')
         return 'default_user.jpg'
 
+
+@lru_cache(maxsize=1)
 def server_name():
-    import socket
     return socket.gethostname()
 
-def get_svg_content(url: str, width=24, height=24, classes=''):
-    # logger.info(f'\nGetting svg content: {url}...')
-    try:
-        path = Path(__file__).parent / f'../static/{url}'
-        svg = path.resolve().open().read()
 
-        svg = svg.split('<svg ')
-        svg = '<svg ' + f'class="{classes}" ' + svg[1]
-        
-        # remove the 'fill' attributes
-        svg = ''.join(svg.split('fill="none"'))
-        svg = ''.join(svg.split('fill="#212121"'))
+def _read_svg_source(url: str) -> str:
+    source = _svg_sources.get(url)
+    if source is None:
+        source = (STATIC_DIR / url).resolve().open(encoding='utf-8').read()
+        _svg_sources[url] = source
+    return source
+
+
+def preload_svg_icons(icons_dir: Path = ICONS_DIR, sprite_mode: bool = False) -> int:
+    """
+    Reading all svg icons into the in-process cache, so the templates never touch the disk.
+    Returning the number of loaded icons.
+    """
+    global _svg_sprite_mode
+    _svg_sprite_mode = sprite_mode
+    _get_rendered_svg.cache_clear()
+    get_svg_sprite.cache_clear()
+
+    for path in sorted(Path(icons_dir).rglob('*.svg')):
+        url = path.relative_to(STATIC_DIR).as_posix()
+        _svg_sources[url] = path.open(encoding='utf-8').read()
+
+    return len(_svg_sources)
+
+
+def _svg_symbol_id(url: str) -> str:
+    return 'icon-' + re.sub(r'[^a-zA-Z0-9_-]', '-', url[:-len('.svg')] if url.endswith('.svg') else url)
+
+
+def _render_svg(url: str, width, height, classes) -> str:
+    svg = _read_svg_source(url)
 
-        svg = f'width={width}'.join(svg.split('width="24"'))
-        svg = f'height={height}'.join(svg.split('height="24"'))
+    svg = svg.split('<svg ')
+    svg = '<svg ' + f'class="{classes}" ' + svg[1]
 
-        # print(svg)
-        return svg
+    # remove the 'fill' attributes
+    svg = ''.join(svg.split('fill="none"'))
+    svg = ''.join(svg.split('fill="#212121"'))
+
+    svg = f'width={width}'.join(svg.split('width="24"'))
+    svg = f'height={height}'.join(svg.split('height="24"'))
+    return svg
+
+
+def _render_svg_use(url: str, width, height, classes) -> str:
+    # ensure the icon exists, the sprite only contains the preloaded icons
+    _read_svg_source(url)
+    return f'<svg class="{classes}" width={width} height={height}><use href="#{_svg_symbol_id(url)}"></use></svg>'
+
+
+@lru_cache(maxsize=2048)
+def _get_rendered_svg(url: str, width, height, classes) -> str:
+    # bounded by the (url, width, height, classes) combinations of the templates; failures raise, they are not cached
+    return _render_svg_use(url, width, height, classes) if _svg_sprite_mode else _render_svg(url, width, height, classes)
+
+
+def get_svg_content(url: str, width=24, height=24, classes=''):
+    try:
+        return _get_rendered_svg(url, width, height, classes)
     except Exception as ect:
-        print(f'Error to extract url [{url}]:', ect)
+        logger.warning(f'Error to extract url [{url}]: {ect}')
+        return ''
+
+
+@lru_cache(maxsize=1)
+def get_svg_sprite():
+    """
+    Building a hidden svg sprite (one <symbol> per preloaded icon),
+    to be included once in the layout when the sprite mode is enabled: {{ get_svg_sprite()|safe }} right after <body>.
+    No layout of the app includes it yet, SVG_SPRITE_MODE stays off until one does.
+    """
+    if not _svg_sprite_mode:
         return ''
+
+    symbols = []
+    for url, source in sorted(_svg_sources.items()):
+        view_box = re.search(r'viewBox=["\']([^"\']+)["\']', source)
+        body = re.search(r'<svg[^>]*>(.*)</svg>', source, flags=re.S)
+        if not view_box or not body:
+            continue
+
+        content = ''.join(body.group(1).split('fill="#212121"'))
+        symbols.append(f'<symbol id="{_svg_symbol_id(url)}" viewBox="{view_box.group(1)}">{content}</symbol>')
+
+    return '<svg xmlns="http://www.w3.org/2000/svg" style="display: none">' + ''.join(symbols) + '</svg>'
@@ -0,0 +1,155 @@
+"""
+Prometheus metrics of the app (prometheus_client), exposed at /metrics.
+With a multiprocess directory every gunicorn worker writes its samples there, and /metrics aggregates them.
+"""
+import os
+import time
+from contextlib import contextmanager
+
+# the metric objects, created once by configure() -> recording is a no-op until then
+_metrics = {}
+_multiprocess_dir = None
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SQL_STATEMENTS_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+COMPRESSION_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1)
+
+
+def configure(multiprocess_dir: str = None):
+    """
+    Creating the metrics. The multiprocess directory must be set before prometheus_client is imported,
+    it is picked once per process.
+    """
+    global _multiprocess_dir
+    if _metrics:
+        return
+
+    if multiprocess_dir:
+        os.makedirs(multiprocess_dir, exist_ok=True)
+        os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', multiprocess_dir)
+        _multiprocess_dir = os.environ['PROMETHEUS_MULTIPROC_DIR']
+
+    from prometheus_client import Counter, Histogram
+    _metrics.update(
+        requests=Counter('http_requests_total', 'Handled requests', ['blueprint', 'endpoint', 'method', 'status']),
+        request_seconds=Histogram('http_request_duration_seconds', 'Request latency', ['blueprint', 'endpoint', 'method'], buckets=LATENCY_BUCKETS),
+        sql_statements=Histogram('http_request_sql_statements', 'SQL statements per request', ['blueprint', 'endpoint'], buckets=SQL_STATEMENTS_BUCKETS),
+        sql_seconds=Histogram('http_request_sql_duration_seconds', 'Time spent in SQL per request', ['blueprint', 'endpoint'], buckets=LATENCY_BUCKETS),
+        bcrypt_seconds=Histogram('bcrypt_duration_seconds', 'Password hashing/checking time', ['operation'], buckets=LATENCY_BUCKETS),
+        smtp_seconds=Histogram('smtp_send_duration_seconds', 'Time spent sending an email', buckets=LATENCY_BUCKETS),
+        template_seconds=Histogram('template_render_duration_seconds', 'Template rendering time', ['template'], buckets=LATENCY_BUCKETS),
+        ratelimit_rejections=Counter('ratelimit_rejections_total', 'Requests rejected by the rate limiter', ['blueprint', 'endpoint']),
+        compressed_responses=Counter('http_compressed_responses_total', 'Responses compressed by the app', ['blueprint', 'endpoint', 'encoding']),
+        compression_saved_bytes=Counter('http_compression_saved_bytes_total', 'Bytes saved by the response compression', ['blueprint', 'endpoint', 'encoding']),
+        compression_cpu_seconds=Histogram('http_compression_cpu_seconds', 'CPU time compressing a response', ['encoding'], buckets=COMPRESSION_BUCKETS),
+        user_cache_lookups=Counter('user_cache_lookups_total', 'Logged-in user snapshot lookups (hit, miss, revalidated, stale)', ['result']),
+    )
+
+
+def is_enabled() -> bool:
+    return bool(_metrics)
+
+
+def observe(name: str, value: float, **labels):
+    metric = _metrics.get(name)
+    if metric is not None:
+        (metric.labels(**labels) if labels else metric).observe(value)
+
+
+def increment(name: str, amount: float = 1, **labels):
+    metric = _metrics.get(name)
+    if metric is not None:
+        (metric.labels(**labels) if labels else metric).inc(amount)
+
+
+@contextmanager
+def timed(name: str, **labels):
+    """
+    Observing the duration of the block in the :name histogram.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - started, **labels)
+
+
+def instrument_engines():
+    """
+    Adding the duration of every SQL statement to the current request's totals.
+    """
+    from .sql_timing import add_observer
+    add_observer(_record_statement)
+
+
+def _record_statement(conn, statement, parameters, executemany, elapsed):
+    from flask import g, has_request_context
+
+    if has_request_context() and 'metrics_sql_statements' in g:
+        g.metrics_sql_statements += 1
+        g.metrics_sql_seconds += elapsed
+
+
+def before_render_template(sender, template, context, **extra):
+    from flask import g
+    g.setdefault('metrics_templates_started', []).append(time.perf_counter())
+
+
+def template_rendered(sender, template, context, **extra):
+    from flask import g
+    started = g.get('metrics_templates_started')
+    if started:
+        observe('template_seconds', time.perf_counter() - started.pop(), template=template.name or '')
+
+
+def is_scrape_allowed(remote_addr: str, authorization: str, token: str = None, allowed_networks: list = ()) -> bool:
+    """
+    Whether a /metrics request comes from one of the :allowed_networks (CIDR) or carries the "Bearer :token".
+    The metrics show the endpoints and the traffic, they are not public.
+    """
+    import hmac
+    import ipaddress
+
+    if token and authorization and hmac.compare_digest(authorization.encode(), f'Bearer {token}'.encode()):
+        return True
+
+    try:
+        address = ipaddress.ip_address(remote_addr or '')
+    except ValueError:
+        return False
+    return any(address in ipaddress.ip_network(network.strip(), strict=False) for network in allowed_networks if network.strip())
+
+
+def render() -> tuple:
+    """
+    Returning the (Prometheus text exposition, content type) of all the workers.
+    """
+    from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, generate_latest
+
+    if _multiprocess_dir is None:
+        return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+    from prometheus_client import multiprocess
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry, path=_multiprocess_dir)
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def clear_multiprocess_dir(multiprocess_dir: str):
+    """
+    Deleting the samples of a previous run (gunicorn master start).
+    """
+    if not multiprocess_dir or not os.path.isdir(multiprocess_dir):
+        return
+    for file_name in os.listdir(multiprocess_dir):
+        if file_name.endswith('.db'):
+            os.remove(os.path.join(multiprocess_dir, file_name))
+
+
+def mark_process_dead(pid: int, multiprocess_dir: str):
+    """
+    Dropping the live gauges of an exited worker (gunicorn child_exit), its counters/histograms stay aggregated.
+    """
+    if multiprocess_dir:
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(pid, path=multiprocess_dir)
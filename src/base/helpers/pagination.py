@@ -0,0 +1,182 @@
+import base64
+import json
+from datetime import date, datetime
+from sqlalchemy import and_, or_, false
+
+
+class InvalidCursorError(ValueError):
+    """
+    The cursor was tampered with, or built for another order.
+    """
+
+
+class KeysetPagination:
+    """
+    Cursor-based (keyset) pagination: every page is a range scan continuing after/before
+    the sort key of a row, so deep pages cost the same as the first one.
+
+    NULL values sort as the smallest values: the ORDER BY says so explicitly (NULLS FIRST ascending,
+    NULLS LAST descending), the SQLite default but not the Postgres one.
+    """
+
+    def __init__(self, items: list, per_page: int, next_cursor: str = None, prev_cursor: str = None, total: int = None):
+        self.items = items
+        self.per_page = per_page
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.total = total # only counted when asked, it is a full scan
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+    @staticmethod
+    def paginate(query, order_by: list, after: str = None, before: str = None, per_page: int = 20, with_total: bool = False):
+        """
+        Returning the page of :query that follows the :after cursor (or precedes the :before cursor).
+        :order_by: [(column, 'asc' | 'desc'), ...], must end with a unique column (the primary key).
+        Raising InvalidCursorError if the cursor does not match :order_by.
+        """
+        backwards = before is not None
+        cursor_values = KeysetPagination.parse_cursor(before if backwards else after, order_by)
+        total = query.order_by(None).count() if with_total else None
+
+        # reading backwards = reading the reversed order forwards
+        order = [(column, KeysetPagination.flip(direction) if backwards else direction) for column, direction in order_by]
+
+        query = query.order_by(None).add_columns(*[column for column, _ in order])
+        if cursor_values is not None:
+            query = query.filter(KeysetPagination.after(order, cursor_values))
+
+        rows = query\
+            .order_by(*KeysetPagination.order_clauses(order))\
+            .limit(per_page + 1)\
+            .all()
+
+        has_more = len(rows) > per_page
+        rows = rows[:per_page]
+        if backwards:
+            rows.reverse()
+
+        items = [row[0] for row in rows]
+        keys = [tuple(row[1:]) for row in rows]
+
+        if backwards:
+            prev_cursor = KeysetPagination.encode_cursor(keys[0]) if has_more else None
+            next_cursor = KeysetPagination.encode_cursor(keys[-1]) if keys else None
+        else:
+            next_cursor = KeysetPagination.encode_cursor(keys[-1]) if has_more else None
+            prev_cursor = KeysetPagination.encode_cursor(keys[0]) if cursor_values is not None and keys else None
+
+        return KeysetPagination(items, per_page, next_cursor=next_cursor, prev_cursor=prev_cursor, total=total)
+
+
+    @staticmethod
+    def order_clauses(order_by: list) -> list:
+        """
+        Returning the ORDER BY clauses of [(column, 'asc' | 'desc'), ...], the NULLs sorting as the smallest values.
+        """
+        return [
+            (column.asc().nulls_first() if direction == 'asc' else column.desc().nulls_last())
+            if KeysetPagination.is_nullable(column) else
+            (column.asc() if direction == 'asc' else column.desc())
+            for column, direction in order_by
+        ]
+
+    @staticmethod
+    def is_nullable(column) -> bool:
+        # the NOT NULL columns (the primary key...) keep a plain ORDER BY, matching their indexes on every database
+        return getattr(getattr(column, 'expression', column), 'nullable', True)
+
+    @staticmethod
+    def flip(direction: str) -> str:
+        return 'desc' if direction == 'asc' else 'asc'
+
+    @staticmethod
+    def after(order: list, values: tuple):
+        """
+        Building the "sorts after :values" condition:
+        (c1 > v1) OR (c1 = v1 AND c2 > v2) OR ... (with < for the descending columns).
+        """
+        clauses = []
+        for index, ((column, direction), value) in enumerate(zip(order, values)):
+            strictly_after = KeysetPagination.strictly_after(column, direction, value)
+            if strictly_after is None:
+                continue
+
+            equals = [c.is_(None) if v is None else c == v for (c, _), v in zip(order[:index], values[:index])]
+            clauses.append(and_(*equals, strictly_after))
+        return or_(*clauses) if clauses else false()
+
+    @staticmethod
+    def strictly_after(column, direction: str, value):
+        if direction == 'asc':
+            return column.isnot(None) if value is None else column > value
+
+        # descending: NULLs come last
+        return None if value is None else or_(column < value, column.is_(None))
+
+
+    @staticmethod
+    def encode_cursor(values: tuple) -> str:
+        values = [{'$dt': value.isoformat()} if isinstance(value, (datetime, date)) else value for value in values]
+        return base64.urlsafe_b64encode(json.dumps(values, separators=(',', ':')).encode()).decode().rstrip('=')
+
+    @staticmethod
+    def parse_cursor(cursor: str, order_by: list):
+        """
+        Returning the values of :cursor for :order_by, None without a cursor.
+        Raising InvalidCursorError if it cannot be decoded, or its values do not fit the order columns.
+        """
+        if not cursor:
+            return None
+
+        values = KeysetPagination.decode_cursor(cursor)
+        if values is None or len(values) != len(order_by):
+            raise InvalidCursorError(cursor)
+
+        for (column, _), value in zip(order_by, values):
+            types = KeysetPagination.value_types(column)
+            if value is not None and (not isinstance(value, types) or isinstance(value, bool) and bool not in types):
+                raise InvalidCursorError(cursor)
+        return values
+
+    @staticmethod
+    def value_types(column) -> tuple:
+        """
+        Returning the Python types a cursor value of :column may have (JSON has no int/float distinction).
+        """
+        try:
+            python_type = column.type.python_type
+        except (AttributeError, NotImplementedError):
+            return (int, float, str, datetime)
+        if python_type is float:
+            return (int, float)
+        if python_type is int:
+            return (int,)
+        return (python_type,)
+
+    @staticmethod
+    def decode_cursor(cursor: str):
+        """
+        Returning the cursor values, or None if there is no cursor/the cursor was tampered with.
+        """
+        if not cursor:
+            return None
+
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+            return tuple(datetime.fromisoformat(value['$dt']) if isinstance(value, dict) else value for value in values)
+        except (ValueError, TypeError, KeyError):
+            return None
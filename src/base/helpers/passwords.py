@@ -0,0 +1,95 @@
+import time
+import bcrypt
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from . import metrics
+
+# bcrypt work factor, overridden by the BCRYPT_LOG_ROUNDS config
+_log_rounds = 12
+
+# bounded pool hashing several passwords in parallel (bcrypt releases the GIL), None -> hashing on the calling thread
+_executor = None
+
+
+def configure(log_rounds: int = 12, workers: int = 0):
+    """
+    Setting the bcrypt work factor and the size of the hashing thread pool (0 disables the pool).
+    """
+    global _log_rounds, _executor
+    _log_rounds = log_rounds
+
+    if _executor is not None:
+        _executor.shutdown(wait=False)
+    _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hashing') if workers > 0 else None
+
+
+def _to_bytes(value) -> bytes:
+    return value.encode('utf-8') if isinstance(value, str) else value
+
+
+def hash_password(raw_password: str, log_rounds: int = None) -> bytes:
+    with metrics.timed('bcrypt_seconds', operation='hash'):
+        return bcrypt.hashpw(_to_bytes(raw_password), bcrypt.gensalt(log_rounds or _log_rounds))
+
+
+def check_password(password_hash, raw_password: str) -> bool:
+    try:
+        with metrics.timed('bcrypt_seconds', operation='check'):
+            return bcrypt.checkpw(_to_bytes(raw_password), _to_bytes(password_hash))
+    except ValueError:
+        # malformed/legacy hash
+        return False
+
+
+def get_log_rounds(password_hash) -> int:
+    """
+    Reading the work factor stored in a hash: $2b$<rounds>$<salt+hash>.
+    """
+    try:
+        return int(_to_bytes(password_hash).split(b'$')[2])
+    except (IndexError, ValueError):
+        return None
+
+
+def needs_rehash(password_hash) -> bool:
+    return password_hash is not None and get_log_rounds(password_hash) != _log_rounds
+
+
+def _submit(fn, *args) -> Future:
+    if _executor is not None:
+        return _executor.submit(fn, *args)
+
+    # no pool configured: run now, still returning a Future so the callers stay the same
+    future = Future()
+    try:
+        future.set_result(fn(*args))
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
+
+def hash_password_async(raw_password: str) -> Future:
+    """
+    Hashing on the bounded pool: several passwords are hashed in parallel (bcrypt releases the GIL),
+    while the caller runs its queries.
+    """
+    return _submit(hash_password, raw_password)
+
+
+def calibrate_log_rounds(target_ms: float, min_rounds: int = 10, max_rounds: int = 16, samples: int = 3) -> list:
+    """
+    Measuring the hashing time of each work factor on this host.
+    Returning [(rounds, milliseconds), ...] up to the first factor that reaches target_ms.
+    """
+    timings = []
+    for rounds in range(min_rounds, max_rounds + 1):
+        salt = bcrypt.gensalt(rounds)
+        started = time.perf_counter()
+        for _ in range(samples):
+            bcrypt.hashpw(b'calibration-password', salt)
+        elapsed_ms = (time.perf_counter() - started) * 1000 / samples
+        timings.append((rounds, elapsed_ms))
+
+        if elapsed_ms >= target_ms:
+            break
+    return timings
@@ -0,0 +1,96 @@
+"""
+Rate limit storages shared by all the gunicorn workers of a host, without an external service.
+Importing this module registers them in `limits`, select one with RATELIMIT_STORAGE_URI.
+"""
+import os
+import sqlite3
+import threading
+import time
+import urllib.parse
+
+from limits.storage import Storage
+
+
+class SQLiteStorage(Storage):
+    """
+    Fixed window counters in a SQLite database in WAL mode (`sqlite:////absolute/path.sqlite3`).
+    Every worker opens its own connection, the counters are shared through the file.
+    """
+
+    STORAGE_SCHEME = ['sqlite']
+
+    # deleting the expired counters every N increments
+    PURGE_INTERVAL = 1000
+
+    def __init__(self, uri: str, **options):
+        # same convention as SQLAlchemy: sqlite:///relative/path, sqlite:////absolute/path
+        self.path = urllib.parse.urlparse(uri).path[1:]
+        self.busy_timeout_ms = int(options.get('busy_timeout_ms', 1000))
+        self._local = threading.local()
+        self._increments = 0
+        super().__init__(uri, **options)
+
+        with self.connection() as connection:
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS ratelimit '
+                '(key TEXT PRIMARY KEY, value INTEGER NOT NULL, expiry REAL NOT NULL) WITHOUT ROWID'
+            )
+
+    def connection(self) -> sqlite3.Connection:
+        """
+        Returning the connection of the current thread, reopened after a fork.
+        """
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=self.busy_timeout_ms / 1000, isolation_level=None)
+            # the counters are disposable: no fsync on every hit
+            connection.execute('PRAGMA synchronous=OFF')
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def incr(self, key: str, expiry: int, elastic_expiry: bool = False, amount: int = 1) -> int:
+        now = time.time()
+        connection = self.connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            # the SET expressions read the values before the update
+            connection.execute(
+                'INSERT INTO ratelimit (key, value, expiry) VALUES (:key, :amount, :now + :expiry) '
+                'ON CONFLICT (key) DO UPDATE SET '
+                'value = CASE WHEN expiry <= :now THEN :amount ELSE value + :amount END, '
+                'expiry = CASE WHEN expiry <= :now OR :elastic THEN :now + :expiry ELSE expiry END',
+                {'key': key, 'amount': amount, 'now': now, 'expiry': expiry, 'elastic': elastic_expiry},
+            )
+            value = connection.execute('SELECT value FROM ratelimit WHERE key = ?', (key,)).fetchone()[0]
+            connection.execute('COMMIT')
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+
+        self._increments += 1
+        if self._increments % self.PURGE_INTERVAL == 0:
+            connection.execute('DELETE FROM ratelimit WHERE expiry <= ?', (now,))
+        return value
+
+    def get(self, key: str) -> int:
+        row = self.connection().execute('SELECT value FROM ratelimit WHERE key = ? AND expiry > ?', (key, time.time())).fetchone()
+        return row[0] if row else 0
+
+    def get_expiry(self, key: str) -> int:
+        row = self.connection().execute('SELECT expiry FROM ratelimit WHERE key = ?', (key,)).fetchone()
+        return int(row[0] if row else time.time())
+
+    def check(self) -> bool:
+        try:
+            self.connection().execute('SELECT 1')
+            return True
+        except sqlite3.Error:
+            return False
+
+    def reset(self):
+        return self.connection().execute('DELETE FROM ratelimit').rowcount
+
+    def clear(self, key: str):
+        self.connection().execute('DELETE FROM ratelimit WHERE key = ?', (key,))
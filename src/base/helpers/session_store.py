@@ -0,0 +1,123 @@
+"""
+Server-side session data: the cookie only carries an opaque id, the data stays on the server until it expires.
+Select the store with SESSION_STORE_URI: `sqlite:////absolute/path.sqlite3` (shared by the gunicorn workers of a host)
+or `memory://` (per process, development/tests).
+"""
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+import urllib.parse
+
+
+def new_session_id() -> str:
+    # 256 random bits, not guessable
+    return secrets.token_urlsafe(32)
+
+
+class MemorySessionStore:
+    """
+    In-process key-value store (`memory://`), only visible to the process that wrote it.
+    """
+
+    def __init__(self, uri: str = 'memory://'):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, id: str):
+        with self._lock:
+            entry = self._entries.get(id)
+            if entry is None or entry[0] <= time.time():
+                return None
+            return json.loads(entry[1])
+
+    def set(self, id: str, data: dict, ttl: float):
+        # stored serialized like the other stores, the caller's dict is not shared
+        with self._lock:
+            self._entries[id] = (time.time() + ttl, json.dumps(data))
+
+    def delete(self, id: str):
+        with self._lock:
+            self._entries.pop(id, None)
+
+    def purge(self) -> int:
+        """
+        Deleting the expired sessions, returning how many.
+        """
+        now = time.time()
+        with self._lock:
+            expired = [id for id, (expiry, _) in self._entries.items() if expiry <= now]
+            for id in expired:
+                del self._entries[id]
+        return len(expired)
+
+
+class SQLiteSessionStore:
+    """
+    Sessions in a SQLite database in WAL mode (`sqlite:////absolute/path.sqlite3`), shared by the workers through the file.
+    """
+
+    # deleting the expired sessions every N writes
+    PURGE_INTERVAL = 100
+
+    def __init__(self, uri: str):
+        # same convention as SQLAlchemy: sqlite:///relative/path, sqlite:////absolute/path
+        self.path = urllib.parse.urlparse(uri).path[1:]
+        self._local = threading.local()
+        self._writes = 0
+
+        connection = self.connection()
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute(
+            'CREATE TABLE IF NOT EXISTS session '
+            '(id TEXT PRIMARY KEY, data TEXT NOT NULL, expiry REAL NOT NULL) WITHOUT ROWID'
+        )
+
+    def connection(self) -> sqlite3.Connection:
+        """
+        Returning the connection of the current thread, reopened after a fork.
+        """
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=1, isolation_level=None)
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def get(self, id: str):
+        row = self.connection().execute('SELECT data FROM session WHERE id = ? AND expiry > ?', (id, time.time())).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, id: str, data: dict, ttl: float):
+        self.connection().execute(
+            'INSERT OR REPLACE INTO session (id, data, expiry) VALUES (?, ?, ?)',
+            (id, json.dumps(data), time.time() + ttl),
+        )
+
+        self._writes += 1
+        if self._writes % self.PURGE_INTERVAL == 0:
+            self.purge()
+
+    def delete(self, id: str):
+        self.connection().execute('DELETE FROM session WHERE id = ?', (id,))
+
+    def purge(self) -> int:
+        """
+        Deleting the expired sessions, returning how many.
+        """
+        return self.connection().execute('DELETE FROM session WHERE expiry <= ?', (time.time(),)).rowcount
+
+
+SESSION_STORES = {
+    'memory': MemorySessionStore,
+    'sqlite': SQLiteSessionStore,
+}
+
+
+def open_session_store(uri: str):
+    scheme = urllib.parse.urlparse(uri).scheme
+    if scheme not in SESSION_STORES:
+        raise ValueError(f'Unsupported SESSION_STORE_URI scheme: {scheme!r} (one of {", ".join(SESSION_STORES)})')
+    return SESSION_STORES[scheme](uri)
@@ -0,0 +1,132 @@
+"""
+Development/test SQL inspector: groups the statements of every request to spot the N+1 patterns
+(the same statement repeated once per row), and logs the slow statements with their query plan.
+"""
+import os
+import re
+import sys
+from collections import Counter
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+HELPERS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# "IN (?, ?, ?)" -> "IN (...)", so the same query with another number of ids is grouped with the others
+IN_LIST_PATTERN = re.compile(r'\((?:\?|%s|%\(\w+\)s|:\w+)(?:, ?(?:\?|%s|%\(\w+\)s|:\w+))*\)')
+
+
+class RepeatedQueriesError(Exception):
+    """
+    Raised at the end of a request repeating a statement too many times (SQL_DEBUG_RAISE).
+    """
+
+
+class RequestQueries:
+    """
+    The statements of a request, grouped by normalized SQL.
+    """
+
+    def __init__(self, repeated_threshold: int, slow_ms: float):
+        self.repeated_threshold = repeated_threshold
+        self.slow_ms = slow_ms
+        self.counts = Counter()
+        self.origins = {} # statement -> Counter of the template/view lines issuing it
+        self.total = 0
+
+    def add(self, statement: str, origin: str):
+        statement = normalize_statement(statement)
+        self.total += 1
+        self.counts[statement] += 1
+        self.origins.setdefault(statement, Counter())[origin] += 1
+
+    def repeated(self) -> list:
+        """
+        Returning [(statement, count, [(origin, count), ...]), ...] of the statements over the threshold.
+        """
+        return [
+            (statement, count, self.origins[statement].most_common(3))
+            for statement, count in self.counts.most_common()
+            if count >= self.repeated_threshold
+        ]
+
+
+def normalize_statement(statement: str) -> str:
+    return IN_LIST_PATTERN.sub('(...)', ' '.join(statement.split()))
+
+
+def find_origin(frame=None) -> str:
+    """
+    Returning the innermost template line issuing the statement (lazy loads while rendering),
+    or else the innermost line of the app's code.
+    """
+    frame = frame or sys._getframe(1)
+    code_line = None
+
+    while frame is not None:
+        template = frame.f_globals.get('__jinja_template__')
+        if template is not None:
+            return f"{template.name or '<template>'}:{template.get_corresponding_lineno(frame.f_lineno)}"
+
+        filename = frame.f_code.co_filename
+        if code_line is None and filename.startswith(SRC_DIR) and not filename.startswith(HELPERS_DIR):
+            code_line = f'{os.path.relpath(filename, os.path.dirname(SRC_DIR))}:{frame.f_lineno} in {frame.f_code.co_name}()'
+        frame = frame.f_back
+
+    return code_line or '<unknown>'
+
+
+def explain(connection, statement: str, parameters) -> str:
+    """
+    Returning the query plan, read on a raw DBAPI cursor so it is not recorded itself.
+    """
+    prefix = 'EXPLAIN QUERY PLAN ' if connection.dialect.name == 'sqlite' else 'EXPLAIN '
+    cursor = connection.connection.cursor()
+    try:
+        cursor.execute(prefix + statement, parameters)
+        return '\n'.join('    ' + ' | '.join(str(value) for value in row) for row in cursor.fetchall())
+    except Exception as e:
+        return f'    (no plan: {e})'
+    finally:
+        cursor.close()
+
+
+def instrument_engines():
+    from .sql_timing import add_observer
+    add_observer(_inspect_statement)
+
+
+def _inspect_statement(conn, statement, parameters, executemany, elapsed):
+    from flask import g, has_request_context
+    from src import logger
+
+    queries = g.get('sql_debug_queries') if has_request_context() else None
+    if queries is None:
+        return
+
+    origin = find_origin(sys._getframe(1))
+    queries.add(statement, origin)
+
+    elapsed_ms = elapsed * 1000
+    if elapsed_ms >= queries.slow_ms:
+        plan = explain(conn, statement, parameters) if not executemany else '    (executemany)'
+        logger.warning(f'Slow SQL ({elapsed_ms:.1f}ms) from {origin}:\n  {statement}\n{plan}')
+
+
+def report_repeated(queries: RequestQueries, endpoint: str, raise_error: bool = False):
+    """
+    Logging the N+1 suspects of a request, or raising RepeatedQueriesError (tests).
+    """
+    from src import logger
+
+    repeated = queries.repeated()
+    if not repeated:
+        return
+
+    lines = [f'N+1 suspected on {endpoint} ({queries.total} statements):']
+    for statement, count, origins in repeated:
+        lines.append(f'  {count}x {statement}')
+        lines.extend(f'      {origin_count}x from {origin}' for origin, origin_count in origins)
+    message = '\n'.join(lines)
+
+    if raise_error:
+        raise RepeatedQueriesError(message)
+    logger.warning(message)
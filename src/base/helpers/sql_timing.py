@@ -0,0 +1,41 @@
+"""
+One set of engine listeners timing every SQL statement of every engine,
+handing the statement and its duration to the observers (metrics, sql_debug).
+"""
+import time
+
+# observer(conn, statement, parameters, executemany, elapsed_seconds)
+_observers = []
+
+
+def add_observer(observer):
+    """
+    Calling :observer after every statement, the listeners are installed on the first observer.
+    """
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(Engine, 'handle_error', _handle_error)
+
+    if observer not in _observers:
+        _observers.append(observer)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('sql_timing_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['sql_timing_started'].pop()
+    for observer in _observers:
+        observer(conn, statement, parameters, executemany, elapsed)
+
+
+def _handle_error(exception_context):
+    # the failed statement never reaches after_cursor_execute
+    connection = exception_context.connection
+    if connection is not None and connection.info.get('sql_timing_started'):
+        connection.info['sql_timing_started'].pop()
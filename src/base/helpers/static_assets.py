@@ -0,0 +1,191 @@
+"""
+Fingerprinted static files: url_for('static', filename='fonts/Inter/Inter-Var.ttf') -> /static/fonts/Inter/Inter-Var.<hash>.ttf
+The content hash changes with the file, so the hashed urls can be cached by the browsers forever.
+The `flask assets compress` build step writes .br/.gz siblings, served instead of the file to the browsers accepting them.
+"""
+import gzip
+import hashlib
+import os
+
+# Content-Encoding -> sibling suffix, in order of preference
+PRECOMPRESSED_SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+# the other formats (woff2, png, jpg...) are compressed already
+COMPRESSIBLE_EXTENSIONS = ('.svg', '.ttf', '.otf', '.eot', '.css', '.js', '.map', '.json', '.txt', '.xml', '.html', '.ico')
+
+
+class StaticManifest:
+    """
+    {static endpoint: {filename: hashed filename}} of the app's and the blueprints' static folders, built at boot.
+    """
+
+    HASH_LENGTH = 12
+
+    def __init__(self):
+        self.hashed = {}
+        self.originals = {}
+        self.encodings = {} # {static endpoint: {filename: (content encoding, ...)}} of the fresh precompressed siblings
+
+    @staticmethod
+    def build(folders: dict) -> 'StaticManifest':
+        """
+        Hashing every file of the {static endpoint: folder} folders.
+        """
+        manifest = StaticManifest()
+        for endpoint, folder in folders.items():
+            if folder and os.path.isdir(folder):
+                manifest.add_folder(endpoint, folder)
+        return manifest
+
+    def add_folder(self, endpoint: str, folder: str):
+        hashed, originals = self.hashed.setdefault(endpoint, {}), self.originals.setdefault(endpoint, {})
+        encodings = self.encodings.setdefault(endpoint, {})
+
+        for directory, _, file_names in os.walk(folder):
+            for file_name in file_names:
+                path = os.path.join(directory, file_name)
+                if is_precompressed_sibling(path):
+                    continue
+
+                filename = os.path.relpath(path, folder).replace(os.sep, '/')
+                hashed_filename = StaticManifest.fingerprint(filename, StaticManifest.hash_file(path))
+
+                hashed[filename] = hashed_filename
+                originals[hashed_filename] = filename
+
+                # a sibling older than the file is left over from a previous build
+                mtime = os.stat(path).st_mtime
+                fresh = tuple(
+                    encoding for encoding, suffix in PRECOMPRESSED_SUFFIXES.items()
+                    if os.path.isfile(path + suffix) and os.stat(path + suffix).st_mtime >= mtime
+                )
+                if fresh:
+                    encodings[filename] = fresh
+
+    @staticmethod
+    def hash_file(path: str) -> str:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as file:
+            for chunk in iter(lambda: file.read(65536), b''):
+                digest.update(chunk)
+        return digest.hexdigest()[:StaticManifest.HASH_LENGTH]
+
+    @staticmethod
+    def fingerprint(filename: str, content_hash: str) -> str:
+        # the hash goes before the (last) extension, the files keep their mimetype
+        root, extension = os.path.splitext(filename)
+        return f'{root}.{content_hash}{extension}'
+
+    def hashed_filename(self, endpoint: str, filename: str) -> str:
+        return self.hashed.get(endpoint, {}).get(filename)
+
+    def original_filename(self, endpoint: str, filename: str) -> str:
+        return self.originals.get(endpoint, {}).get(filename)
+
+    def precompressed_encodings(self, endpoint: str, filename: str) -> tuple:
+        return self.encodings.get(endpoint, {}).get(filename, ())
+
+    def __len__(self):
+        return sum(len(files) for files in self.hashed.values())
+
+
+def is_precompressed_sibling(path: str) -> bool:
+    root, suffix = os.path.splitext(path)
+    return suffix in PRECOMPRESSED_SUFFIXES.values() and os.path.isfile(root)
+
+
+def negotiate_encoding(accept_encodings, available: tuple):
+    """
+    Picking the precompressed encoding the client prefers (q values), the server's preference breaking the ties.
+    Returning None to send the file as is.
+    """
+    best, best_quality = None, 0
+    for encoding in available:
+        quality = accept_encodings.quality(encoding)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def make_static_view(app, manifest: StaticManifest, endpoint: str, folder: str):
+    """
+    Returning the view sending the static files of the folder, the precompressed sibling if the client accepts it.
+    STATIC_SENDFILE picks who copies the file to the socket without going through Python:
+    'wsgi' (the server's wsgi.file_wrapper, sendfile(2) with gunicorn), 'x-sendfile' (Apache/lighttpd)
+    or 'x-accel-redirect' (nginx, internal location STATIC_X_ACCEL_LOCATION aliasing the src folder).
+    """
+    import mimetypes
+    from flask import request
+    from werkzeug.utils import send_from_directory
+
+    sendfile = app.config['STATIC_SENDFILE']
+    x_accel_location = app.config['STATIC_X_ACCEL_LOCATION'].rstrip('/')
+
+    def send_static_file(filename):
+        available = manifest.precompressed_encodings(endpoint, filename)
+        encoding = negotiate_encoding(request.accept_encodings, available) if available else None
+        path = filename + PRECOMPRESSED_SUFFIXES[encoding] if encoding else filename
+
+        response = send_from_directory(
+            folder, path, request.environ,
+            mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream',
+            max_age=app.get_send_file_max_age(filename),
+            use_x_sendfile=sendfile in ('x-sendfile', 'x-accel-redirect'),
+            response_class=app.response_class,
+        )
+
+        # werkzeug names the sent file (the sibling) in an inline Content-Disposition, useless for the assets
+        response.headers.pop('Content-Disposition', None)
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        if available:
+            response.vary.add('Accept-Encoding')
+        if sendfile == 'x-accel-redirect' and 'X-Sendfile' in response.headers:
+            file_path = os.path.relpath(response.headers.pop('X-Sendfile'), app.root_path).replace(os.sep, '/')
+            response.headers['X-Accel-Redirect'] = f'{x_accel_location}/{file_path}'
+        return response
+
+    return send_static_file
+
+
+def load_brotli():
+    # optional dependency (`pip install brotli`), only the build step needs it
+    try:
+        import brotli
+        return brotli
+    except ImportError:
+        return None
+
+
+def precompress_folder(folder: str, min_size: int = 512, min_ratio: float = 0.95) -> list:
+    """
+    Writing the .gz (and .br if brotli is installed) siblings of the compressible files of the folder.
+    A sibling not saving at least 1 - min_ratio of the size is not worth the Content-Encoding, it is removed.
+    Returning [(path, encoding, original size, compressed size), ...] of the written siblings.
+    """
+    brotli = load_brotli()
+    compressors = {'gzip': lambda data: gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        compressors['br'] = lambda data: brotli.compress(data, quality=11)
+
+    written = []
+    for directory, _, file_names in os.walk(folder):
+        for file_name in file_names:
+            path = os.path.join(directory, file_name)
+            if not file_name.lower().endswith(COMPRESSIBLE_EXTENSIONS) or os.path.getsize(path) < min_size:
+                continue
+
+            with open(path, 'rb') as file:
+                data = file.read()
+
+            for encoding, compress in compressors.items():
+                sibling = path + PRECOMPRESSED_SUFFIXES[encoding]
+                compressed = compress(data)
+                if len(compressed) > len(data) * min_ratio:
+                    if os.path.exists(sibling):
+                        os.remove(sibling)
+                    continue
+
+                with open(sibling, 'wb') as file:
+                    file.write(compressed)
+                written.append((path, encoding, len(data), len(compressed)))
+    return written
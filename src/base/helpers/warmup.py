@@ -0,0 +1,67 @@
+"""
+Warming a new worker up before its first request: compiling the templates, opening the pooled DB connections
+and filling the per-process caches, so a deploy or a worker recycle does not show in the latency.
+"""
+import os
+import tempfile
+
+from jinja2 import FileSystemBytecodeCache
+
+
+class AtomicBytecodeCache(FileSystemBytecodeCache):
+    """
+    Jinja bytecode cache on disk shared by the workers: a cache file is written aside and renamed,
+    so a worker never loads the half-written file of another one.
+    """
+
+    def __init__(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        super().__init__(directory)
+
+    def dump_bytecode(self, bucket):
+        file_descriptor, temporary_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(file_descriptor, 'wb') as file:
+                bucket.write_bytecode(file)
+            os.replace(temporary_path, self._get_cache_filename(bucket))
+        except BaseException:
+            os.remove(temporary_path)
+            raise
+
+
+def compile_templates(jinja_env) -> list:
+    """
+    Loading every template of the app and the blueprints into the environment's cache
+    (from the bytecode cache when an other worker compiled it already).
+    Returning the [(template name, error), ...] that failed to compile.
+    """
+    failures = []
+    for name in jinja_env.list_templates(extensions=('html', 'txt', 'xml', 'svg')):
+        try:
+            jinja_env.get_template(name)
+        except Exception as e:
+            failures.append((name, e))
+    return failures
+
+
+def open_db_connections(engine, count: int) -> int:
+    """
+    Opening up to :count connections at once and returning them to the pool, idle and ready.
+    Returning how many were opened, none when the engine does not pool them (NullPool: closed when returned).
+    """
+    from sqlalchemy.pool import NullPool
+
+    if isinstance(engine.pool, NullPool):
+        return 0
+
+    pool_size = engine.pool.size() if callable(getattr(engine.pool, 'size', None)) else 1
+    connections = []
+    try:
+        for _ in range(max(1, min(count, pool_size))):
+            connection = engine.connect()
+            connections.append(connection)
+            connection.exec_driver_sql('SELECT 1')
+    finally:
+        for connection in connections:
+            connection.close()
+    return len(connections)
@@ -15,6 +15,18 @@ class DefaultEnvironment(object):
   DEBUG = False
   TESTING = False
 
+  # boot: FAST_START skips the schema creation, seeding and config dumps unless explicitly asked
+  FAST_START = os.environ.get("FAST_START", "False") == "True"
+  # unset (None) -> not FAST_START, resolved after the create_app overrides
+  BOOT_CREATE_SCHEMA = os.environ["BOOT_CREATE_SCHEMA"] == "True" if "BOOT_CREATE_SCHEMA" in os.environ else None # development only
+  BOOT_SEED = os.environ["BOOT_SEED"] == "True" if "BOOT_SEED" in os.environ else None # or run `flask seed`
+  BOOT_VERBOSE = os.environ.get("BOOT_VERBOSE", "False") == "True" # print os.environ and the config
+  BOOT_REPORT = True # log the import/boot phases timings
+  # warm-up before the first request: templates compiled, DB connections opened, caches filled
+  WARMUP = os.environ.get("WARMUP", "True") == "True"
+  WARMUP_DB_CONNECTIONS = int(os.environ.get("WARMUP_DB_CONNECTIONS", 2))
+  JINJA_BYTECODE_CACHE_DIR = os.environ.get("JINJA_BYTECODE_CACHE_DIR") # shared by the workers (unset -> compiled per process)
+
   # database
   SQLALCHEMY_TRACK_MODIFICATIONS = False
   SQLALCHEMY_DATABASE_URI = os.environ["SQLALCHEMY_DATABASE_URI"]
@@ -26,24 +38,102 @@ class DefaultEnvironment(object):
   SECRET_KEY = os.environ["SECRET_KEY"]
   RBAC_USE_WHITE = True
   RATELIMIT_STRATEGY = 'fixed-window-elastic-expiry'
+  # memory:// is per worker, sqlite:////path.sqlite3 is shared by the workers of the host,
+  # redis://host:port works with any redis-compatible server (needs the `redis` package)
+  RATELIMIT_STORAGE_URI = os.environ.get("RATELIMIT_STORAGE_URI", "memory://")
+
+  # server-side sessions (pending registrations): memory:// is per process, sqlite:////path is shared by the workers
+  SESSION_STORE_URI = os.environ.get("SESSION_STORE_URI", "memory://")
+  REGISTRATION_SESSION_TTL = 30 * 60 # seconds to enter the confirmation code
+  BCRYPT_LOG_ROUNDS = 12 # tune with `flask auth calibrate-bcrypt`, stored hashes are upgraded on login
+  PASSWORD_HASH_WORKERS = 2 # threads hashing the passwords of a bulk verification in parallel, 0 -> one after the other
+  USER_CACHE_TTL = 60 # seconds a logged-in user snapshot is kept in memory
+  USER_CACHE_CHECK_INTERVAL = 5 # seconds before a worker checks a snapshot's User.updated_time (the other workers' changes; its own are seen right away)
+  USER_CACHE_MAXSIZE = 10000
+  ROLE_CACHE_TTL = 300 # seconds before a worker re-reads the role table (its own changes are seen right after the commit)
 
   # recaptcha
   RECAPTCHA_PUBLIC_KEY = os.environ["RECAPTCHA_PUBLIC_KEY"]
   RECAPTCHA_PRIVATE_KEY = os.environ["RECAPTCHA_PRIVATE_KEY"]
 
   # mail
-  MAIL_SERVER = 'smtp.gmail.com'
-  MAIL_PORT = 465
+  MAIL_SERVER = os.environ.get("MAIL_SERVER", 'smtp.gmail.com') # point to a local smtp stand-in for testing
+  MAIL_PORT = int(os.environ.get("MAIL_PORT", 465))
   MAIL_USE_TLS = False
-  MAIL_USE_SSL = True
+  MAIL_USE_SSL = os.environ.get("MAIL_USE_SSL", "True") == "True"
   MAIL_USERNAME = os.environ["MAIL_USERNAME"]
   MAIL_PASSWORD = os.environ["MAIL_PASSWORD"]
 
+  # mail outbox (drained by `flask email dispatch`)
+  EMAIL_OUTBOX_BATCH_SIZE = 50
+  EMAIL_OUTBOX_MAX_ATTEMPTS = 5
+  EMAIL_OUTBOX_BACKOFF_SECONDS = 30 # doubled on every failed attempt
+  EMAIL_OUTBOX_POLL_INTERVAL = 5
+  EMAIL_OUTBOX_CLAIM_SECONDS = 300 # the emails claimed by a dead dispatcher are sent by an other one after that
+  EMAIL_TEMPLATE_CHECK_INTERVAL = 30 # seconds before a worker checks the EmailTemplates versions (its own edits are seen right after the commit)
+
+  # admin listings (keyset paginated)
+  USER_LIST_PER_PAGE = 20
+  USER_BULK_MAX_IDS = 1000 # users per bulk activate/deactivate/verify request
+  USER_SEARCH_BACKEND = None # 'fts5' | 'like', picked from the database when None (fts5 on SQLite)
+  USER_SEARCH_MAX_TERMS = 8
+
+  # conditional GET (ETag/Last-Modified) of the profile and listing pages
+  CONDITIONAL_GET_ENABLED = True
+  CONDITIONAL_GET_MAX_AGE = 1800 # seconds, less than WTF_CSRF_TIME_LIMIT: the pages embed CSRF tokens
+
+  # prometheus metrics at /metrics, the directory is shared by the gunicorn workers (unset -> per process)
+  METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "True") == "True"
+  METRICS_MULTIPROC_DIR = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+  # only served to these networks (the scraper on the host or the private network), or with "Authorization: Bearer <METRICS_TOKEN>"
+  METRICS_ALLOWED_NETWORKS = os.environ.get("METRICS_ALLOWED_NETWORKS", "127.0.0.0/8,::1/128").split(',')
+  METRICS_TOKEN = os.environ.get("METRICS_TOKEN")
+
+  # gzip/brotli compression of the rendered responses (turn off behind a compressing proxy)
+  COMPRESSION_ENABLED = os.environ.get("COMPRESSION_ENABLED", "True") == "True"
+  COMPRESSION_MIN_SIZE = 500 # bytes, the smaller responses fit in a packet anyway
+  COMPRESSION_LEVEL = int(os.environ.get("COMPRESSION_LEVEL", 6)) # gzip 1-9
+  COMPRESSION_BROTLI_QUALITY = int(os.environ.get("COMPRESSION_BROTLI_QUALITY", 4)) # brotli 0-11
+
+  # SQL debugging: logging the statements repeated in a request (N+1) and the slow ones with their plan
+  SQL_DEBUG = os.environ.get("SQL_DEBUG", "False") == "True"
+  SQL_DEBUG_REPEATED_THRESHOLD = 5 # same statement this many times in a request
+  SQL_DEBUG_SLOW_MS = 100
+  SQL_DEBUG_RAISE = False # raising RepeatedQueriesError instead of logging (tests)
+
+  # static files: content-hashed urls (url_for) cached for a year by the browsers
+  STATIC_FINGERPRINT = os.environ.get("STATIC_FINGERPRINT", "True") == "True"
+  STATIC_FINGERPRINT_MAX_AGE = 365 * 24 * 3600
+  # .br/.gz siblings written by `flask assets compress`, sent with STATIC_SENDFILE: wsgi | x-sendfile | x-accel-redirect
+  STATIC_PRECOMPRESSED = os.environ.get("STATIC_PRECOMPRESSED", "True") == "True"
+  STATIC_SENDFILE = os.environ.get("STATIC_SENDFILE", "wsgi")
+  STATIC_X_ACCEL_LOCATION = os.environ.get("STATIC_X_ACCEL_LOCATION", "/_static_files")
+
+  # rendered fragments ({% cache %}) of the user tables, keyed by the users table version
+  FRAGMENT_CACHE_ENABLED = os.environ.get("FRAGMENT_CACHE_ENABLED", "True") == "True"
+  FRAGMENT_CACHE_SIZE = 256
+  FRAGMENT_CACHE_TTL = 3600
+  FRAGMENT_CACHE_DIR = os.environ.get("FRAGMENT_CACHE_DIR") # shared by the workers (unset -> per process)
+
+  # jinja helpers
+  SVG_ICONS_PRELOAD = True
+  # emit <use> references into a single sprite instead of inlining every svg;
+  # off: the layout must include {{ get_svg_sprite()|safe }} first, or the references point to nothing
+  SVG_SPRITE_MODE = False
+
 
 class DevelopmentEnvironment(DefaultEnvironment):
   SQLALCHEMY_TRACK_MODIFICATIONS = True
   DEBUG = True
+  SQL_DEBUG = os.environ.get("SQL_DEBUG", "True") == "True"
+  STATIC_FINGERPRINT = os.environ.get("STATIC_FINGERPRINT", "False") == "True" # the files change without a restart
+  STATIC_PRECOMPRESSED = os.environ.get("STATIC_PRECOMPRESSED", "False") == "True"
+  WARMUP = os.environ.get("WARMUP", "False") == "True" # the reloader restarts the process on every change
 
 
 class ProductionEnvironment(DefaultEnvironment):
   PREFERRED_URL_SCHEME = 'https'
+  RATELIMIT_STORAGE_URI = os.environ.get("RATELIMIT_STORAGE_URI", "sqlite:////tmp/bvu_envoy_ratelimit.sqlite3")
+  SESSION_STORE_URI = os.environ.get("SESSION_STORE_URI", "sqlite:////tmp/bvu_envoy_sessions.sqlite3")
+  METRICS_MULTIPROC_DIR = os.environ.get("PROMETHEUS_MULTIPROC_DIR", "/tmp/bvu_envoy_metrics")
+  JINJA_BYTECODE_CACHE_DIR = os.environ.get("JINJA_BYTECODE_CACHE_DIR", "/tmp/bvu_envoy_jinja")
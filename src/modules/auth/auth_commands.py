@@ -0,0 +1,28 @@
+import click
+from flask import current_app
+from flask.cli import AppGroup, with_appcontext
+
+from src.base.helpers.passwords import calibrate_log_rounds
+
+# defining the `flask auth ...` commands
+auth_cli = AppGroup('auth', help='Authentication commands.')
+
+
+@auth_cli.command('calibrate-bcrypt')
+@click.option('--target-ms', type=float, default=250, help='Desired hashing latency of one password.')
+def calibrate_bcrypt(target_ms):
+    """Picking the bcrypt work factor that hashes closest under --target-ms on this host."""
+    timings = calibrate_log_rounds(target_ms)
+    for rounds, elapsed_ms in timings:
+        click.echo(f'rounds={rounds}: {elapsed_ms:.1f}ms')
+
+    fitting_rounds = [rounds for rounds, elapsed_ms in timings if elapsed_ms <= target_ms]
+    chosen_rounds = fitting_rounds[-1] if fitting_rounds else timings[0][0]
+    click.echo(f'\nSet BCRYPT_LOG_ROUNDS = {chosen_rounds} in the config, stored hashes are upgraded on the next login.')
+
+
+@auth_cli.command('purge-sessions')
+@with_appcontext
+def purge_sessions():
+    """Deleting the expired server-side sessions (abandoned registrations), run from cron."""
+    click.echo(f'{current_app.session_store.purge()} expired sessions deleted.')
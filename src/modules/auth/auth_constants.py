@@ -1,3 +1,6 @@
+# the cookie session only holds the id of the pending registration, its fields (below) are kept server-side
+SESSION_REGISTRATION_ID = "registration_id"
+
 SESSION_REGISTRATION_ORGANIZATION_NAME = "registration_organization_name"
 SESSION_REGISTRATION_ORGANIZATION_REPRESENTER_PERSON_NAME = "registration_organization_representer_person_name"
 SESSION_REGISTRATION_ORGANIZATION_TAX_ID = "registration_organization_tax_id"
@@ -7,6 +7,8 @@ from src import limiter, logger, db_session
 from src.base.constants.base_constanst import FlashCategory
 from src.modules.auth.auth_service import AuthService
 from src.modules.user.user_model import User, gen_alternative_id
+from src.modules.user.user_cache import UserCache
+from src.modules.user.user_service import UserService
 from .auth_constants import *
 
 # defining controller
@@ -42,10 +44,14 @@ def login():
     if not form.validate_on_submit():
         return render_template('login.html', form=form)
 
-    # FORM IS VALID, LET'S GET THE USER OBJECT FROM DB
-    user = AuthService.get_user_from_email(form.email.data)
+    # FORM IS VALID, THE USER OBJECT WAS ALREADY LOADED BY THE FORM VALIDATION
+    user = AuthService.resolve_user_from_email(form.email.data)
 
     if user is not None:
+        # transparently upgrading the hash when the work factor has been changed
+        if user.password_needs_rehash():
+            AuthService.rehash_password(user, form.password.data)
+
         # let's log the user in
         login_user(user, remember=form.remember)
 
@@ -102,8 +108,6 @@ def register():
     try:
         # all validation passed, let's continue handle the signup process
         confirmation_code = AuthService.gen_registration_code()
-        # assigning the confirmation code to user's session cookie
-        session[SESSION_REGISTRATION_CONFIRMATION_CODE] = confirmation_code
 
         # send confirmation email
         AuthService.send_register_confirm_email(
@@ -112,14 +116,19 @@ def register():
             code=confirmation_code,
         )
 
-        # push the form data to session, so we dont have to store these info in the DB --> prevent registrastion spamming ultil the email in confirmed
-        session[SESSION_REGISTRATION_ORGANIZATION_NAME] = form.organization_name.data
-        session[SESSION_REGISTRATION_ORGANIZATION_REPRESENTER_PERSON_NAME] = form.organization_representer_person_name.data
-        session[SESSION_REGISTRATION_ORGANIZATION_TAX_ID] = form.organization_tax_id.data
-        session[SESSION_REGISTRATION_CITIZEN_ID] = form.citizen_id.data
-        session[SESSION_REGISTRATION_EMAIL] = form.email.data
-        session[SESSION_REGISTRATION_PHONE] = form.phone.data
-        session[SESSION_REGISTRATION_ADDRESS] = form.address.data
+        # keep the form data and the code server-side, so we dont have to store these info in the DB --> prevent registrastion spamming ultil the email in confirmed
+        # the cookie session only gets the opaque id of the pending registration
+        AuthService.discard_pending_registration(session.get(SESSION_REGISTRATION_ID))
+        session[SESSION_REGISTRATION_ID] = AuthService.save_pending_registration({
+            SESSION_REGISTRATION_ORGANIZATION_NAME: form.organization_name.data,
+            SESSION_REGISTRATION_ORGANIZATION_REPRESENTER_PERSON_NAME: form.organization_representer_person_name.data,
+            SESSION_REGISTRATION_ORGANIZATION_TAX_ID: form.organization_tax_id.data,
+            SESSION_REGISTRATION_CITIZEN_ID: form.citizen_id.data,
+            SESSION_REGISTRATION_EMAIL: form.email.data,
+            SESSION_REGISTRATION_PHONE: form.phone.data,
+            SESSION_REGISTRATION_ADDRESS: form.address.data,
+            SESSION_REGISTRATION_CONFIRMATION_CODE: confirmation_code,
+        })
 
         # showing a flash message -> redirecting to the home page
         flash(message=f'Vui lòng kiểm tra tin nhắn được gửi tới email {form.email.data} để hoàn tất quá trình đăng ký!', category=FlashCategory.success(20000))
@@ -137,25 +146,29 @@ def verify_registration():
     from src.modules.auth.forms.verification_form import RegisterVerificationForm
     form = RegisterVerificationForm()
 
-    if not session.get(SESSION_REGISTRATION_EMAIL) or not session.get(SESSION_REGISTRATION_CONFIRMATION_CODE):
+    registration_id = session.get(SESSION_REGISTRATION_ID)
+    registration = AuthService.load_pending_registration(registration_id)
+
+    if not registration or not registration.get(SESSION_REGISTRATION_EMAIL) or not registration.get(SESSION_REGISTRATION_CONFIRMATION_CODE):
+        session.pop(SESSION_REGISTRATION_ID, None)
         flash(message='It seems like you have already registered or your data has been corrupted, please try later', category=FlashCategory.warning(10000))
         return redirect('/')
 
     if request.method == 'GET':
-        return render_template('verify-registration.html', form=form, email=session[SESSION_REGISTRATION_EMAIL])
+        return render_template('verify-registration.html', form=form, email=registration[SESSION_REGISTRATION_EMAIL])
 
     if not form.validate_on_submit():
         flash(message='Please fill out the code', category=FlashCategory.warning())
-        return render_template('verify-registration.html', form=form, email=session[SESSION_REGISTRATION_EMAIL])
+        return render_template('verify-registration.html', form=form, email=registration[SESSION_REGISTRATION_EMAIL])
 
     # form validated --> check if the provided code is correct
-    if form.verification_code.data != session[SESSION_REGISTRATION_CONFIRMATION_CODE]:
+    if form.verification_code.data != registration[SESSION_REGISTRATION_CONFIRMATION_CODE]:
         flash(message='The code you provided was incorrect', category=FlashCategory.warning())
-        return render_template('verify-registration.html', form=form, email=session[SESSION_REGISTRATION_EMAIL])
+        return render_template('verify-registration.html', form=form, email=registration[SESSION_REGISTRATION_EMAIL])
 
     # form validated -> add the envoy info to DB
     try:
-        new_user = User(email=session[SESSION_REGISTRATION_EMAIL], phone_number=session[SESSION_REGISTRATION_PHONE])
+        new_user = User(email=registration[SESSION_REGISTRATION_EMAIL], phone_number=registration[SESSION_REGISTRATION_PHONE])
         new_user.role_id = 3 # envoy
         new_user.activated = False # disallow to login
         new_user.alternative_id = gen_alternative_id()
@@ -167,17 +180,18 @@ def verify_registration():
             response = make_response(render_template('registration-success.html', email=new_user.email))
             response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
             response.headers['Pragma'] = 'no-cache'
+            AuthService.discard_pending_registration(registration_id)
             session.clear()
             return response
 
         # DB insert error
         flash(message='Something went wrong with your info, please try to register again', category=FlashCategory.warning())
-        return render_template('verify-registration.html', form=form, email=session['registration_email'])
+        return render_template('verify-registration.html', form=form, email=registration[SESSION_REGISTRATION_EMAIL])
 
     except Exception as e:
         logger.error(e)
         flash(message='Something went wrong (maybe your data has been corrupted), please try later', category=FlashCategory.warning())
-        return render_template('verify-registration.html', form=form, email=session['registration_email'])
+        return render_template('verify-registration.html', form=form, email=registration[SESSION_REGISTRATION_EMAIL])
 
 
 
@@ -195,16 +209,22 @@ async def reset_password():
 
     try:
         new_password = uuid1().hex
-        AuthService.send_reset_password_email(email=form.email.data, password=new_password)
-        the_user = AuthService.get_user_from_email(form.email.data)
+        # already loaded by the form validation
+        the_user = AuthService.resolve_user_from_email(form.email.data)
         if the_user != None:
+            old_alternative_id = the_user.alternative_id
             the_user.alternative_id = gen_alternative_id()
             the_user.password_hash = User.gen_password_hash(new_password)
+            AuthService.send_reset_password_email(email=form.email.data, password=new_password)
+            UserService.bump_version() # the other workers drop their snapshot of the old session
             db_session.commit()
+            UserCache.invalidate(old_alternative_id)
             flash(message='Your password has been reset, please check your email to get the new password', category=FlashCategory.success())
             return render_template("password-reset.html", form=form)
         else:
             raise Exception()
     except Exception as e:
+        logger.error(e)
+        db_session.rollback()
         flash(message='Error occurred while sending reset password email', category=FlashCategory.error())
         return render_template('password-reset.html', form=form)
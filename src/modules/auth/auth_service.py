@@ -20,16 +20,42 @@ class AuthService:
     def get_user_from_username(username: str):
         return db_session.query(User).filter_by(username = username).first()
 
+    @staticmethod
+    def resolve_user_from_email(email: str):
+        """
+        Loading the user (and its role) once per request,
+        so the form validators and the view share the same row.
+        """
+        from flask import g
+        from sqlalchemy.orm import joinedload
+
+        resolved_users = g.setdefault('resolved_users_by_email', {})
+        if email not in resolved_users:
+            resolved_users[email] = db_session.query(User).options(joinedload(User.role)).filter_by(email = email).first()
+        return resolved_users[email]
+
     @staticmethod
     def is_user_already_exists(email):
-        print(f'Checking user exists on the system: {email}');
-        print(db_session.query(User).filter_by(email = email).first())
-        return db_session.query(User).filter_by(email = email).first() is not None
+        return AuthService.resolve_user_from_email(email) is not None
 
     @staticmethod
     def is_user_activated(email):
-        print(f'Checking user account activated on the system: {email}');
-        return db_session.query(User).filter(User.email == email, User.activated == True).first() is not None
+        user = AuthService.resolve_user_from_email(email)
+        return user is not None and user.activated
+
+    @staticmethod
+    def rehash_password(user: User, raw_password: str):
+        """
+        Upgrading the stored hash to the configured work factor, the raw password is only known at login.
+        """
+        try:
+            user.password_hash = User.gen_password_hash(raw_password)
+            db_session.commit()
+            return True
+        except Exception as e:
+            logger.error(e)
+            db_session.rollback()
+            return False
 
     @staticmethod
     def get_verify_tọken(expiration):
@@ -40,8 +66,10 @@ class AuthService:
 
     @staticmethod
     def register(new_user: User):
+        from src.modules.user.user_service import UserService
         try:
             db_session.add(new_user)
+            UserService.bump_version() # the new envoy shows up in the waiting list
             db_session.commit()
             return new_user
         except Exception as e:
@@ -52,30 +80,27 @@ class AuthService:
 
     @staticmethod
     def send_register_confirm_email(receiver_email: str, receiver_name: str, code: str):
-        from flask_mail import Message
-        from src import mail
-        msg = Message(f'Xác minh đăng ký tài khoản Đại sứ BVU', sender = current_app.config['MAIL_USERNAME'], recipients = [receiver_email])
-        msg.html = f"""
-        Xin chào {receiver_name},<br /><br />
-        Đây là tin nhắn tự động được gửi từ hệ thống Cổng thông tin Đại sứ BVU.<br/>
-        Vui lòng sao chép mã sau đây để hoàn tất quá trình đăng ký:
-        <h1>{code}</h1>
         """
-        mail.send(msg)
+        Queueing the confirmation email, nothing else changes in the DB so it is committed right away.
+        """
+        from src.modules.email.email_service import EmailService
+        from src.modules.setting.setting_cache import EmailTemplateCache
+        from src.modules.setting.setting_constants import EMAIL_TEMPLATE_REGISTER_CONFIRM
+        subject, html = EmailTemplateCache.render(EMAIL_TEMPLATE_REGISTER_CONFIRM, receiver_name=receiver_name, code=code)
+        EmailService.enqueue(subject=subject, recipients=[receiver_email], html=html)
+        db_session.commit()
     
 
     @staticmethod
-    async def send_reset_password_email(email: str, password: str) -> None:
-        from flask_mail import Message
-        from src import mail
-        msg = Message(f'Khôi phục mật khẩu Đại sứ BVU', sender = current_app.config['MAIL_USERNAME'], recipients = [email])
-        msg.html = f"""
-        Xin chào {email},<br /><br />
-        Đây là tin nhắn tự động được gửi từ hệ thống Cổng thông tin Đại sứ BVU.<br/>
-        Sau đây là mật khẩu mới của bạn để đăng nhập:
-        <h1>{password}</h1>
+    def send_reset_password_email(email: str, password: str) -> None:
+        """
+        Queueing the reset password email, committed by the caller together with the new password.
         """
-        await mail.send(msg)
+        from src.modules.email.email_service import EmailService
+        from src.modules.setting.setting_cache import EmailTemplateCache
+        from src.modules.setting.setting_constants import EMAIL_TEMPLATE_RESET_PASSWORD
+        subject, html = EmailTemplateCache.render(EMAIL_TEMPLATE_RESET_PASSWORD, email=email, password=password)
+        EmailService.enqueue(subject=subject, recipients=[email], html=html)
 
 
     @staticmethod
@@ -86,3 +111,28 @@ class AuthService:
         # getting 6 letters code
         code = ''.join(uuid.uuid1().hex.split('-'))[:6]
         return code
+
+
+    @staticmethod
+    def save_pending_registration(data: dict) -> str:
+        """
+        Keeping the signup form and its confirmation code server-side until the email is confirmed
+        (REGISTRATION_SESSION_TTL), nothing is stored in the DB before that.
+        Returning the opaque id to put in the cookie session.
+        """
+        from src.base.helpers.session_store import new_session_id
+        registration_id = new_session_id()
+        current_app.session_store.set(registration_id, data, ttl=current_app.config['REGISTRATION_SESSION_TTL'])
+        return registration_id
+
+    @staticmethod
+    def load_pending_registration(registration_id: str):
+        """
+        Returning the pending registration's data, None if it expired/completed.
+        """
+        return current_app.session_store.get(registration_id) if registration_id else None
+
+    @staticmethod
+    def discard_pending_registration(registration_id: str):
+        if registration_id:
+            current_app.session_store.delete(registration_id)
@@ -1,5 +1,5 @@
 from flask_wtf import FlaskForm
-from wtforms.fields.html5 import EmailField
+from wtforms.fields import EmailField
 from wtforms.fields import StringField, PasswordField, BooleanField
 from wtforms.validators import InputRequired, Length, EqualTo, Regexp, ValidationError, DataRequired
 
@@ -71,8 +71,7 @@ class LoginForm(FlaskForm):
 
         # checking if the provided password is not True (with the one in the database)
         # the user instance below is always exists because the form's email validation did check.
-        user = AuthService.get_user_from_email(self.email.data)
-        # print(user)
+        user = AuthService.resolve_user_from_email(self.email.data)
 
         if not user.check_password(self.password.data):
             self.password.errors.append('The password you just provided was wrong')
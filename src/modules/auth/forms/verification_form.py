@@ -1,5 +1,5 @@
 from flask_wtf.form import FlaskForm
-from wtforms.fields.core import RadioField, StringField
+from wtforms.fields import StringField
 from wtforms.validators import InputRequired, Length
 
 
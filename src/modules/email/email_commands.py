@@ -0,0 +1,29 @@
+import time
+import click
+from flask.cli import AppGroup
+
+from src import logger
+from .email_service import EmailService
+
+# defining the `flask email ...` commands
+email_cli = AppGroup('email', help='Outbound email commands.')
+
+
+@email_cli.command('dispatch')
+@click.option('--batch-size', type=int, default=None, help='Emails sent per SMTP connection.')
+@click.option('--interval', type=float, default=None, help='Seconds to sleep when the outbox is empty.')
+@click.option('--once', is_flag=True, help='Drain the outbox once then exit.')
+def dispatch(batch_size, interval, once):
+    """Draining the email outbox in batches."""
+    from flask import current_app
+    interval = interval if interval is not None else current_app.config['EMAIL_OUTBOX_POLL_INTERVAL']
+
+    while True:
+        result = EmailService.dispatch_batch(batch_size)
+        if any(result.values()):
+            logger.info(f'Email outbox batch: {result}')
+            continue
+
+        if once:
+            break
+        time.sleep(interval)
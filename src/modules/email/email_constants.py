@@ -0,0 +1,10 @@
+EMAIL_OUTBOX_RECIPIENTS_LENGTH = 1000
+EMAIL_OUTBOX_SENDER_LENGTH = 255
+EMAIL_OUTBOX_SUBJECT_LENGTH = 255
+EMAIL_OUTBOX_ERROR_LENGTH = 1000
+
+EMAIL_OUTBOX_STATUS_LENGTH = 10
+EMAIL_OUTBOX_STATUS_PENDING = 'pending'
+EMAIL_OUTBOX_STATUS_SENDING = 'sending' # claimed by a dispatcher until next_attempt_time
+EMAIL_OUTBOX_STATUS_SENT = 'sent'
+EMAIL_OUTBOX_STATUS_FAILED = 'failed' # gave up after EMAIL_OUTBOX_MAX_ATTEMPTS
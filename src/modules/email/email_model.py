@@ -0,0 +1,34 @@
+from datetime import datetime
+from sqlalchemy import String, Integer, Text, DateTime, Column, Index
+
+from src import db
+from .email_constants import *
+
+
+class EmailOutbox(db.Model):
+    """
+    An outbound email waiting to be delivered by the `flask email dispatch` worker.
+    Rows are added in the same transaction as the state change that triggers the email.
+    The html (generated passwords) is cleared once the email is sent or given up.
+    """
+    __tablename__ = 'EmailOutbox'
+    __table_args__ = (
+        Index('ix_EmailOutbox_status_next_attempt_time', 'status', 'next_attempt_time'),
+        {'extend_existing': True},
+    )
+
+    id = Column(Integer, primary_key=True)
+    sender = Column(String(EMAIL_OUTBOX_SENDER_LENGTH))
+    recipients = Column(String(EMAIL_OUTBOX_RECIPIENTS_LENGTH), nullable=False) # comma separated
+    subject = Column(String(EMAIL_OUTBOX_SUBJECT_LENGTH), nullable=False)
+    html = Column(Text, nullable=False)
+
+    status = Column(String(EMAIL_OUTBOX_STATUS_LENGTH), nullable=False, default=EMAIL_OUTBOX_STATUS_PENDING)
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(String(EMAIL_OUTBOX_ERROR_LENGTH))
+    created_time = Column(DateTime, nullable=False, default=datetime.now)
+    next_attempt_time = Column(DateTime, nullable=False, default=datetime.now)
+    sent_time = Column(DateTime)
+
+    def __repr__(self):
+        return f"<EmailOutbox: {self.id}, to: {self.recipients}, status: {self.status}>"
@@ -1,19 +1,168 @@
+import smtplib
+from datetime import datetime, timedelta
 from flask import current_app
-from flask_mail import Message
+
+from src import db, logger
+from src.base.helpers import metrics
+from .email_constants import *
+from .email_model import EmailOutbox
 
 
 class EmailService:
     @staticmethod
-    async def send_async(subject: str, content: str, **recipients):
+    def enqueue(subject: str, html: str, recipients: list, sender: str = None) -> EmailOutbox:
         """
-        Sending message in asynchronous mode.
+        Adding an email to the outbox.
+        The caller commits it, together with the state change that triggers the email.
         """
-
-        message = Message(
+        email = EmailOutbox(
+            sender=sender or current_app.config['MAIL_USERNAME'],
+            recipients=','.join(recipients),
             subject=subject,
-            html=content,
-            recipients=[*recipients],
+            html=html,
         )
+        db.session.add(email)
+        return email
+
+
+    @staticmethod
+    def enqueue_many(emails: list, sender: str = None) -> int:
+        """
+        Adding many emails ({subject, html, recipients}) to the outbox in one INSERT.
+        The caller commits it, together with the state change that triggers the emails.
+        """
+        if not emails:
+            return 0
+
+        sender = sender or current_app.config['MAIL_USERNAME']
+        db.session.execute(EmailOutbox.__table__.insert(), [
+            {'sender': sender, 'recipients': ','.join(email['recipients']), 'subject': email['subject'], 'html': email['html']}
+            for email in emails
+        ])
+        return len(emails)
+
+
+    @staticmethod
+    def claim_batch(batch_size: int) -> list:
+        """
+        Claiming up to :batch_size due emails for this dispatcher, committed before anything is sent.
+        Every row is claimed with a compare-and-set on its (status, next_attempt_time), so two dispatchers
+        never send the same row (SQLite has no SELECT ... FOR UPDATE SKIP LOCKED).
+        A claim is a lease: the emails of a dispatcher that died are claimed again after EMAIL_OUTBOX_CLAIM_SECONDS.
+        """
+        from sqlalchemy import or_, update
+
+        now = datetime.now()
+        candidates = db.session.query(EmailOutbox.id, EmailOutbox.status, EmailOutbox.next_attempt_time)\
+            .filter(
+                or_(EmailOutbox.status == EMAIL_OUTBOX_STATUS_PENDING, EmailOutbox.status == EMAIL_OUTBOX_STATUS_SENDING),
+                EmailOutbox.next_attempt_time <= now,
+            )\
+            .order_by(EmailOutbox.next_attempt_time.asc(), EmailOutbox.id.asc())\
+            .limit(batch_size)\
+            .all()
+
+        lease_expiry = now + timedelta(seconds=current_app.config['EMAIL_OUTBOX_CLAIM_SECONDS'])
+        claimed_ids = []
+        for candidate in candidates:
+            result = db.session.execute(
+                update(EmailOutbox)
+                .where(
+                    EmailOutbox.id == candidate.id,
+                    EmailOutbox.status == candidate.status,
+                    EmailOutbox.next_attempt_time == candidate.next_attempt_time,
+                )
+                .values(status=EMAIL_OUTBOX_STATUS_SENDING, next_attempt_time=lease_expiry)
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount == 1:
+                claimed_ids.append(candidate.id)
+        db.session.commit()
+
+        if not claimed_ids:
+            return []
+        return db.session.query(EmailOutbox).filter(EmailOutbox.id.in_(claimed_ids)).order_by(EmailOutbox.id.asc()).all()
+
+
+    @staticmethod
+    def dispatch_batch(batch_size: int = None) -> dict:
+        """
+        Sending a batch of claimed emails over a single SMTP connection, every outcome committed right away.
+        Failed emails are retried later with an exponential backoff.
+        Returning the number of sent/retried/failed emails.
+        """
+        from flask_mail import Message
+        mail = current_app.get_mail()
+        config = current_app.config
+        batch_size = batch_size or config['EMAIL_OUTBOX_BATCH_SIZE']
+        result = {'sent': 0, 'retried': 0, 'failed': 0}
+
+        emails = EmailService.claim_batch(batch_size)
+        if not emails:
+            return result
+
+        attempted = 0
+        try:
+            with mail.connect() as connection:
+                for email in emails:
+                    attempted += 1
+                    try:
+                        with metrics.timed('smtp_seconds'):
+                            connection.send(Message(
+                                subject=email.subject,
+                                html=email.html,
+                                sender=email.sender,
+                                recipients=email.recipients.split(','),
+                            ))
+                        EmailService.mark_sent(email)
+                        result['sent'] += 1
+                    except smtplib.SMTPServerDisconnected as e:
+                        # the rest of the batch is released for the next run
+                        result[EmailService.mark_failure(email, e)] += 1
+                        db.session.commit()
+                        break
+                    except Exception as e:
+                        result[EmailService.mark_failure(email, e)] += 1
+                    db.session.commit()
+        except Exception as e:
+            logger.error(e)
+            # could not connect at all -> every email of the batch is retried later
+            # (after a disconnection, only the QUIT failed: the unattempted emails are not counted as failures)
+            if not attempted:
+                for email in emails:
+                    result[EmailService.mark_failure(email, e)] += 1
+
+        # the claimed emails that were not attempted (disconnection) are due again right away
+        for email in emails:
+            if email.status == EMAIL_OUTBOX_STATUS_SENDING:
+                email.status = EMAIL_OUTBOX_STATUS_PENDING
+                email.next_attempt_time = datetime.now()
+        db.session.commit()
+        return result
+
+
+    @staticmethod
+    def mark_sent(email: EmailOutbox):
+        email.status = EMAIL_OUTBOX_STATUS_SENT
+        email.sent_time = datetime.now()
+        email.last_error = None
+        # the bodies carry generated passwords: nothing is kept once delivered
+        email.html = ''
+
+
+    @staticmethod
+    def mark_failure(email: EmailOutbox, error: Exception) -> str:
+        config = current_app.config
+        email.attempts += 1
+        email.last_error = str(error)[:EMAIL_OUTBOX_ERROR_LENGTH]
+
+        if email.attempts >= config['EMAIL_OUTBOX_MAX_ATTEMPTS']:
+            logger.error(f'Giving up sending email {email.id} after {email.attempts} attempts: {error}')
+            email.status = EMAIL_OUTBOX_STATUS_FAILED
+            email.html = '' # never delivered, the generated password is not kept either
+            return 'failed'
 
-        from src import mail
-        await mail.send(message)
+        delay = config['EMAIL_OUTBOX_BACKOFF_SECONDS'] * 2 ** (email.attempts - 1)
+        email.status = EMAIL_OUTBOX_STATUS_PENDING
+        email.next_attempt_time = datetime.now() + timedelta(seconds=delay)
+        return 'retried'
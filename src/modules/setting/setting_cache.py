@@ -0,0 +1,88 @@
+import threading
+import time
+from collections import namedtuple
+
+from jinja2.sandbox import ImmutableSandboxedEnvironment
+from sqlalchemy.orm import Session
+
+from src import db
+from src.base.helpers.cache import invalidate_on_commit
+from src.modules.setting.setting_model import EmailTemplates
+from .setting_constants import DEFAULT_EMAIL_TEMPLATES
+
+CompiledEmailTemplate = namedtuple('CompiledEmailTemplate', ['version', 'subject', 'html'])
+
+
+class EmailTemplateCache:
+    """
+    The email templates compiled once per process and version.
+    The versions are checked against the DB every `check_interval` seconds (other workers' edits),
+    right away after a commit editing a template in this process.
+    """
+
+    check_interval = 30
+    _templates = {} # name -> CompiledEmailTemplate
+    _next_checks = {} # name -> monotonic time of the next version check
+    _lock = threading.Lock()
+    # the templates are edited by the admins: sandboxed, and the values are escaped in the html (not in the subject)
+    _html_environment = ImmutableSandboxedEnvironment(autoescape=True)
+    _subject_environment = ImmutableSandboxedEnvironment(autoescape=False)
+
+    @staticmethod
+    def configure(check_interval: float):
+        EmailTemplateCache.check_interval = check_interval
+
+    @staticmethod
+    def get(name: str) -> CompiledEmailTemplate:
+        compiled = EmailTemplateCache._templates.get(name)
+        if compiled is not None and EmailTemplateCache._next_checks.get(name, 0) > time.monotonic():
+            return compiled
+
+        with EmailTemplateCache._lock:
+            compiled = EmailTemplateCache._templates.get(name)
+            if compiled is None or EmailTemplateCache._next_checks.get(name, 0) <= time.monotonic():
+                compiled = EmailTemplateCache._load(name, compiled)
+                EmailTemplateCache._templates[name] = compiled
+                EmailTemplateCache._next_checks[name] = time.monotonic() + EmailTemplateCache.check_interval
+        return compiled
+
+    @staticmethod
+    def _load(name: str, compiled: CompiledEmailTemplate) -> CompiledEmailTemplate:
+        """
+        Reading the template's version, and its source only if the compiled one is outdated.
+        """
+        # own session: the caller's transaction (e.g. a bulk verification) is left alone
+        with Session(db.engine) as session:
+            version = session.query(EmailTemplates.version).filter(EmailTemplates.name == name).scalar()
+            if compiled is not None and compiled.version == (version or 0):
+                return compiled
+
+            if version is None:
+                # not seeded yet (`flask seed`)
+                version, (subject, content) = 0, DEFAULT_EMAIL_TEMPLATES[name]
+            else:
+                version, subject, content = session.query(EmailTemplates.version, EmailTemplates.subject, EmailTemplates.content)\
+                    .filter(EmailTemplates.name == name).one()
+
+        return CompiledEmailTemplate(
+            version,
+            EmailTemplateCache._subject_environment.from_string(subject),
+            EmailTemplateCache._html_environment.from_string(content),
+        )
+
+    @staticmethod
+    def render(name: str, **context) -> tuple:
+        """
+        Returning the (subject, html) of the email.
+        """
+        compiled = EmailTemplateCache.get(name)
+        return compiled.subject.render(**context), compiled.html.render(**context)
+
+    @staticmethod
+    def invalidate():
+        # the versions are checked on the next get, the unchanged templates are not compiled again
+        EmailTemplateCache._next_checks = {}
+
+
+# checking the versions right away after the commits editing the templates in this process
+invalidate_on_commit(EmailTemplates, EmailTemplateCache.invalidate)
@@ -2,3 +2,42 @@ SETTING_EMAIL_TEMPLATE_NAME_LENGTH = 50
 SETTING_EMAIL_TEMPLATE_CONTENT_LENGTH = 5000
 SETTING_EMAIL_TEMPLATE_NAME_LENGTH = 50
 SETTING_EMAIL_TEMPLATE_NAME_LENGTH = 50
+SETTING_TABLE_NAME_LENGTH = 64
+SETTING_EMAIL_TEMPLATE_SUBJECT_LENGTH = 255
+
+# the email templates (EmailTemplates.name), rendered with Jinja
+EMAIL_TEMPLATE_REGISTER_CONFIRM = 'register_confirm' # receiver_name, code
+EMAIL_TEMPLATE_RESET_PASSWORD = 'reset_password' # email, password
+EMAIL_TEMPLATE_REGISTER_SUCCESS = 'register_success' # receiver_name, password
+
+# {name: (subject, content)}, seeded into EmailTemplates and used while a template is missing from the DB
+DEFAULT_EMAIL_TEMPLATES = {
+  EMAIL_TEMPLATE_REGISTER_CONFIRM: (
+    'Xác minh đăng ký tài khoản Đại sứ BVU',
+    """
+        Xin chào {{ receiver_name }},<br /><br />
+        Đây là tin nhắn tự động được gửi từ hệ thống Cổng thông tin Đại sứ BVU.<br/>
+        Vui lòng sao chép mã sau đây để hoàn tất quá trình đăng ký:
+        <h1>{{ code }}</h1>
+        """,
+  ),
+  EMAIL_TEMPLATE_RESET_PASSWORD: (
+    'Khôi phục mật khẩu Đại sứ BVU',
+    """
+        Xin chào {{ email }},<br /><br />
+        Đây là tin nhắn tự động được gửi từ hệ thống Cổng thông tin Đại sứ BVU.<br/>
+        Sau đây là mật khẩu mới của bạn để đăng nhập:
+        <h1>{{ password }}</h1>
+        """,
+  ),
+  EMAIL_TEMPLATE_REGISTER_SUCCESS: (
+    'Thông báo xét duyệt tài khoản Đại sứ BVU',
+    """
+        Xin chào {{ receiver_name }},<br /><br />
+        Đây là tin nhắn tự động được gửi từ hệ thống Cổng thông tin Đại sứ BVU.<br/>
+
+        </br/>Tài khoản của bạn đã được chấp thuận, bây giờ bạn có thể đăng nhập vào website thông qua mật khẩu được cung cấp dưới đây:
+        <h1>{{ password }}</h1>
+        """,
+  ),
+}
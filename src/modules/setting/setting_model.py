@@ -1,3 +1,4 @@
+from datetime import datetime
 from sqlalchemy.orm import relationship
 from sqlalchemy import String, Integer, Boolean, DateTime, Column, ForeignKey
 
@@ -6,9 +7,31 @@ from .setting_constants import *
 
 
 class EmailTemplates(db.Model):
+  """
+  The Jinja source of an email (subject, html content). The version is incremented by every ORM update,
+  the compiled templates of an older version are dropped by the workers (EmailTemplateCache).
+  """
   __tablename__ = 'EmailTemplates'
   __table_args__ = {'extend_existing': True}
 
   id = db.Column(Integer, primary_key=True)
   name = db.Column(String(SETTING_EMAIL_TEMPLATE_NAME_LENGTH), nullable=False, unique=True, index=True)
+  subject = db.Column(String(SETTING_EMAIL_TEMPLATE_SUBJECT_LENGTH), nullable=False)
   content = db.Column(String(SETTING_EMAIL_TEMPLATE_CONTENT_LENGTH), nullable=False, unique=True)
+  version = db.Column(Integer, nullable=False)
+  updated_time = db.Column(DateTime, nullable=False, default=datetime.now, onupdate=datetime.now)
+
+  # a concurrent edit of the same template fails instead of being overwritten
+  __mapper_args__ = {'version_id_col': version}
+
+
+class TableVersion(db.Model):
+  """
+  A version number per table, bumped in the transactions changing its rows (HTTP validators, cache keys).
+  """
+  __tablename__ = 'TableVersion'
+  __table_args__ = {'extend_existing': True}
+
+  name = db.Column(String(SETTING_TABLE_NAME_LENGTH), primary_key=True)
+  version = db.Column(Integer, nullable=False, default=0)
+  updated_time = db.Column(DateTime, nullable=False, default=datetime.now)
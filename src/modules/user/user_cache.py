@@ -0,0 +1,185 @@
+import threading
+import time
+from collections import namedtuple
+from types import MappingProxyType
+
+from sqlalchemy.orm import Session, joinedload
+
+from src import db
+from src.base.helpers.cache import TTLCache, invalidate_on_commit
+from src.modules.user.user_model import User, Role
+
+# (monotonic time of the next check, detached snapshot of the authenticated user with its role), keyed by alternative_id
+authenticated_users = TTLCache(maxsize=10000, ttl=60)
+
+# ((activated, role), flask_principal needs) of the authenticated users, keyed by alternative_id
+principal_identities = TTLCache(maxsize=10000, ttl=60)
+
+CachedRole = namedtuple('CachedRole', ['id', 'name', 'code'])
+
+
+class UserCache:
+    """
+    The snapshots of the logged-in users, served from memory for `check_interval` seconds, then checked against
+    the user's updated_time (the changes committed by the other workers touch it) and reloaded only if it changed.
+    The changes made in this process drop them right away (invalidate).
+    """
+
+    check_interval = 5
+
+    @staticmethod
+    def configure(check_interval: float):
+        UserCache.check_interval = check_interval
+
+    @staticmethod
+    def load(alternative_id: str):
+        """
+        Returning the user of a login session, attached to the request's db session (merging it back does not hit the DB).
+        Between two checks the requests run no query for it, a check is a single indexed SELECT of User.updated_time.
+        """
+        from src.base.helpers import metrics
+
+        entry = authenticated_users.get(alternative_id)
+        result = 'hit' if entry is not None else 'miss'
+        if entry is not None and entry[0] <= time.monotonic():
+            entry = UserCache._revalidate(alternative_id, entry[1])
+            result = 'revalidated' if entry is not None else 'stale'
+        metrics.increment('user_cache_lookups', result=result)
+
+        if entry is None:
+            # loading in a private session, so the snapshot is never expired by the request's commits
+            with Session(db.engine) as session:
+                snapshot = session.query(User)\
+                    .options(joinedload(User.role))\
+                    .filter(User.alternative_id == alternative_id)\
+                    .first()
+
+            if snapshot is None:
+                return None
+            entry = (time.monotonic() + UserCache.check_interval, snapshot)
+            authenticated_users.set(alternative_id, entry)
+
+        return db.session.merge(entry[1], load=False)
+
+    @staticmethod
+    def _revalidate(alternative_id: str, snapshot: User):
+        """
+        Returning the snapshot's renewed entry if the user is unchanged, else dropping it and returning None.
+        """
+        with Session(db.engine) as session:
+            row = session.query(User.updated_time).filter(User.alternative_id == alternative_id).first()
+
+        # a rotated alternative_id finds no row, the old sessions are logged out
+        if row is None or row.updated_time != snapshot.updated_time:
+            authenticated_users.delete(alternative_id)
+            return None
+
+        entry = (time.monotonic() + UserCache.check_interval, snapshot)
+        authenticated_users.set(alternative_id, entry)
+        return entry
+
+    @staticmethod
+    def invalidate(*alternative_ids: str):
+        """
+        Dropping the snapshots (and the identities), must be called after committing changes to the users.
+        """
+        authenticated_users.delete(*alternative_ids)
+        principal_identities.delete(*alternative_ids)
+
+    @staticmethod
+    def stats() -> dict:
+        return authenticated_users.stats()
+
+
+class IdentityCache:
+    """
+    The permission needs computed for the login sessions, so the permission checks of the next requests
+    skip the identity_loaded handlers. They are looked up from the loaded user (after the session protection),
+    and only reused while the user is still activated with the same role.
+    """
+
+    @staticmethod
+    def get(user):
+        """
+        Returning a new identity of :user providing the cached needs, or None if missing or built for another state.
+        """
+        from flask_principal import Identity
+
+        role = RoleCache.get(user.role_id)
+        provides = principal_identities.get(user.alternative_id, validate=lambda entry: entry[0] == (user.activated, role))
+        if provides is None:
+            return None
+
+        # a mutable copy per request, the identity_loaded handlers may still add needs to it
+        identity = Identity(user.id)
+        identity.provides = set(provides[1])
+        identity.user = user
+        identity.cached = True
+        return identity
+
+    @staticmethod
+    def set(user, identity):
+        principal_identities.set(user.alternative_id, ((user.activated, RoleCache.get(user.role_id)), frozenset(identity.provides)))
+
+
+class RoleCache:
+    """
+    The role table (3 seeded rows) as an immutable map, loaded once per process.
+    Reloaded after a commit changing a role in this process, and every `ttl` seconds for the other workers' changes.
+    """
+
+    ttl = 300
+    _roles_by_id = MappingProxyType({})
+    _roles_by_code = MappingProxyType({})
+    _expiry = 0
+    _lock = threading.Lock()
+
+    @staticmethod
+    def configure(ttl: float):
+        RoleCache.ttl = ttl
+
+    @staticmethod
+    def load() -> MappingProxyType:
+        """
+        Returning {role id: CachedRole}, reloading it if it was invalidated/expired.
+        """
+        if RoleCache._expiry < time.monotonic():
+            with RoleCache._lock:
+                if RoleCache._expiry < time.monotonic():
+                    with Session(db.engine) as session:
+                        roles = [CachedRole(role.id, role.name, role.code) for role in session.query(Role).all()]
+
+                    # replacing the maps at once, the readers never see a half-loaded table
+                    RoleCache._roles_by_code = MappingProxyType({role.code: role for role in roles})
+                    RoleCache._roles_by_id = MappingProxyType({role.id: role for role in roles})
+                    RoleCache._expiry = time.monotonic() + RoleCache.ttl
+        return RoleCache._roles_by_id
+
+    @staticmethod
+    def get(id: int) -> CachedRole:
+        """
+        Returning the role, reloading the table once when it is unknown (created by another worker since), or None.
+        """
+        role = RoleCache.load().get(id)
+        if role is None:
+            RoleCache.invalidate()
+            role = RoleCache.load().get(id)
+        return role
+
+    @staticmethod
+    def get_by_code(code: str) -> CachedRole:
+        RoleCache.load()
+        role = RoleCache._roles_by_code.get(code)
+        if role is None:
+            RoleCache.invalidate()
+            RoleCache.load()
+            role = RoleCache._roles_by_code.get(code)
+        return role
+
+    @staticmethod
+    def invalidate():
+        RoleCache._expiry = 0
+
+
+# reloading the roles after the commits changing them in this process
+invalidate_on_commit(Role, RoleCache.invalidate)
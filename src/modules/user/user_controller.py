@@ -1,57 +1,171 @@
-from flask import Blueprint, redirect, url_for, request, flash
+from flask import Blueprint, redirect, url_for, request, flash, current_app, jsonify, abort, Response, stream_with_context, make_response
 from flask_login import login_required, current_user
 from flask.templating import render_template
+from sqlalchemy.orm import joinedload
 from src.base.constants.base_constanst import FlashCategory
+from src.base.helpers.pagination import InvalidCursorError, KeysetPagination
+from src.base.helpers import conditional
+from src.base.helpers.fragment_cache import DeferredValue
 
 from src import db, admin_permission, manager_permission
 from src.modules.user.user_model import User
-from .user_service import UserService
+from .user_service import UserService, USER_LISTINGS, USER_EXPORT_COLUMNS
+from .user_export import UserExport
+from .user_search import UserSearch
+from .user_cache import RoleCache
 
 # defining controller
 user = Blueprint('user', __name__, template_folder='templates', static_folder='static', static_url_path='user/static')
 
 
+def viewer_validators() -> tuple:
+    """
+    What the pages show of the logged-in user (header, permissions), from the cached user: no query.
+    """
+    return current_user.get_id(), getattr(current_user, 'last_modified', None), tuple(RoleCache.load().values())
+
+
+def latest(*times):
+    return max((time for time in times if time is not None), default=None)
+
+
+def render_users_listing(listing: str, title: str):
+    """
+    Rendering a page of an admin listing, navigated with the ?after=/?before= cursors (?count=1 adds the total).
+    Answering 304 from the users table version alone while nothing changed.
+    The page is queried on first use: the template serving its rows from {% cache users_fragment_key %} skips it.
+    """
+    version, version_time = UserService.get_version()
+    etag = conditional.make_etag('users', listing, request.full_path, version, viewer_validators())
+    last_modified = latest(version_time, getattr(current_user, 'last_modified', None))
+
+    not_modified = conditional.not_modified_response(etag, last_modified)
+    if not_modified is not None:
+        return not_modified
+
+    query, order_by = UserService.get_listing(listing)
+    page_args = {
+        'after': request.args.get('after'),
+        'before': request.args.get('before'),
+        'per_page': current_app.config['USER_LIST_PER_PAGE'],
+        'with_total': request.args.get('count') == '1',
+    }
+    # the page is queried in the template, a tampered cursor is rejected before
+    try:
+        KeysetPagination.parse_cursor(page_args['after'], order_by)
+        KeysetPagination.parse_cursor(page_args['before'], order_by)
+    except InvalidCursorError:
+        abort(400)
+    users = DeferredValue(lambda: KeysetPagination.paginate(query.options(joinedload(User.role)), order_by, **page_args))
+    users_fragment_key = ('users', listing, *page_args.values(), version, conditional.release_token())
+
+    response = make_response(render_template("users.html", users=users, title=title, users_fragment_key=users_fragment_key))
+    return conditional.add_validators(response, etag, last_modified)
+
+
 @user.route('', methods=['GET', 'POST'])
 @admin_permission.require(http_exception=403)
 def list():
-    users = db.session.query(User).filter(User.activated == True).order_by(User.role_id.asc(), User.verified_time.desc())
-    return render_template("users.html", users=users.paginate(), title='Tài khoản đang hoạt động')
+    return render_users_listing('active', title='Tài khoản đang hoạt động')
 
 
 @user.route('/disabled', methods=['GET', 'POST'])
 @admin_permission.require(http_exception=403)
 def disabled():
-    users = db.session.query(User).filter(User.activated == False, User.verified_time != None).order_by(User.created_time.desc())
-    return render_template("users.html", users=users.paginate(), title='Tài khoản đã khóa')
+    return render_users_listing('disabled', title='Tài khoản đã khóa')
 
 
 @user.route('/waiting', methods=['GET', 'POST'])
 @admin_permission.require(http_exception=403)
 def accounts_waiting():
-    users = db.session.query(User).filter(User.activated == False, User.verified_time == None, User.role_id == 3).order_by(User.created_time.desc())
-    return render_template("users.html", users=users.paginate(), title='Đang chờ xác nhận tài khoản')
+    return render_users_listing('waiting', title='Đang chờ xác nhận tài khoản')
+
+
+@user.route('/search', methods=['GET'])
+@admin_permission.require(http_exception=403)
+def search():
+    """
+    Searching the users by name/email/phone number prefixes (?q=tuan 0912), best matches first,
+    navigated with the ?after=/?before= cursors like the listings.
+    """
+    query_string = request.args.get('q', '').strip()
+    search = UserSearch.search(query_string)
+    if search is None:
+        return redirect(url_for('user.list'))
+
+    query, order_by = search
+    try:
+        users = KeysetPagination.paginate(
+            query.options(joinedload(User.role)), order_by,
+            after=request.args.get('after'),
+            before=request.args.get('before'),
+            per_page=current_app.config['USER_LIST_PER_PAGE'],
+        )
+    except InvalidCursorError:
+        abort(400)
+    return render_template("users.html", users=users, title=f'Kết quả tìm kiếm: {query_string}', q=query_string)
+
+
+@user.route('/export', methods=['GET'])
+@admin_permission.require(http_exception=403)
+def export():
+    """
+    Streaming the users as CSV (?format=csv) or NDJSON (?format=ndjson),
+    optionally restricted to an admin listing (?filter=active|disabled|waiting).
+    """
+    export_format = request.args.get('format', 'csv')
+    listing = request.args.get('filter')
+    if export_format not in ('csv', 'ndjson') or (listing and listing not in USER_LISTINGS):
+        abort(400)
+
+    rows = UserService.iter_export_rows(listing)
+    header = [column.key for column in USER_EXPORT_COLUMNS]
+    chunks = UserExport.csv_chunks(rows, header) if export_format == 'csv' else UserExport.ndjson_chunks(rows)
+
+    response = Response(stream_with_context(chunks), mimetype=UserExport.MIMETYPES[export_format])
+    response.headers['Content-Disposition'] = f'attachment; filename=users-{listing or "all"}.{export_format}'
+    response.headers['Cache-Control'] = 'no-store'
+    return response
 
 
 @user.route('/<int:id>', methods=['GET'])
 @manager_permission.require(http_exception=403)
 def detail(id: int):
-    the_user = db.session.query(User).filter(User.id == id).first()
-
-    if not the_user:
+    # reading the validators only, the user is loaded if the client's copy is outdated
+    the_user_times = db.session.query(User.updated_time, User.created_time).filter(User.id == id).first()
+    if not the_user_times:
         flash('The user no longer exists', category=FlashCategory.error())
         return redirect(request.referrer or url_for('user.list'))
 
     # đại sứ chỉ cho xem profile chính mình
-    if current_user.role.id == 3 and the_user.id != current_user.id:
+    if current_user.role_id == 3 and id != current_user.id:
         flash('Can only view your profile', category=FlashCategory.error())
         return redirect(request.referrer or url_for('user.list'))
 
-    return render_template("profile.html", user=the_user)
+    the_user_last_modified = the_user_times.updated_time or the_user_times.created_time
+    etag = conditional.make_etag('user', id, the_user_last_modified, viewer_validators())
+    last_modified = latest(the_user_last_modified, getattr(current_user, 'last_modified', None))
+
+    not_modified = conditional.not_modified_response(etag, last_modified)
+    if not_modified is not None:
+        return not_modified
+
+    the_user = db.session.query(User).options(joinedload(User.role)).filter(User.id == id).first()
+    response = make_response(render_template("profile.html", user=the_user))
+    return conditional.add_validators(response, etag, last_modified)
 
 
 @user.route('/profile', methods=['GET'])
 def profile():
-    return render_template("profile.html", user=current_user)
+    etag = conditional.make_etag('profile', viewer_validators())
+    last_modified = getattr(current_user, 'last_modified', None)
+
+    not_modified = conditional.not_modified_response(etag, last_modified)
+    if not_modified is not None:
+        return not_modified
+
+    response = make_response(render_template("profile.html", user=current_user))
+    return conditional.add_validators(response, etag, last_modified)
 
 
 
@@ -109,3 +223,88 @@ def deactivate(id: int):
     
     flash('Deactivated', category=FlashCategory.success())
     return redirect(request.referrer or url_for('user.list'))
+
+
+def check_csrf_token():
+    """
+    Rejecting (400) a POST without the session's CSRF token, in the X-CSRFToken header or the csrf_token field.
+    No CSRFProtect is registered: the FlaskForms check their token, the JSON endpoints must do it themselves.
+    """
+    from flask_wtf.csrf import validate_csrf
+    from wtforms.validators import ValidationError
+
+    if not current_app.config.get('WTF_CSRF_ENABLED', True):
+        return
+
+    field_name = current_app.config.get('WTF_CSRF_FIELD_NAME', 'csrf_token')
+    try:
+        validate_csrf(request.headers.get('X-CSRFToken') or request.form.get(field_name))
+    except ValidationError:
+        abort(400)
+
+
+def read_bulk_user_ids() -> list:
+    """
+    Reading the targeted user ids of a bulk operation: ?ids=1&ids=2, ids=1,2 or {"ids": [1, 2]},
+    or every user of an admin listing: filter=active|disabled|waiting.
+    The request must carry the CSRF token (check_csrf_token).
+    """
+    check_csrf_token()
+
+    payload = request.get_json(silent=True)
+    if payload is None:
+        payload = {}
+    if not isinstance(payload, dict):
+        abort(400)
+
+    listing = payload.get('filter') or request.values.get('filter')
+    max_ids = current_app.config['USER_BULK_MAX_IDS']
+
+    if listing:
+        if not isinstance(listing, str) or listing not in USER_LISTINGS:
+            abort(400)
+        return UserService.get_listing_ids(listing, limit=max_ids)
+
+    if 'ids' in payload:
+        raw_ids = payload['ids']
+        # a JSON string would be read char by char, and int() accepts the booleans/floats
+        if not isinstance(raw_ids, type([])) or any(isinstance(id, (bool, float)) for id in raw_ids):
+            abort(400)
+    else:
+        raw_ids = [id for value in request.values.getlist('ids') for id in value.split(',')]
+
+    try:
+        # (the `list` name is shadowed by the list view of this module)
+        ids = [*dict.fromkeys(int(id) for id in raw_ids)]
+    except (TypeError, ValueError):
+        abort(400)
+
+    if not ids or len(ids) > max_ids:
+        abort(400)
+    return ids
+
+
+def bulk_response(results: dict):
+    return jsonify(
+        succeeded=sum(1 for success, _ in results.values() if success),
+        failed=sum(1 for success, _ in results.values() if not success),
+        results={str(id): {'success': success, 'message': message} for id, (success, message) in results.items()},
+    )
+
+
+@user.route('/bulk/activate', methods=['POST'])
+@admin_permission.require(http_exception=403)
+def bulk_activate():
+    return bulk_response(UserService.bulk_activate(read_bulk_user_ids()))
+
+
+@user.route('/bulk/deactivate', methods=['POST'])
+@admin_permission.require(http_exception=403)
+def bulk_deactivate():
+    return bulk_response(UserService.bulk_deactivate(read_bulk_user_ids()))
+
+
+@user.route('/bulk/verify', methods=['POST'])
+@admin_permission.require(http_exception=403)
+def bulk_verify():
+    return bulk_response(UserService.bulk_verify(read_bulk_user_ids()))
@@ -0,0 +1,68 @@
+import csv
+import io
+import json
+from datetime import datetime
+
+
+class UserExport:
+    MIMETYPES = {
+        'csv': 'text/csv; charset=utf-8',
+        'ndjson': 'application/x-ndjson',
+    }
+
+    # rows buffered per yielded chunk
+    CHUNK_ROWS = 500
+
+    # a cell starting with one of them runs as a formula in Excel/Sheets (the names and emails are self-registered)
+    FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+    @staticmethod
+    def serialize(value):
+        return value.isoformat(sep=' ', timespec='seconds') if isinstance(value, datetime) else value
+
+    @staticmethod
+    def csv_cell(value):
+        """
+        Serializing :value for a spreadsheet, the text that would be read as a formula is prefixed with a quote.
+        """
+        value = UserExport.serialize(value)
+        if isinstance(value, str) and value.startswith(UserExport.FORMULA_PREFIXES):
+            return "'" + value
+        return value
+
+    @staticmethod
+    def csv_chunks(rows, header: list):
+        """
+        Yielding the rows as CSV text (cells escaped by csv_cell), the header line is sent before the query even runs.
+        """
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(header)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+        for index, row in enumerate(rows, start=1):
+            writer.writerow([UserExport.csv_cell(value) for value in row])
+            if index % UserExport.CHUNK_ROWS == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+
+        if buffer.tell():
+            yield buffer.getvalue()
+
+    @staticmethod
+    def ndjson_chunks(rows):
+        """
+        Yielding the rows as newline-delimited JSON objects.
+        """
+        lines = []
+        for row in rows:
+            lines.append(json.dumps({key: UserExport.serialize(value) for key, value in row._mapping.items()}, ensure_ascii=False))
+            if len(lines) == UserExport.CHUNK_ROWS:
+                yield '\n'.join(lines) + '\n'
+                lines = []
+
+        if lines:
+            yield '\n'.join(lines) + '\n'
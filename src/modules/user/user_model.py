@@ -4,14 +4,14 @@ import bcrypt
 from sqlalchemy.orm import relationship
 from flask import request
 from flask_login import UserMixin, current_user
-from flask_bcrypt import Bcrypt
-from sqlalchemy import String, Integer, Boolean, DateTime, Column, ForeignKey
+from sqlalchemy import String, Integer, Boolean, DateTime, Column, ForeignKey, Index
 
 # from werkzeug.security import generate_password_hash, check_password_hash
 
 from .user_constants import *
 
 from src import db, db_session
+from src.base.helpers import passwords
 
 
 def gen_alternative_id():
@@ -20,7 +20,6 @@ def gen_alternative_id():
 
 class User(UserMixin, db.Model):
     __tablename__ = 'User'
-    __table_args__ = {'extend_existing': True}
 
     # BASE USER FIELDS ----------------------------------------------------------------------------------------
     id = Column(Integer, primary_key=True)
@@ -39,11 +38,20 @@ class User(UserMixin, db.Model):
     activated = Column(Boolean, nullable=False, default=False)
     created_time = Column(DateTime, nullable=False, default=datetime.now())
     verified_time = Column(DateTime) # thời gian chấp nhận tài khoản được đăng ký
+    updated_time = Column(DateTime, default=datetime.now, onupdate=datetime.now) # validator of the profile pages (NULL -> created_time)
 
     # roleId:3 == Envoy
     role_id = Column(Integer, ForeignKey('Role.id'), nullable=False, default=3)
     role = relationship('Role', backref='users')
 
+    # composite indexes matching the admin listings' filters + keyset order (see UserService.get_listing)
+    __table_args__ = (
+        Index('ix_User_listing_active', activated, role_id, verified_time.desc(), id),
+        Index('ix_User_listing_disabled', activated, created_time.desc(), id),
+        Index('ix_User_listing_waiting', activated, role_id, verified_time, created_time.desc(), id),
+        {'extend_existing': True},
+    )
+
     def __init__(self, email: str, phone_number: str, 
         first_name: str=None, last_name: str=None, 
         raw_password=None, avatar_url=None, 
@@ -64,7 +72,6 @@ class User(UserMixin, db.Model):
         # if raw_password provided through the constructor
         if raw_password:
             self.password_hash = User.gen_password_hash(raw_password)
-            print(f'hashing the password {raw_password}:', self.password_hash)
 
     def get_id(self):
         """
@@ -74,6 +81,10 @@ class User(UserMixin, db.Model):
         return self.alternative_id
     
 
+    @property
+    def last_modified(self) -> datetime:
+        return self.updated_time or self.created_time
+
     @property
     def full_name(self):
         return f"{self.last_name} {self.first_name}"
@@ -84,14 +95,20 @@ class User(UserMixin, db.Model):
     @staticmethod
     def gen_password_hash(raw_password):
         # return generate_password_hash(raw_password)
-        return Bcrypt().generate_password_hash(raw_password)
+        return passwords.hash_password(raw_password)
 
     def check_password(self, raw_password: str):
         """
         Checking if the raw_password matches the password of this User instance.
         """
         # return check_password_hash(self.password_hash, raw_password)
-        return Bcrypt().check_password_hash(self.password_hash, raw_password) if self.password_hash is not None else None
+        return passwords.check_password(self.password_hash, raw_password) if self.password_hash is not None else None
+
+    def password_needs_rehash(self) -> bool:
+        """
+        Checking if the stored hash was made with another work factor than BCRYPT_LOG_ROUNDS.
+        """
+        return passwords.needs_rehash(self.password_hash)
 
     @staticmethod
     def is_email_already_exists(email: str) -> bool:
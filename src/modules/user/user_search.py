@@ -0,0 +1,152 @@
+"""
+Full-text search over the users (names, email, phone number), with pluggable backends:
+
+- fts5: a SQLite FTS5 index kept in sync with the User table by triggers, ranked with bm25.
+- like: prefix LIKE matching on the indexed columns, for the other databases.
+"""
+import re
+import unicodedata
+
+from flask import current_app
+from sqlalchemy import Column, Float, Integer, MetaData, String, Table, and_, event, or_, text
+
+from src import db
+from src.modules.user.user_model import User
+
+# the FTS5 virtual table, outside of db.Model's metadata so create_all does not create it as a regular table
+# (`rank` and the column named after the table are FTS5 hidden columns)
+user_search_table = Table(
+    'UserSearch', MetaData(),
+    Column('rowid', Integer, primary_key=True),
+    Column('name', String),
+    Column('email', String),
+    Column('phone_number', String),
+    Column('rank', Float, nullable=False), # bm25, never NULL
+    Column('UserSearch', String),
+)
+
+# the indexed name: "last_name first_name", with đ/Đ folded by hand (they are letters, not accented d's for unicode61)
+USER_SEARCH_NAME_SQL = "replace(replace(coalesce({row}.last_name, '') || ' ' || coalesce({row}.first_name, ''), 'đ', 'd'), 'Đ', 'D')"
+
+
+def normalize_search_text(value: str) -> str:
+    """
+    Folding :value to lowercase ASCII letters: "Nguyễn Tuấn Đạt" -> "nguyen tuan dat".
+    """
+    value = unicodedata.normalize('NFD', value.replace('đ', 'd').replace('Đ', 'D'))
+    return ''.join(char for char in value if not unicodedata.combining(char)).lower()
+
+
+def split_search_terms(value: str, max_terms: int) -> list:
+    """
+    Splitting a query the way the FTS5 unicode61 tokenizer splits the indexed text (on anything but letters and digits).
+    """
+    return re.findall(r'[^\W_]+', value or '')[:max_terms]
+
+
+class SQLiteFTS5UserSearch:
+    """
+    Prefix queries ("tuan"* AND "bvu"*) on the UserSearch FTS5 index, the order is (bm25 rank, id).
+    """
+
+    @staticmethod
+    def install(connection):
+        """
+        Creating the index and its triggers if missing (idempotent), then filling it from the existing users.
+        """
+        exists = connection.execute(text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'UserSearch'")).first()
+        if exists:
+            return
+
+        connection.execute(text(
+            'CREATE VIRTUAL TABLE "UserSearch" USING fts5('
+            "name, email, phone_number, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+        ))
+        # the name matches weigh more than the email/phone number ones
+        connection.execute(text("""INSERT INTO "UserSearch" ("UserSearch", rank) VALUES ('rank', 'bm25(10.0, 2.0, 1.0)')"""))
+
+        connection.execute(text(f"""
+            CREATE TRIGGER "UserSearch_after_insert" AFTER INSERT ON "User" BEGIN
+                INSERT INTO "UserSearch" (rowid, name, email, phone_number)
+                VALUES (new.id, {USER_SEARCH_NAME_SQL.format(row='new')}, new.email, new.phone_number);
+            END"""))
+        connection.execute(text(f"""
+            CREATE TRIGGER "UserSearch_after_update" AFTER UPDATE OF first_name, last_name, email, phone_number ON "User" BEGIN
+                UPDATE "UserSearch" SET name = {USER_SEARCH_NAME_SQL.format(row='new')}, email = new.email, phone_number = new.phone_number
+                WHERE rowid = new.id;
+            END"""))
+        connection.execute(text("""
+            CREATE TRIGGER "UserSearch_after_delete" AFTER DELETE ON "User" BEGIN
+                DELETE FROM "UserSearch" WHERE rowid = old.id;
+            END"""))
+
+        name_sql = USER_SEARCH_NAME_SQL.format(row='"User"')
+        connection.execute(text(f'INSERT INTO "UserSearch" (rowid, name, email, phone_number) SELECT id, {name_sql}, email, phone_number FROM "User"'))
+
+    @staticmethod
+    def search(terms: list):
+        # the tokenizer already strips the accents of the indexed text, the query is folded the same way
+        match = ' '.join(f'"{normalize_search_text(term)}"*' for term in terms)
+        query = db.session.query(User)\
+            .join(user_search_table, user_search_table.c.rowid == User.id)\
+            .filter(user_search_table.c.UserSearch.op('MATCH')(match))
+        return query, [(user_search_table.c.rank, 'asc'), (User.id, 'asc')]
+
+
+class PrefixLikeUserSearch:
+    """
+    Every term must prefix a word of the names, the email or the phone number.
+    Only the "starts with" LIKEs can use the column indexes, the "% word" ones fall back to scanning the index.
+    Accent-insensitive matching depends on the column collation (e.g. utf8mb4_unicode_ci on MySQL).
+    """
+
+    @staticmethod
+    def install(connection):
+        pass
+
+    @staticmethod
+    def search(terms: list):
+        columns = [User.last_name, User.first_name, User.email, User.phone_number]
+        query = db.session.query(User).filter(and_(*[
+            or_(*[clause for column in columns for clause in (column.ilike(f'{term}%'), column.ilike(f'% {term}%'))])
+            for term in terms
+        ]))
+        return query, [(User.first_name, 'asc'), (User.id, 'asc')]
+
+
+USER_SEARCH_BACKENDS = {
+    'fts5': SQLiteFTS5UserSearch,
+    'like': PrefixLikeUserSearch,
+}
+
+
+class UserSearch:
+
+    @staticmethod
+    def get_backend():
+        """
+        Returning the configured backend (USER_SEARCH_BACKEND), or the best one for the database.
+        """
+        name = current_app.config['USER_SEARCH_BACKEND']
+        if name is None:
+            name = 'fts5' if db.engine.dialect.name == 'sqlite' else 'like'
+        return USER_SEARCH_BACKENDS[name]
+
+    @staticmethod
+    def search(query_string: str):
+        """
+        Returning the (query, keyset order) of the users matching :query_string, or None if it has no terms.
+        """
+        terms = split_search_terms(query_string, current_app.config['USER_SEARCH_MAX_TERMS'])
+        if not terms:
+            return None
+        return UserSearch.get_backend().search(terms)
+
+
+@event.listens_for(User.__table__, 'after_create')
+def install_user_search(target, connection, **kwargs):
+    """
+    Creating the search index together with the User table (create_all).
+    """
+    if connection.dialect.name == 'sqlite':
+        SQLiteFTS5UserSearch.install(connection)
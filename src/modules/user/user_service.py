@@ -1,11 +1,232 @@
 from datetime import datetime
 from uuid import uuid1, uuid4
 from src import db, logger
-from src.modules.user.user_model import User, gen_alternative_id
+from src.modules.user.user_model import User, Role, gen_alternative_id
+from src.modules.user.user_cache import UserCache
+from src.base.helpers.passwords import hash_password_async
+from src.base.helpers.pagination import KeysetPagination
 from flask import current_app
 
+# the admin listings: (filters, keyset order ending with the primary key)
+USER_LISTINGS = {
+    'active': (
+        [User.activated == True],
+        [(User.role_id, 'asc'), (User.verified_time, 'desc'), (User.id, 'asc')],
+    ),
+    'disabled': (
+        [User.activated == False, User.verified_time != None],
+        [(User.created_time, 'desc'), (User.id, 'asc')],
+    ),
+    'waiting': (
+        [User.activated == False, User.verified_time == None, User.role_id == 3],
+        [(User.created_time, 'desc'), (User.id, 'asc')],
+    ),
+}
+
+# the exported columns of /users/export
+USER_EXPORT_COLUMNS = [
+    User.id, User.email, User.phone_number, User.first_name, User.last_name,
+    Role.code.label('role'), User.activated, User.created_time, User.verified_time,
+]
+
+
 class UserService:
 
+    @staticmethod
+    def get_version() -> tuple:
+        """
+        Returning the (version, updated_time) of the users table, bumped by every change made through UserService.
+        """
+        from flask import g, has_request_context
+        from src.modules.setting.setting_model import TableVersion
+
+        # read once per request (login user snapshot, listing validators)
+        if has_request_context() and 'users_version' in g:
+            return g.users_version
+
+        row = db.session.query(TableVersion.version, TableVersion.updated_time).filter(TableVersion.name == User.__tablename__).first()
+        version = (row.version, row.updated_time) if row else (0, None)
+        if has_request_context():
+            g.users_version = version
+        return version
+
+
+    @staticmethod
+    def bump_version():
+        """
+        Incrementing the users table version in the caller's transaction, a plain UPDATE of the row
+        seeded by the migration (or `flask seed`): no insert racing between the workers.
+        """
+        from flask import g, has_app_context
+        from sqlalchemy import update
+        from src.modules.setting.setting_model import TableVersion
+
+        if has_app_context():
+            g.pop('users_version', None)
+
+        result = db.session.execute(
+            update(TableVersion)
+            .where(TableVersion.name == User.__tablename__)
+            .values(version=TableVersion.version + 1, updated_time=datetime.now())
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount == 0:
+            logger.warning('No TableVersion row for the User table, run `flask seed`: the cached pages and users are not invalidated')
+
+
+    @staticmethod
+    def get_listing(name: str):
+        """
+        Returning the (query, keyset order) of an admin listing.
+        """
+        filters, order_by = USER_LISTINGS[name]
+        return db.session.query(User).filter(*filters), order_by
+
+
+    @staticmethod
+    def get_listing_ids(name: str, limit: int) -> list:
+        query, order_by = UserService.get_listing(name)
+        return [row[0] for row in query.with_entities(User.id).order_by(*KeysetPagination.order_clauses(order_by)).limit(limit).all()]
+
+
+    @staticmethod
+    def iter_export_rows(listing: str = None, chunk_size: int = 1000):
+        """
+        Streaming the users of an admin listing (or all users) from a server-side cursor, :chunk_size rows at a time.
+        """
+        query = db.session.query(*USER_EXPORT_COLUMNS).join(Role, User.role_id == Role.id)
+        if listing:
+            filters, order_by = USER_LISTINGS[listing]
+            query = query.filter(*filters).order_by(*KeysetPagination.order_clauses(order_by))
+        else:
+            query = query.order_by(User.id.asc())
+
+        return query.yield_per(chunk_size)
+
+
+    @staticmethod
+    def bulk_update(ids: list, rotate_alternative_id: bool = False, **values) -> list:
+        """
+        Applying :values to the users :ids in a single UPDATE ... WHERE id IN (...),
+        plus one executemany pass giving each user a new alternative_id (revoking its login sessions).
+        Returning the previous alternative_ids, to invalidate after the commit.
+        """
+        from sqlalchemy import bindparam, update
+
+        old_alternative_ids = [row[0] for row in db.session.query(User.alternative_id).filter(User.id.in_(ids)).all()]
+        db.session.execute(update(User).where(User.id.in_(ids)).values(**values).execution_options(synchronize_session=False))
+        UserService.bump_version()
+
+        if rotate_alternative_id:
+            db.session.execute(
+                update(User.__table__).where(User.__table__.c.id == bindparam('user_id')).values(alternative_id=bindparam('new_alternative_id')),
+                [{'user_id': id, 'new_alternative_id': gen_alternative_id()} for id in ids],
+            )
+        return old_alternative_ids
+
+
+    @staticmethod
+    def bulk_activate(ids: list) -> dict:
+        """
+        Kích hoạt hàng loạt: the waiting envoys are verified, the locked accounts are re-activated.
+        Returning {id: (success, message)}.
+        """
+        users = db.session.query(User.id, User.activated, User.verified_time, User.role_id).filter(User.id.in_(ids)).all()
+        results = {id: (False, 'The user no longer exists') for id in ids}
+
+        waiting_ids = [user.id for user in users if user.role_id == 3 and user.verified_time is None]
+        locked_ids = [user.id for user in users if user.id not in waiting_ids and not user.activated]
+        results.update({user.id: (True, 'Already activated') for user in users if user.activated})
+
+        if waiting_ids:
+            results.update(UserService.bulk_verify(waiting_ids))
+
+        if locked_ids:
+            try:
+                old_alternative_ids = UserService.bulk_update(locked_ids, activated=True)
+                db.session.commit()
+                UserCache.invalidate(*old_alternative_ids)
+                results.update({id: (True, 'Activated') for id in locked_ids})
+            except Exception as e:
+                logger.error(e)
+                db.session.rollback()
+                results.update({id: (False, 'Error occured when activate the user') for id in locked_ids})
+
+        return results
+
+
+    @staticmethod
+    def bulk_deactivate(ids: list) -> dict:
+        """
+        Khóa hàng loạt, the admin users cannot be deactivated.
+        Returning {id: (success, message)}.
+        """
+        users = db.session.query(User.id, User.role_id).filter(User.id.in_(ids)).all()
+        results = {id: (False, 'The user no longer exists') for id in ids}
+        results.update({user.id: (False, 'Cannot deactivate the admin user') for user in users if user.role_id == 1})
+        deactivated_ids = [user.id for user in users if user.role_id != 1]
+
+        if deactivated_ids:
+            try:
+                old_alternative_ids = UserService.bulk_update(deactivated_ids, rotate_alternative_id=True, activated=False)
+                db.session.commit()
+                UserCache.invalidate(*old_alternative_ids)
+                results.update({id: (True, 'Deactivated') for id in deactivated_ids})
+            except Exception as e:
+                logger.error(e)
+                db.session.rollback()
+                results.update({id: (False, 'Error occured when deactivate the user') for id in deactivated_ids})
+
+        return results
+
+
+    @staticmethod
+    def bulk_verify(ids: list) -> dict:
+        """
+        Xác thực hàng loạt tài khoản đại sứ: the random passwords are hashed in parallel on the hashing pool,
+        the notification emails are queued in one batch, in the same transaction.
+        Returning {id: (success, message)}.
+        """
+        from sqlalchemy import bindparam, update
+        from src.modules.email.email_service import EmailService
+
+        users = db.session.query(User.id, User.email, User.first_name, User.last_name)\
+            .filter(User.id.in_(ids), User.role_id == 3, User.verified_time == None)\
+            .all()
+        results = {id: (False, 'The user is not an envoy waiting for verification') for id in ids}
+        if not users:
+            return results
+
+        user_random_passwords = {user.id: ''.join(uuid1().hex.split('-'))[:10] for user in users}
+        password_hashes = {id: hash_password_async(password) for id, password in user_random_passwords.items()}
+
+        try:
+            verified_ids = [user.id for user in users]
+            old_alternative_ids = UserService.bulk_update(verified_ids, activated=True, verified_time=datetime.now())
+            db.session.execute(
+                update(User.__table__).where(User.__table__.c.id == bindparam('user_id')).values(password_hash=bindparam('new_password_hash')),
+                [{'user_id': id, 'new_password_hash': password_hash.result()} for id, password_hash in password_hashes.items()],
+            )
+
+            EmailService.enqueue_many([
+                UserService.build_register_success_email(
+                    receiver_email=user.email,
+                    receiver_name=f"{user.last_name} {user.first_name}",
+                    password=user_random_passwords[user.id],
+                )
+                for user in users
+            ])
+            db.session.commit()
+            UserCache.invalidate(*old_alternative_ids)
+            results.update({id: (True, 'Verified') for id in verified_ids})
+        except Exception as e:
+            logger.error(e)
+            db.session.rollback()
+            results.update({user.id: (False, 'Error occured when verify the envoy') for user in users})
+
+        return results
+
+
     @staticmethod
     def activate(user: User):
         """
@@ -13,7 +234,9 @@ class UserService:
         """
         try:
             user.activated = True
+            UserService.bump_version()
             db.session.commit()
+            UserCache.invalidate(user.alternative_id)
             return True
         except Exception as e:
             logger.error(e)
@@ -27,9 +250,12 @@ class UserService:
         Bỏ kích hoạt lại tài khoản đã khóa trước đó.
         """
         try:
+            old_alternative_id = user.alternative_id
             user.activated = False
             user.alternative_id = gen_alternative_id() # lấy mã mới để loại bỏ các phiên đăng nhập cũ trên các máy client khác
+            UserService.bump_version()
             db.session.commit()
+            UserCache.invalidate(old_alternative_id)
             return True
         except Exception as e:
             logger.error(e)
@@ -44,17 +270,18 @@ class UserService:
         """
         try:
             user_random_password = ''.join(uuid1().hex.split('-'))[:10]
-
+            user.password_hash = User.gen_password_hash(user_random_password)
             user.activated = True
-            user.password_hash = user.gen_password_hash(user_random_password)
             user.verified_time = datetime.now()
-            db.session.commit()
 
             UserService.send_register_success_email(
                 receiver_email=user.email, 
-                receiver_name=user.organization_representer_person_name, 
+                receiver_name=user.full_name,
                 password=user_random_password,
             )
+            UserService.bump_version()
+            db.session.commit()
+            UserCache.invalidate(user.alternative_id)
 
             return True
         except Exception as e:
@@ -64,15 +291,20 @@ class UserService:
 
 
     @staticmethod
-    def send_register_success_email(receiver_email: str, receiver_name: str, password: str):
-        from flask_mail import Message
-        from src import mail
-        msg = Message(f'Thông báo xét duyệt tài khoản Đại sứ BVU', sender = current_app.config['MAIL_USERNAME'], recipients = [receiver_email])
-        msg.html = f"""
-        Xin chào {receiver_name},<br /><br />
-        Đây là tin nhắn tự động được gửi từ hệ thống Cổng thông tin Đại sứ BVU.<br/>
+    def build_register_success_email(receiver_email: str, receiver_name: str, password: str) -> dict:
+        """
+        Rendering the register_success template, compiled once per process (bulk verifications render it per envoy).
+        """
+        from src.modules.setting.setting_cache import EmailTemplateCache
+        from src.modules.setting.setting_constants import EMAIL_TEMPLATE_REGISTER_SUCCESS
+        subject, html = EmailTemplateCache.render(EMAIL_TEMPLATE_REGISTER_SUCCESS, receiver_name=receiver_name, password=password)
+        return dict(subject=subject, recipients=[receiver_email], html=html)
+
 
-        </br/>Tài khoản của bạn đã được chấp thuận, bây giờ bạn có thể đăng nhập vào website thông qua mật khẩu được cung cấp dưới đây:
-        <h1>{password}</h1>
+    @staticmethod
+    def send_register_success_email(receiver_email: str, receiver_name: str, password: str):
+        """
+        Queueing the registration success email, committed by the caller together with the verification.
         """
-        mail.send(msg)
+        from src.modules.email.email_service import EmailService
+        EmailService.enqueue(**UserService.build_register_success_email(receiver_email, receiver_name, password))
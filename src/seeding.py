@@ -1,13 +1,41 @@
 import datetime
+import click
+from flask.cli import with_appcontext
 from flask_sqlalchemy import SQLAlchemy
 
 from src.modules.user.user_model import gen_alternative_id
 
 
 def start_seeding(db: SQLAlchemy):
+    seed_table_versions(db)
     seed_roles(db)
     seed_root_user(db)
     seed_manager_users(db)
+    seed_email_templates(db)
+
+
+@click.command('seed')
+@with_appcontext
+def seed_command():
+    """Seeding the initial roles and users (skipped at boot on fast start)."""
+    from src import db
+    start_seeding(db)
+
+
+def seed_table_versions(db: SQLAlchemy):
+    """
+    Seeding the version rows of the versioned tables (the databases created by create_all, not by the migrations).
+    """
+    from .modules.setting.setting_model import TableVersion
+    from .modules.user.user_model import User
+
+    seeded_names = {name for name, in db.session.query(TableVersion.name).all()}
+    missing_names = [name for name in (User.__tablename__,) if name not in seeded_names]
+
+    if missing_names:
+        print('\nMISSING TABLE VERSIONS DETECTED, START SEDDING...')
+        db.session.add_all([TableVersion(name=name, version=0, updated_time=datetime.datetime.now()) for name in missing_names])
+        db.session.commit()
 
 
 def seed_roles(db: SQLAlchemy):
@@ -66,7 +94,7 @@ def seed_root_user(db: SQLAlchemy):
         )
 
         root_user.role_id = 1
-        root_user.alternative_id = gen_alternative_id().hex
+        root_user.alternative_id = gen_alternative_id()
 
         db.session.add(root_user)
         db.session.commit()
@@ -96,7 +124,7 @@ def seed_manager_users(db: SQLAlchemy):
             raw_password='123456',
         )
         manager_user_1.role_id = 2
-        manager_user_1.alternative_id = gen_alternative_id().hex
+        manager_user_1.alternative_id = gen_alternative_id()
         manager_user_1.verified_time = datetime.datetime.now()
 
         manager_user_2 = User(
@@ -108,7 +136,7 @@ def seed_manager_users(db: SQLAlchemy):
             raw_password='123456',
         )
         manager_user_2.role_id = 2
-        manager_user_2.alternative_id = gen_alternative_id().hex
+        manager_user_2.alternative_id = gen_alternative_id()
         manager_user_2.verified_time = datetime.datetime.now()
 
         manager_user_3 = User(
@@ -120,8 +148,28 @@ def seed_manager_users(db: SQLAlchemy):
             raw_password='123456',
         )
         manager_user_3.role_id = 2
-        manager_user_3.alternative_id = gen_alternative_id().hex
+        manager_user_3.alternative_id = gen_alternative_id()
         manager_user_3.verified_time = datetime.datetime.now()
 
         db.session.add_all([manager_user_1, manager_user_2, manager_user_3])
         db.session.commit()
+
+
+def seed_email_templates(db: SQLAlchemy):
+    """
+    Seeding the default email templates that are not in the DB yet (the edited ones are kept).
+    """
+    from .modules.setting.setting_model import EmailTemplates
+    from .modules.setting.setting_constants import DEFAULT_EMAIL_TEMPLATES
+
+    seeded_names = {name for name, in db.session.query(EmailTemplates.name).all()}
+    missing_templates = [
+        EmailTemplates(name=name, subject=subject, content=content)
+        for name, (subject, content) in DEFAULT_EMAIL_TEMPLATES.items()
+        if name not in seeded_names
+    ]
+
+    if missing_templates:
+        print('\nMISSING EMAIL TEMPLATES DETECTED, START SEDDING...')
+        db.session.add_all(missing_templates)
+        db.session.commit()
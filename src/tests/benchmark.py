@@ -0,0 +1,295 @@
+"""
+Benchmarking the portal endpoints through the Flask test client, against a synthetic dataset.
+
+    python -m src.tests.benchmark --users 100000 --output bench.json
+
+Results (throughput, latency percentiles, SQL statements per request) are written as JSON,
+so two releases can be compared with a plain diff.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import tempfile
+import time
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+from sqlalchemy import event
+
+from src.base.helpers import passwords
+
+BENCHMARK_PASSWORD = 'benchmark'
+ADMIN_EMAIL = 'tuanna@student.bvu.edu.vn'
+ADMIN_PASSWORD = '123456'
+
+# share of the synthetic users per role_id, and per listing
+ROLE_WEIGHTS = {1: 0.001, 2: 0.02, 3: 0.979}
+ACTIVE_RATIO = 0.6
+DISABLED_RATIO = 0.15 # the rest of the envoys are waiting for a verification
+
+
+def create_benchmark_app(database_uri: str, config: dict = None):
+    from src import create_app
+    os.environ.setdefault('CONFIG_FILE', 'src.config.ProductionEnvironment')
+    return create_app({
+        'SQLALCHEMY_DATABASE_URI': database_uri,
+        'SQLALCHEMY_TRACK_MODIFICATIONS': False,
+        'DEBUG': False,
+        'FAST_START': True,
+        'BOOT_CREATE_SCHEMA': False,
+        'BOOT_SEED': False,
+        'BOOT_REPORT': False,
+        'WARMUP': False, # the database is created and seeded after the app
+        'WTF_CSRF_ENABLED': False,
+        'RATELIMIT_ENABLED': False,
+        'RATELIMIT_STORAGE_URI': 'memory://',
+        'SESSION_STORE_URI': 'memory://',
+        'SESSION_COOKIE_SECURE': False,
+        'MAIL_SERVER': None, # no SMTP error reports from the benchmark
+        'METRICS_MULTIPROC_DIR': None, # in-process metrics, nothing left in the workers' directory
+        **(config or {}),
+    })
+
+
+def seed_users(db, count: int, chunk_size: int = 10000, seed: int = 42):
+    """
+    Bulk inserting :count users across the three roles, all sharing BENCHMARK_PASSWORD.
+    """
+    from src.seeding import start_seeding
+    from src.modules.user.user_model import User
+
+    db.create_all()
+    start_seeding(db)
+
+    randomizer = random.Random(seed)
+    password_hash = passwords.hash_password(BENCHMARK_PASSWORD)
+    started = datetime(2022, 1, 1)
+    roles, weights = zip(*ROLE_WEIGHTS.items())
+
+    for chunk_start in range(0, count, chunk_size):
+        rows = []
+        for index in range(chunk_start, min(chunk_start + chunk_size, count)):
+            role_id = randomizer.choices(roles, weights)[0]
+            created_time = started + timedelta(seconds=index * 30)
+            state = randomizer.random()
+
+            if role_id != 3 or state < ACTIVE_RATIO:
+                activated, verified_time = True, created_time + timedelta(days=1)
+            elif state < ACTIVE_RATIO + DISABLED_RATIO:
+                activated, verified_time = False, created_time + timedelta(days=1)
+            else:
+                activated, verified_time = False, None
+
+            rows.append({
+                'alternative_id': uuid4().hex,
+                'email': f'bench{index}@example.com',
+                'phone_number': f'9{index:010d}',
+                'first_name': f'Envoy {index}',
+                'last_name': 'Bench',
+                'password_hash': password_hash,
+                'activated': activated,
+                'created_time': created_time,
+                'verified_time': verified_time,
+                'role_id': role_id,
+            })
+
+        db.session.execute(User.__table__.insert(), rows)
+        db.session.commit()
+
+
+def percentile(sorted_values: list, ratio: float) -> float:
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(ratio * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def measure(client, statement_counter: list, requests: list) -> dict:
+    """
+    Sending the (method, url, data) :requests one by one and summarizing them.
+    A scenario is not valid without requests, or with server errors (their latency is not the endpoint's).
+    """
+    latencies, statements, status_codes = [], [], {}
+
+    started = time.perf_counter()
+    for method, url, data in requests:
+        statement_counter[0] = 0
+        request_started = time.perf_counter()
+        response = client.open(url, method=method, data=data)
+        latencies.append((time.perf_counter() - request_started) * 1000)
+        statements.append(statement_counter[0])
+        status_codes[str(response.status_code)] = status_codes.get(str(response.status_code), 0) + 1
+    elapsed = time.perf_counter() - started
+
+    server_errors = sum(count for status_code, count in status_codes.items() if int(status_code) >= 500)
+    latencies.sort()
+    rounded = lambda value, digits: round(value, digits) if value is not None else None
+    return {
+        'requests': len(requests),
+        'status_codes': status_codes,
+        'server_errors': server_errors,
+        'valid': bool(requests) and not server_errors,
+        'throughput_rps': round(len(requests) / elapsed, 2) if requests and elapsed else None,
+        'latency_ms': {
+            'mean': round(sum(latencies) / len(latencies), 3) if latencies else None,
+            'p50': rounded(percentile(latencies, 0.50), 3),
+            'p90': rounded(percentile(latencies, 0.90), 3),
+            'p99': rounded(percentile(latencies, 0.99), 3),
+            'max': rounded(latencies[-1] if latencies else None, 3),
+        },
+        'sql_statements': {
+            'mean': round(sum(statements) / len(statements), 2) if statements else None,
+            'max': max(statements, default=None),
+        },
+    }
+
+
+def build_scenarios(db, requests: int, seed: int = 42) -> dict:
+    """
+    Returning {endpoint name: (needs admin login, [(method, url, data), ...])}.
+    activate/deactivate consume distinct users, so they are sent to different ids.
+    """
+    from src.base.helpers.pagination import KeysetPagination
+    from src.modules.user.user_model import User
+    from src.modules.user.user_service import UserService
+
+    randomizer = random.Random(seed)
+
+    def sample_ids(*filters, limit=requests):
+        ids = [row[0] for row in db.session.query(User.id).filter(User.role_id == 3, *filters).limit(limit * 20).all()]
+        return randomizer.sample(ids, min(limit, len(ids)))
+
+    # a cursor in the middle of the active listing: deep pages must cost the same as the first one
+    query, order_by = UserService.get_listing('active')
+    middle = query.order_by(None).count() // 2
+    middle_row = query.with_entities(*[column for column, _ in order_by])\
+        .order_by(*KeysetPagination.order_clauses(order_by))\
+        .offset(middle).limit(1).first()
+    deep_cursor = KeysetPagination.encode_cursor(tuple(middle_row)) if middle_row else None
+
+    login_emails = [row[0] for row in db.session.query(User.email).filter(User.activated == True, User.role_id == 3).limit(requests).all()]
+    any_ids = [row[0] for row in db.session.query(User.id).limit(requests * 20).all()]
+    db.session.remove()
+
+    return {
+        'login': (False, [('POST', '/login', {'email': email, 'password': BENCHMARK_PASSWORD}) for email in login_emails]),
+        'users': (True, [('GET', '/users', None)] * requests),
+        'users_deep_page': (True, [('GET', f'/users?after={deep_cursor}', None)] * requests),
+        'users_disabled': (True, [('GET', '/users/disabled', None)] * requests),
+        'users_waiting': (True, [('GET', '/users/waiting', None)] * requests),
+        'user_detail': (True, [('GET', f'/users/{randomizer.choice(any_ids)}', None) for _ in range(requests)]),
+        'activate': (True, [('POST', f'/users/activate/{id}', None) for id in sample_ids(User.activated == False, User.verified_time != None)]),
+        'deactivate': (True, [('POST', f'/users/deactivate/{id}', None) for id in sample_ids(User.activated == True)]),
+    }
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return None
+
+
+def run_benchmark(users: int = 100000, requests: int = 200, warmup: int = 10, database_uri: str = None, only: list = None, templates: dict = None) -> dict:
+    """
+    Returning the results of every endpoint, 'valid' is False if one of them has no valid measure (see measure).
+    :templates: {name: source} served before the app's own templates.
+    """
+    from jinja2 import ChoiceLoader, DictLoader
+    from src import db
+
+    if requests < 1 or warmup < 0:
+        raise ValueError('requests must be at least 1, warmup at least 0')
+
+    temporary_dir = None
+    if database_uri is None:
+        temporary_dir = tempfile.TemporaryDirectory()
+        database_uri = f"sqlite:///{os.path.join(temporary_dir.name, 'benchmark.sqlite3')}"
+
+    app = create_benchmark_app(database_uri)
+    if templates:
+        app.jinja_env.loader = ChoiceLoader([DictLoader(templates), app.jinja_env.loader])
+    statement_counter = [0]
+
+    with app.app_context():
+        seeding_started = time.perf_counter()
+        seed_users(db, users)
+        seeding_seconds = time.perf_counter() - seeding_started
+        scenarios = build_scenarios(db, requests)
+
+        def count_statement(*args):
+            statement_counter[0] += 1
+        event.listen(db.engine, 'before_cursor_execute', count_statement)
+
+    admin_client = app.test_client()
+    admin_client.post('/login', data={'email': ADMIN_EMAIL, 'password': ADMIN_PASSWORD})
+
+    results = {}
+    for name, (as_admin, scenario_requests) in scenarios.items():
+        if only and name not in only:
+            continue
+
+        client = admin_client if as_admin else app.test_client()
+        # the warm-up requests are replayed from the scenario, except for the state changing ones
+        if warmup and name not in ('activate', 'deactivate'):
+            measure(client, statement_counter, scenario_requests[:warmup])
+        results[name] = measure(client, statement_counter, scenario_requests)
+
+    if temporary_dir is not None:
+        with app.app_context():
+            db.engine.dispose()
+        temporary_dir.cleanup()
+
+    return {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'git_revision': git_revision(),
+            'python': platform.python_version(),
+            'database': database_uri.split(':', 1)[0],
+            'users': users,
+            'requests_per_endpoint': requests,
+            'seeding_seconds': round(seeding_seconds, 2),
+        },
+        'valid': all(result['valid'] for result in results.values()),
+        'endpoints': results,
+    }
+
+
+def at_least(minimum: int):
+    def parse(value: str) -> int:
+        number = int(value)
+        if number < minimum:
+            raise argparse.ArgumentTypeError(f'must be at least {minimum}')
+        return number
+    return parse
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarking the portal endpoints against a synthetic dataset.')
+    parser.add_argument('--users', type=at_least(1), default=100000, help='number of synthetic users (100k-1M)')
+    parser.add_argument('--requests', type=at_least(1), default=200, help='requests per endpoint')
+    parser.add_argument('--warmup', type=at_least(0), default=10, help='warm-up requests per endpoint')
+    parser.add_argument('--database-uri', default=None, help='defaults to a temporary SQLite database (the data is inserted into it!)')
+    parser.add_argument('--only', nargs='*', default=None, help='endpoint names to run')
+    parser.add_argument('--output', default='bench_output.json')
+    args = parser.parse_args()
+
+    results = run_benchmark(args.users, args.requests, args.warmup, args.database_uri, args.only)
+    with open(args.output, 'w') as output:
+        json.dump(results, output, indent=2, sort_keys=True)
+
+    for name, result in results['endpoints'].items():
+        print(f"{name:<18} {result['throughput_rps']!s:>9} req/s  p50 {result['latency_ms']['p50']!s:>8}ms  "
+              f"p99 {result['latency_ms']['p99']!s:>8}ms  sql {result['sql_statements']['mean']!s:>5}  {result['status_codes']}"
+              f"{'' if result['valid'] else '  INVALID'}")
+    print(f'\nResults written to {args.output}')
+
+    if not results['valid']:
+        raise SystemExit('Some endpoints failed (5xx) or sent no request, their figures are not a measure')
+
+
+if __name__ == '__main__':
+    main()
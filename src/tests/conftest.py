@@ -0,0 +1,22 @@
+import pytest
+from flask import Flask
+
+from src import db
+
+
+@pytest.fixture
+def db_app(tmp_path):
+    """
+    A bare app bound to a temporary SQLite database holding the models' schema.
+    """
+    from src.modules.user.user_model import User, Role
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'test.sqlite3'}"
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
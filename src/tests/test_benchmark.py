@@ -0,0 +1,47 @@
+import pytest
+
+from src.tests.benchmark import measure, run_benchmark
+
+# the pages' own templates are not part of the tree
+TEMPLATES = {
+    'users.html': '{% for user in users %}{{ user.email }}{% endfor %}',
+    'profile.html': '{{ user.email }}',
+}
+
+
+def test_benchmark_smoke():
+    results = run_benchmark(users=300, requests=3, warmup=1, templates=TEMPLATES)
+
+    assert results['meta']['users'] == 300
+    assert results['valid']
+    assert set(results['endpoints']) == {'login', 'users', 'users_deep_page', 'users_disabled', 'users_waiting', 'user_detail', 'activate', 'deactivate'}
+
+    for name, result in results['endpoints'].items():
+        assert result['requests'] == 3, name
+        assert result['valid'] and result['server_errors'] == 0, name
+        assert all(200 <= int(status_code) < 400 for status_code in result['status_codes']), (name, result['status_codes'])
+        assert result['latency_ms']['p50'] <= result['latency_ms']['p99'] <= result['latency_ms']['max']
+        assert result['sql_statements']['mean'] >= 1
+
+    for name in ('login', 'activate', 'deactivate'):
+        assert results['endpoints'][name]['status_codes'] == {'302': 3}, name
+
+
+def test_server_errors_invalidate_the_scenario():
+    # without the templates, the listings fail
+    results = run_benchmark(users=50, requests=2, warmup=0, only=['users', 'login'])
+
+    assert not results['valid']
+    assert results['endpoints']['users']['status_codes'] == {'500': 2}
+    assert results['endpoints']['users']['server_errors'] == 2 and not results['endpoints']['users']['valid']
+    assert results['endpoints']['login']['valid']
+
+
+def test_empty_samples():
+    result = measure(None, [0], [])
+    assert result['requests'] == 0 and not result['valid']
+    assert result['throughput_rps'] is None
+    assert result['latency_ms'] == {'mean': None, 'p50': None, 'p90': None, 'p99': None, 'max': None}
+
+    with pytest.raises(ValueError):
+        run_benchmark(users=10, requests=0)
@@ -0,0 +1,82 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from src.base.helpers.boot import BootReport
+
+ROOT_DIR = Path(__file__).parents[2]
+
+# a fresh interpreter: the other tests already imported flask_mail in this one
+BOOT_SCRIPT = """
+import json, sys
+import sqlalchemy
+from src import create_app
+
+app = create_app(json.loads(sys.argv[1]))
+print(json.dumps({
+    'flask_mail': 'flask_mail' in sys.modules,
+    'boot_create_schema': app.config['BOOT_CREATE_SCHEMA'],
+    'boot_seed': app.config['BOOT_SEED'],
+    'tables': sqlalchemy.inspect(sqlalchemy.create_engine(app.config['SQLALCHEMY_DATABASE_URI'])).get_table_names(),
+    'phases': [name for name, _ in app.boot_report.phases],
+}))
+"""
+
+
+def boot(tmp_path, config: dict) -> dict:
+    env = {**os.environ, 'CONFIG_FILE': 'src.config.DevelopmentEnvironment', 'PYTHONPATH': str(ROOT_DIR)}
+    for name in ('FAST_START', 'BOOT_CREATE_SCHEMA', 'BOOT_SEED'):
+        env.pop(name, None)
+
+    config = {
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'boot.sqlite3'}",
+        'FLASK_ENV': 'development',
+        'BOOT_REPORT': False,
+        'WARMUP': False,
+        'METRICS_MULTIPROC_DIR': None,
+        'SESSION_STORE_URI': 'memory://',
+        **config,
+    }
+    result = subprocess.run([sys.executable, '-c', BOOT_SCRIPT, json.dumps(config)], cwd=ROOT_DIR, env=env, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def test_fast_start_skips_the_boot_steps_and_flask_mail(tmp_path):
+    booted = boot(tmp_path, {'FAST_START': True})
+
+    assert booted['flask_mail'] is False
+    assert (booted['boot_create_schema'], booted['boot_seed']) == (False, False)
+    assert booted['tables'] == []
+
+    # the imports, then every create_app step
+    assert booted['phases'][:4] == ['import App', 'import flask_limiter', 'import flask_sqlalchemy', 'import flask_principal']
+    for name in ('load_environment_variables', 'register_blueprints', 'init_db', 'start_seeding', 'init_mail'):
+        assert name in booted['phases']
+
+
+def test_a_single_boot_step_can_be_enabled(tmp_path):
+    booted = boot(tmp_path, {'FAST_START': True, 'BOOT_CREATE_SCHEMA': True})
+
+    assert (booted['boot_create_schema'], booted['boot_seed']) == (True, False)
+    assert 'User' in booted['tables']
+
+
+def test_full_start_creates_the_schema_and_seeds(tmp_path):
+    booted = boot(tmp_path, {'FAST_START': False})
+
+    assert (booted['boot_create_schema'], booted['boot_seed']) == (True, True)
+    assert 'TableVersion' in booted['tables']
+
+
+def test_boot_report_format():
+    report = BootReport([('import App', 120.0)])
+    with report.phase('init_db'):
+        pass
+
+    lines = report.format().splitlines()
+    assert [line.split()[0] for line in lines] == ['import', 'init_db', 'total']
+    assert lines[0].endswith('120.0ms')
+    assert report.total_ms >= 120.0
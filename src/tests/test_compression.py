@@ -0,0 +1,115 @@
+import gzip
+
+import pytest
+from flask import Response, jsonify, render_template_string, request
+from jinja2 import ChoiceLoader, DictLoader
+from markupsafe import escape
+
+from src import db
+from src.base.helpers import metrics
+from src.tests.benchmark import create_benchmark_app, seed_users, ADMIN_EMAIL, ADMIN_PASSWORD
+
+ROWS = ''.join(f'<tr><td>Envoy {i}</td><td>envoy{i}@student.bvu.edu.vn</td><td>Active</td></tr>' for i in range(500))
+
+
+@pytest.fixture
+def compressing_app(tmp_path):
+    app = create_benchmark_app(f"sqlite:///{tmp_path / 'test.sqlite3'}", {
+        'COMPRESSION_ENABLED': True,
+        'COMPRESSION_MIN_SIZE': 500,
+    })
+
+    @app.route('/large-page')
+    def large_page():
+        return f'<table>{ROWS}</table>'
+
+    @app.route('/small-page')
+    def small_page():
+        return '<p>ok</p>'
+
+    @app.route('/large-json')
+    def large_json():
+        return jsonify(rows=[{'id': i, 'email': f'envoy{i}@student.bvu.edu.vn'} for i in range(500)])
+
+    @app.route('/form-page')
+    def form_page():
+        # what a FlaskForm's csrf_token field renders
+        from flask_wtf.csrf import generate_csrf
+        return render_template_string('<form><input name="csrf_token" value="{{ csrf_token() }}"></form>{{ rows|safe }}', rows=ROWS, csrf_token=generate_csrf)
+
+    @app.route('/search-page')
+    def search_page():
+        return f'<p>{escape(request.args.get("q", ""))}</p><table>{ROWS}</table>'
+
+    @app.route('/streamed-page')
+    def streamed_page():
+        return Response((ROWS for _ in range(2)), mimetype='text/html')
+
+    return app
+
+
+def test_large_responses_are_gzipped(compressing_app):
+    client = compressing_app.test_client()
+    for path in ('/large-page', '/large-json'):
+        response = client.get(path, headers={'Accept-Encoding': 'gzip, deflate'})
+        plain = client.get(path)
+
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert 'Accept-Encoding' in response.headers['Vary']
+        assert gzip.decompress(response.get_data()) == plain.get_data()
+        assert len(response.get_data()) * 5 < len(plain.get_data())
+
+    assert b'encoding="gzip",endpoint="large_page"' in metrics.render()[0]
+
+
+def test_small_streamed_and_unaccepted_responses_are_sent_as_is(compressing_app):
+    client = compressing_app.test_client()
+
+    assert 'Content-Encoding' not in client.get('/small-page', headers={'Accept-Encoding': 'gzip'}).headers
+    assert 'Content-Encoding' not in client.get('/streamed-page', headers={'Accept-Encoding': 'gzip'}).headers
+    assert 'Content-Encoding' not in client.get('/large-page').headers
+    assert 'Content-Encoding' not in client.get('/large-page', headers={'Accept-Encoding': 'gzip;q=0'}).headers
+
+
+def test_breach_exposed_responses_are_sent_as_is(compressing_app):
+    with compressing_app.app_context():
+        seed_users(db, 1)
+        db.session.remove()
+    client = compressing_app.test_client()
+
+    # the CSRF token of the session, next to the request's input
+    response = client.get('/form-page?q=tuan', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in response.headers
+    assert b'name="csrf_token"' in response.get_data()
+    assert client.get('/form-page', headers={'Accept-Encoding': 'gzip'}).headers['Content-Encoding'] == 'gzip'
+
+    # reflected input: compressed for the anonymous visitors only
+    assert client.get('/search-page?q=tuan', headers={'Accept-Encoding': 'gzip'}).headers['Content-Encoding'] == 'gzip'
+    client.post('/login', data={'email': ADMIN_EMAIL, 'password': ADMIN_PASSWORD})
+    assert 'Content-Encoding' not in client.get('/search-page?q=tuan', headers={'Accept-Encoding': 'gzip'}).headers
+    assert client.get('/search-page', headers={'Accept-Encoding': 'gzip'}).headers['Content-Encoding'] == 'gzip'
+
+
+def test_real_pages_with_a_form_are_compressed_without_request_input(compressing_app):
+    # the pages' own templates are not part of the tree: the real views and forms, stub templates
+    padding = '{% for i in range(300) %}<tr><td>row {{ i }}</td></tr>{% endfor %}'
+    compressing_app.jinja_env.loader = ChoiceLoader([DictLoader({
+        'login.html': '<form>{{ form.csrf_token }}{{ form.email }}</form>' + padding,
+        'users.html': '{% for user in users %}{{ user.email }}{% endfor %}' + padding,
+    }), compressing_app.jinja_env.loader])
+    with compressing_app.app_context():
+        seed_users(db, 5)
+        db.session.remove()
+    client = compressing_app.test_client()
+
+    compressing_app.config['WTF_CSRF_ENABLED'] = True
+    response = client.get('/login', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert b'name="csrf_token"' in gzip.decompress(response.get_data())
+    assert 'Content-Encoding' not in client.get('/login?email=envoy', headers={'Accept-Encoding': 'gzip'}).headers
+
+    compressing_app.config['WTF_CSRF_ENABLED'] = False
+    client.post('/login', data={'email': ADMIN_EMAIL, 'password': ADMIN_PASSWORD})
+    assert client.get('/users', headers={'Accept-Encoding': 'gzip'}).headers['Content-Encoding'] == 'gzip'
+    response = client.get('/users?count=2', headers={'Accept-Encoding': 'gzip'})
+    assert response.status_code == 200 and 'Content-Encoding' not in response.headers
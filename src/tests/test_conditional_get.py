@@ -0,0 +1,95 @@
+import importlib.util
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
+from jinja2 import ChoiceLoader, DictLoader
+
+from src import db
+from src.modules.setting.setting_model import TableVersion
+from src.modules.user.user_model import User
+from src.modules.user.user_service import UserService
+from src.seeding import seed_table_versions
+from src.tests.benchmark import create_benchmark_app, seed_users, ADMIN_EMAIL, ADMIN_PASSWORD
+
+MIGRATION_PATH = Path(__file__).parents[2] / 'migrations/versions/a7d3c5e8f912_add_user_updated_time_and_table_versions.py'
+
+
+@pytest.fixture
+def listing_client(tmp_path):
+    app = create_benchmark_app(f"sqlite:///{tmp_path / 'test.sqlite3'}")
+    # the page templates are not needed to answer the revalidations
+    app.jinja_env.loader = ChoiceLoader([DictLoader({'users.html': '{{ get_flashed_messages() }}{% for user in users %}{{ user.email }}{% endfor %}'}), app.jinja_env.loader])
+    with app.app_context():
+        seed_users(db, 10)
+        db.session.remove()
+
+    client = app.test_client()
+    client.post('/login', data={'email': ADMIN_EMAIL, 'password': ADMIN_PASSWORD})
+    return client
+
+
+def test_unchanged_listing_is_not_modified(listing_client):
+    page = listing_client.get('/users')
+    assert page.status_code == 200
+    etag, last_modified = page.headers['ETag'], page.headers['Last-Modified']
+
+    not_modified = listing_client.get('/users', headers={'If-None-Match': etag})
+    assert not_modified.status_code == 304
+    assert not_modified.get_data() == b''
+    assert not_modified.headers['ETag'] == etag
+
+    assert listing_client.get('/users', headers={'If-Modified-Since': last_modified}).status_code == 304
+    # If-None-Match wins over If-Modified-Since
+    assert listing_client.get('/users', headers={'If-None-Match': '"other"', 'If-Modified-Since': last_modified}).status_code == 200
+
+
+def test_changes_and_pending_flashes_render_the_page(listing_client):
+    etag = listing_client.get('/users').headers['ETag']
+
+    with listing_client.session_transaction() as session:
+        session['_flashes'] = [('success', 'Deactivated')]
+    assert listing_client.get('/users', headers={'If-None-Match': etag}).status_code == 200
+
+    # the flash was consumed by that render
+    assert listing_client.get('/users', headers={'If-None-Match': etag}).status_code == 304
+
+    with listing_client.application.app_context():
+        id = User.query.filter(User.role_id == 3).first().id
+    listing_client.post('/users/bulk/deactivate', data={'ids': str(id)})
+    assert listing_client.get('/users', headers={'If-None-Match': etag}).status_code == 200
+
+
+def test_version_bumps_update_the_seeded_row(db_app):
+    seed_table_versions(db)
+    seed_table_versions(db)
+    assert [(row.name, row.version) for row in TableVersion.query.all()] == [('User', 0)]
+
+    UserService.bump_version()
+    UserService.bump_version()
+    db.session.commit()
+    assert UserService.get_version()[0] == 2
+
+    # no row, no insert racing with the other workers
+    TableVersion.query.delete()
+    UserService.bump_version()
+    db.session.commit()
+    assert TableVersion.query.count() == 0
+
+
+def test_migration_seeds_the_users_version(db_app):
+    spec = importlib.util.spec_from_file_location('add_user_updated_time_and_table_versions', MIGRATION_PATH)
+    migration = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(migration)
+
+    TableVersion.__table__.drop(db.engine)
+    with db.engine.begin() as connection:
+        with Operations.context(MigrationContext.configure(connection)):
+            connection.exec_driver_sql('ALTER TABLE "User" DROP COLUMN updated_time')
+            migration.upgrade()
+
+    row = TableVersion.query.one()
+    assert (row.name, row.version) == ('User', 0)
+    assert datetime.now() - row.updated_time < timedelta(minutes=1)
@@ -0,0 +1,129 @@
+import socket
+from datetime import datetime, timedelta
+
+import pytest
+from aiosmtpd.controller import Controller
+
+from src import db
+from src.modules.email.email_constants import *
+from src.modules.email.email_model import EmailOutbox
+from src.modules.email.email_service import EmailService
+from src.tests.benchmark import create_benchmark_app
+
+
+class StandInSMTPHandler:
+    """
+    A local SMTP server recording the messages, rejecting or disconnecting on the listed recipients.
+    """
+
+    def __init__(self):
+        self.messages = []
+        self.rejected = set()
+        self.disconnect_on = set()
+
+    async def handle_DATA(self, server, session, envelope):
+        recipient = envelope.rcpt_tos[0]
+        if recipient in self.disconnect_on:
+            server.transport.close()
+            return '421 Closing connection'
+        if recipient in self.rejected:
+            return '550 Mailbox unavailable'
+        self.messages.append((recipient, envelope.content.decode()))
+        return '250 OK'
+
+
+@pytest.fixture
+def smtp_server():
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        port = probe.getsockname()[1]
+
+    handler = StandInSMTPHandler()
+    controller = Controller(handler, hostname='127.0.0.1', port=port)
+    controller.start()
+    yield handler, port
+    controller.stop()
+
+
+@pytest.fixture
+def outbox_app(tmp_path, smtp_server):
+    _, port = smtp_server
+    app = create_benchmark_app(f"sqlite:///{tmp_path / 'test.sqlite3'}", {
+        'EMAIL_OUTBOX_BACKOFF_SECONDS': 30,
+        'EMAIL_OUTBOX_MAX_ATTEMPTS': 2,
+    })
+    # after the boot: no SMTP error reports to the stand-in
+    app.config.update(MAIL_SERVER='127.0.0.1', MAIL_PORT=port, MAIL_USE_SSL=False, MAIL_USE_TLS=False, MAIL_USERNAME=None, MAIL_PASSWORD=None)
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+
+
+def enqueue(*recipients):
+    for recipient in recipients:
+        EmailService.enqueue(subject='Mật khẩu', html=f'<h1>secret-{recipient}</h1>', recipients=[recipient], sender='portal@bvu.edu.vn')
+    db.session.commit()
+
+
+def test_batch_is_sent_and_bodies_are_cleared(outbox_app, smtp_server):
+    handler, _ = smtp_server
+    enqueue('a@bvu.edu.vn', 'b@bvu.edu.vn', 'c@bvu.edu.vn')
+
+    assert EmailService.dispatch_batch() == {'sent': 3, 'retried': 0, 'failed': 0}
+    assert [recipient for recipient, _ in handler.messages] == ['a@bvu.edu.vn', 'b@bvu.edu.vn', 'c@bvu.edu.vn']
+    assert 'secret-a@bvu.edu.vn' in handler.messages[0][1]
+
+    emails = db.session.query(EmailOutbox).all()
+    assert {email.status for email in emails} == {EMAIL_OUTBOX_STATUS_SENT}
+    assert {email.html for email in emails} == {''}
+    assert EmailService.dispatch_batch() == {'sent': 0, 'retried': 0, 'failed': 0}
+
+
+def test_rejected_email_is_retried_with_backoff_then_given_up(outbox_app, smtp_server):
+    handler, _ = smtp_server
+    handler.rejected.add('b@bvu.edu.vn')
+    enqueue('a@bvu.edu.vn', 'b@bvu.edu.vn')
+
+    started = datetime.now()
+    assert EmailService.dispatch_batch() == {'sent': 1, 'retried': 1, 'failed': 0}
+    rejected = db.session.query(EmailOutbox).filter(EmailOutbox.recipients == 'b@bvu.edu.vn').one()
+    assert rejected.status == EMAIL_OUTBOX_STATUS_PENDING and rejected.attempts == 1
+    assert started + timedelta(seconds=29) < rejected.next_attempt_time < datetime.now() + timedelta(seconds=31)
+    assert '550' in rejected.last_error
+
+    # not due before the backoff
+    assert EmailService.dispatch_batch() == {'sent': 0, 'retried': 0, 'failed': 0}
+
+    rejected.next_attempt_time = datetime.now()
+    db.session.commit()
+    assert EmailService.dispatch_batch() == {'sent': 0, 'retried': 0, 'failed': 1}
+    assert rejected.status == EMAIL_OUTBOX_STATUS_FAILED and rejected.html == ''
+
+
+def test_disconnection_releases_the_rest_of_the_batch(outbox_app, smtp_server):
+    handler, _ = smtp_server
+    handler.disconnect_on.add('b@bvu.edu.vn')
+    enqueue('a@bvu.edu.vn', 'b@bvu.edu.vn', 'c@bvu.edu.vn')
+
+    assert EmailService.dispatch_batch() == {'sent': 1, 'retried': 1, 'failed': 0}
+    statuses = dict(db.session.query(EmailOutbox.recipients, EmailOutbox.status).all())
+    assert statuses == {'a@bvu.edu.vn': EMAIL_OUTBOX_STATUS_SENT, 'b@bvu.edu.vn': EMAIL_OUTBOX_STATUS_PENDING, 'c@bvu.edu.vn': EMAIL_OUTBOX_STATUS_PENDING}
+
+    # the unattempted email is due right away, without a failed attempt
+    handler.disconnect_on.clear()
+    assert EmailService.dispatch_batch() == {'sent': 1, 'retried': 0, 'failed': 0}
+    assert db.session.query(EmailOutbox.attempts).filter(EmailOutbox.recipients == 'c@bvu.edu.vn').scalar() == 0
+
+
+def test_claimed_emails_are_not_claimed_twice(outbox_app):
+    enqueue('a@bvu.edu.vn', 'b@bvu.edu.vn')
+
+    assert len(EmailService.claim_batch(10)) == 2
+    assert EmailService.claim_batch(10) == []
+
+    # a dead dispatcher's lease expires
+    db.session.query(EmailOutbox).update({EmailOutbox.next_attempt_time: datetime.now() - timedelta(seconds=1)})
+    db.session.commit()
+    assert len(EmailService.claim_batch(10)) == 2
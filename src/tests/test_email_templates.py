@@ -0,0 +1,100 @@
+import pytest
+from jinja2.exceptions import SecurityError
+
+from src import db
+from src.modules.setting import setting_cache
+from src.modules.setting.setting_cache import EmailTemplateCache
+from src.modules.setting.setting_constants import DEFAULT_EMAIL_TEMPLATES, EMAIL_TEMPLATE_REGISTER_CONFIRM
+from src.modules.setting.setting_model import EmailTemplates
+from src.seeding import seed_email_templates
+
+
+class Clock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def templates_app(db_app, monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(setting_cache.time, 'monotonic', clock)
+    monkeypatch.setattr(EmailTemplateCache, '_templates', {})
+    monkeypatch.setattr(EmailTemplateCache, '_next_checks', {})
+    EmailTemplateCache.configure(check_interval=30)
+    db_app.clock = clock
+    return db_app
+
+
+def render_confirm(**context):
+    return EmailTemplateCache.render(EMAIL_TEMPLATE_REGISTER_CONFIRM, **{'receiver_name': 'Tuấn', 'code': '123456', **context})
+
+
+def test_unseeded_templates_fall_back_to_the_defaults(templates_app):
+    subject, html = render_confirm()
+    default_subject, _ = DEFAULT_EMAIL_TEMPLATES[EMAIL_TEMPLATE_REGISTER_CONFIRM]
+
+    assert subject == default_subject
+    assert 'Tuấn' in html and '123456' in html
+    assert EmailTemplateCache.get(EMAIL_TEMPLATE_REGISTER_CONFIRM).version == 0
+
+    # the seeded row replaces the default at the next check
+    seed_email_templates(db)
+    assert EmailTemplateCache.get(EMAIL_TEMPLATE_REGISTER_CONFIRM).version == 1
+
+
+def test_local_edits_are_seen_after_the_commit(templates_app):
+    seed_email_templates(db)
+    render_confirm()
+    template = EmailTemplates.query.filter(EmailTemplates.name == EMAIL_TEMPLATE_REGISTER_CONFIRM).one()
+
+    template.subject = 'Rolled back {{ code }}'
+    db.session.flush()
+    db.session.rollback()
+    assert render_confirm()[0] != 'Rolled back 123456'
+
+    template.subject = 'Mã xác minh {{ code }}'
+    db.session.commit()
+    assert render_confirm()[0] == 'Mã xác minh 123456'
+    assert EmailTemplateCache.get(EMAIL_TEMPLATE_REGISTER_CONFIRM).version == 2
+
+
+def test_other_workers_edits_are_seen_after_the_check_interval(templates_app):
+    seed_email_templates(db)
+    first = EmailTemplateCache.get(EMAIL_TEMPLATE_REGISTER_CONFIRM)
+
+    # edited by another worker: no commit in this process
+    with db.engine.begin() as connection:
+        connection.execute(
+            EmailTemplates.__table__.update()
+            .where(EmailTemplates.name == EMAIL_TEMPLATE_REGISTER_CONFIRM)
+            .values(subject='Mã {{ code }}', version=EmailTemplates.version + 1)
+        )
+    assert EmailTemplateCache.get(EMAIL_TEMPLATE_REGISTER_CONFIRM) is first
+
+    templates_app.clock.now += 30
+    assert render_confirm()[0] == 'Mã 123456'
+
+    # unchanged versions are not compiled again
+    compiled = EmailTemplateCache.get(EMAIL_TEMPLATE_REGISTER_CONFIRM)
+    templates_app.clock.now += 30
+    assert EmailTemplateCache.get(EMAIL_TEMPLATE_REGISTER_CONFIRM) is compiled
+
+
+def test_templates_are_escaped_and_sandboxed(templates_app):
+    seed_email_templates(db)
+    template = EmailTemplates.query.filter(EmailTemplates.name == EMAIL_TEMPLATE_REGISTER_CONFIRM).one()
+    template.subject = 'Chào {{ receiver_name }}'
+    template.content = '<p>{{ receiver_name }}</p>'
+    db.session.commit()
+
+    subject, html = render_confirm(receiver_name='<b>Tuấn</b>')
+    assert subject == 'Chào <b>Tuấn</b>'
+    assert html == '<p>&lt;b&gt;Tuấn&lt;/b&gt;</p>'
+
+    template.content = "{{ code.__class__.__mro__ }}"
+    db.session.commit()
+    with pytest.raises(SecurityError):
+        render_confirm()
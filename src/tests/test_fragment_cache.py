@@ -0,0 +1,57 @@
+import os
+
+import pytest
+from flask import render_template_string
+
+from src.base.helpers import fragment_cache
+from src.base.helpers.fragment_cache import DeferredValue, DiskFragmentStore, FragmentCache
+from src.tests.benchmark import create_benchmark_app
+
+TEMPLATE = '{% cache key %}{% for row in rows %}<td>{{ row }}</td>{% endfor %}{% endcache %}'
+
+
+def test_fragments_are_rendered_once_per_key(tmp_path):
+    app = create_benchmark_app(f"sqlite:///{tmp_path / 'test.sqlite3'}", {'FRAGMENT_CACHE_DIR': str(tmp_path / 'fragments')})
+    queries = []
+
+    def rows(version):
+        queries.append(version)
+        return ['<envoy>', version]
+
+    with app.test_request_context():
+        first = render_template_string(TEMPLATE, key=('users', 1), rows=DeferredValue(lambda: rows(1)))
+        cached = render_template_string(TEMPLATE, key=('users', 1), rows=DeferredValue(lambda: rows(1)))
+        bumped = render_template_string(TEMPLATE, key=('users', 2), rows=DeferredValue(lambda: rows(2)))
+        uncached = render_template_string(TEMPLATE, rows=DeferredValue(lambda: rows(3)))
+
+    assert first == cached == '<td>&lt;envoy&gt;</td><td>1</td>'
+    assert bumped == '<td>&lt;envoy&gt;</td><td>2</td>'
+    assert uncached == '<td>&lt;envoy&gt;</td><td>3</td>'
+    assert queries == [1, 2, 3]
+
+    # an other worker finds the fragment on disk
+    app.jinja_env.fragment_cache.clear()
+    with app.test_request_context():
+        assert render_template_string(TEMPLATE, key=('users', 1), rows=DeferredValue(lambda: rows(1))) == first
+    assert queries == [1, 2, 3]
+
+
+def test_failed_disk_writes_leave_no_temporary_file(tmp_path, monkeypatch):
+    store = DiskFragmentStore(str(tmp_path), ttl=60)
+
+    def disk_full(source, destination):
+        raise OSError(28, 'No space left on device')
+    monkeypatch.setattr(fragment_cache.os, 'replace', disk_full)
+    store.set(('users', 1), '<td>envoy</td>')
+    assert os.listdir(tmp_path) == []
+
+    # the page still renders from the worker's memory
+    cache = FragmentCache(directory=str(tmp_path))
+    assert cache.get_or_render(('users', 1), lambda: '<td>envoy</td>') == '<td>envoy</td>'
+    assert cache.get_or_render(('users', 1), lambda: pytest.fail('rendered again')) == '<td>envoy</td>'
+    assert os.listdir(tmp_path) == []
+
+    monkeypatch.undo()
+    store.set(('users', 1), '<td>envoy</td>')
+    assert store.get(('users', 1)) == '<td>envoy</td>'
+    assert not any(name.endswith('.tmp') for name in os.listdir(tmp_path))
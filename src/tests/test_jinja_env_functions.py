@@ -0,0 +1,74 @@
+from pathlib import Path
+
+import pytest
+
+from src.base.helpers import jinja_env_functions
+from src.base.helpers.jinja_env_functions import get_svg_content, get_svg_sprite, preload_svg_icons
+from src.tests.benchmark import create_benchmark_app
+
+MAIL_ICON = 'icons/fluent/outline/mail.svg'
+
+
+@pytest.fixture
+def svg_reads(monkeypatch):
+    # a fresh cache per test, the module state outlives the apps
+    monkeypatch.setattr(jinja_env_functions, '_svg_sources', {})
+    monkeypatch.setattr(jinja_env_functions, '_svg_sprite_mode', False)
+    jinja_env_functions._get_rendered_svg.cache_clear()
+    get_svg_sprite.cache_clear()
+
+    reads, path_open = [], Path.open
+    def counting_open(path, *args, **kwargs):
+        if path.suffix == '.svg':
+            reads.append(path.name)
+        return path_open(path, *args, **kwargs)
+
+    monkeypatch.setattr(Path, 'open', counting_open)
+    yield reads
+    jinja_env_functions._get_rendered_svg.cache_clear()
+    get_svg_sprite.cache_clear()
+
+
+def test_icons_are_read_once(tmp_path, svg_reads):
+    app = create_benchmark_app(f"sqlite:///{tmp_path / 'test.sqlite3'}", {'SVG_ICONS_PRELOAD': False})
+    template = app.jinja_env.from_string("{{ get_svg_content('" + MAIL_ICON + "', 20, 20, 'icon')|safe }}")
+
+    first, second = template.render(), template.render()
+    assert first == second
+    assert first.startswith('<svg class="icon" width=20 height=20 ')
+    assert 'fill="#212121"' not in first
+    assert svg_reads == ['mail.svg']
+
+    # another size of the same icon comes from the source cache
+    assert 'width=16' in get_svg_content(MAIL_ICON, 16, 16)
+    assert svg_reads == ['mail.svg']
+
+
+def test_missing_icons_are_not_cached(svg_reads):
+    assert get_svg_content('icons/missing.svg') == ''
+    assert get_svg_content('icons/missing.svg') == ''
+    assert jinja_env_functions._get_rendered_svg.cache_info().currsize == 0
+
+
+def test_preloaded_icons_never_touch_the_disk(svg_reads):
+    count = preload_svg_icons()
+    assert count == len(svg_reads) > 0
+    svg_reads.clear()
+
+    assert get_svg_content(MAIL_ICON).startswith('<svg class="" width=24 height=24 ')
+    assert svg_reads == []
+
+
+def test_sprite_mode_references_the_sprite_symbols(svg_reads):
+    preload_svg_icons(sprite_mode=True)
+
+    icon = get_svg_content(MAIL_ICON, 20, 20, 'icon')
+    assert icon == '<svg class="icon" width=20 height=20><use href="#icon-icons-fluent-outline-mail"></use></svg>'
+
+    sprite = get_svg_sprite()
+    assert sprite.startswith('<svg xmlns="http://www.w3.org/2000/svg" style="display: none">')
+    assert '<symbol id="icon-icons-fluent-outline-mail" viewBox="0 0 24 24">' in sprite
+    assert 'fill="#212121"' not in sprite
+
+    # an icon outside the sprite is not referenced
+    assert get_svg_content('icons/missing.svg') == ''
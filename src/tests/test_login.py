@@ -0,0 +1,36 @@
+import pytest
+from sqlalchemy import event
+
+from src import db
+from src.tests.benchmark import create_benchmark_app, seed_users, ADMIN_EMAIL, ADMIN_PASSWORD
+
+
+@pytest.fixture
+def login_app(tmp_path):
+    app = create_benchmark_app(f"sqlite:///{tmp_path / 'test.sqlite3'}")
+    with app.app_context():
+        seed_users(db, 5)
+        db.session.remove()
+    return app
+
+
+@pytest.fixture
+def statements(login_app):
+    statements = []
+    capture = lambda conn, cursor, statement, parameters, context, executemany: statements.append(statement)
+
+    with login_app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', capture)
+    yield statements
+    event.remove(engine, 'before_cursor_execute', capture)
+
+
+def test_login_selects_the_user_once(login_app, statements):
+    response = login_app.test_client().post('/login', data={'email': ADMIN_EMAIL, 'password': ADMIN_PASSWORD})
+    assert response.status_code == 302
+
+    # the email validators and the view share the row, its role is joined
+    user_selects = [statement for statement in statements if statement.lstrip().startswith('SELECT') and 'FROM "User"' in statement]
+    assert len(user_selects) == 1
+    assert 'JOIN "Role"' in user_selects[0]
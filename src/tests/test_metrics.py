@@ -0,0 +1,63 @@
+import pytest
+from prometheus_client import REGISTRY
+
+from src import db
+from src.base.helpers import metrics
+from src.tests.benchmark import create_benchmark_app, seed_users, ADMIN_EMAIL, ADMIN_PASSWORD
+
+
+@pytest.fixture
+def metrics_app(tmp_path):
+    app = create_benchmark_app(f"sqlite:///{tmp_path / 'test.sqlite3'}", {
+        'METRICS_ALLOWED_NETWORKS': ['127.0.0.0/8', '10.1.0.0/16'],
+        'METRICS_TOKEN': 'scraper-token',
+    })
+    with app.app_context():
+        seed_users(db, 5)
+        db.session.remove()
+    return app
+
+
+def sample(name: str, **labels) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+def test_requests_are_recorded(metrics_app):
+    labels = {'blueprint': 'auth', 'endpoint': 'auth.login'}
+    requests = sample('http_requests_total', method='POST', status='302', **labels)
+    latencies = sample('http_request_duration_seconds_count', method='POST', **labels)
+    statements = sample('http_request_sql_statements_sum', **labels)
+    checks = sample('bcrypt_duration_seconds_count', operation='check')
+
+    client = metrics_app.test_client()
+    assert client.post('/login', data={'email': ADMIN_EMAIL, 'password': ADMIN_PASSWORD}).status_code == 302
+
+    assert sample('http_requests_total', method='POST', status='302', **labels) == requests + 1
+    assert sample('http_request_duration_seconds_count', method='POST', **labels) == latencies + 1
+    assert sample('http_request_sql_statements_sum', **labels) > statements
+    assert sample('bcrypt_duration_seconds_count', operation='check') == checks + 1
+
+    # the scrapes are not recorded
+    scrapes = sample('http_requests_total', blueprint='', endpoint='metrics', method='GET', status='200')
+    body = client.get('/metrics').get_data(as_text=True)
+    assert 'http_requests_total{blueprint="auth",endpoint="auth.login",method="POST",status="302"}' in body
+    assert sample('http_requests_total', blueprint='', endpoint='metrics', method='GET', status='200') == scrapes == 0
+
+
+@pytest.mark.parametrize('remote_addr, headers, status_code', [
+    ('127.0.0.1', {}, 200),
+    ('10.1.2.3', {}, 200),
+    ('203.0.113.7', {}, 404),
+    ('203.0.113.7', {'Authorization': 'Bearer wrong'}, 404),
+    ('203.0.113.7', {'Authorization': 'Bearer scraper-token'}, 200),
+])
+def test_metrics_are_restricted(metrics_app, remote_addr, headers, status_code):
+    client = metrics_app.test_client()
+    response = client.get('/metrics', headers=headers, environ_base={'REMOTE_ADDR': remote_addr})
+    assert response.status_code == status_code
+
+
+def test_scrape_rules():
+    assert metrics.is_scrape_allowed('::1', None, allowed_networks=['::1/128'])
+    assert not metrics.is_scrape_allowed('unknown', None, allowed_networks=['0.0.0.0/0'])
+    assert not metrics.is_scrape_allowed('203.0.113.7', 'Bearer ', token=None, allowed_networks=[''])
@@ -0,0 +1,114 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from src import db
+from src.base.helpers.pagination import InvalidCursorError, KeysetPagination
+from src.modules.user.user_model import User
+from src.modules.user.user_service import UserService
+
+
+@pytest.fixture
+def listing_app(db_app):
+    started = datetime(2022, 1, 1)
+    for index in range(23):
+        user = User(email=f'envoy{index}@example.com', phone_number=f'09{index:08d}')
+        user.alternative_id = f'alternative-{index}'
+        user.role_id = 1 + index % 2
+        user.activated = True
+        user.created_time = started
+        # ties on the verified time, and unverified users sorting last
+        user.verified_time = None if index % 5 == 0 else started + timedelta(days=index % 3)
+        db.session.add(user)
+    db.session.commit()
+    return db_app
+
+
+def expected_ids(order_by):
+    return [row[0] for row in db.session.query(User.id).order_by(*KeysetPagination.order_clauses(order_by)).all()]
+
+
+def test_next_and_prev_cursors_walk_every_row_once(listing_app):
+    query, order_by = UserService.get_listing('active')
+    expected = expected_ids(order_by)
+
+    pages, page = [], KeysetPagination.paginate(query, order_by, per_page=5)
+    assert not page.has_prev
+    while True:
+        pages.append([user.id for user in page])
+        if not page.has_next:
+            break
+        page = KeysetPagination.paginate(query, order_by, after=page.next_cursor, per_page=5)
+
+    assert sum(pages, []) == expected
+    assert [len(ids) for ids in pages] == [5, 5, 5, 5, 3]
+
+    # and back to the first page
+    backwards = [pages[-1]]
+    while page.has_prev:
+        page = KeysetPagination.paginate(query, order_by, before=page.prev_cursor, per_page=5)
+        backwards.insert(0, [user.id for user in page])
+    assert backwards == pages
+
+
+def test_backward_page_before_a_null_key(listing_app):
+    query, order_by = UserService.get_listing('active')
+    expected = expected_ids(order_by)
+    last_null = db.session.get(User, expected[-1])
+    assert last_null.verified_time is None
+
+    cursor = KeysetPagination.encode_cursor((last_null.role_id, None, last_null.id))
+    page = KeysetPagination.paginate(query, order_by, before=cursor, per_page=4)
+    position = expected.index(last_null.id)
+    assert [user.id for user in page] == expected[position - 4:position]
+    assert page.next_cursor is not None
+
+
+def test_cursor_round_trip():
+    values = (2, datetime(2022, 1, 2, 3, 4, 5), None, 'text', 7)
+    assert KeysetPagination.decode_cursor(KeysetPagination.encode_cursor(values)) == values
+
+
+@pytest.mark.parametrize('cursor', ['', 'not base64!', 'bm90IGpzb24', 'W3siJGR0IjoieCJ9XQ'])
+def test_bad_cursors_are_ignored(cursor):
+    assert KeysetPagination.decode_cursor(cursor) is None
+
+
+@pytest.mark.parametrize('values', [
+    (1, 2), # built for another order
+    (1, [2], 3), (1, {'a': 2}, 3), (1, None, 'id'), (1, None, True), ('1', None, 3), (1, 2.5, 3),
+])
+def test_cursors_not_fitting_the_order_are_rejected(listing_app, values):
+    query, order_by = UserService.get_listing('active')
+    cursor = KeysetPagination.encode_cursor(values)
+
+    with pytest.raises(InvalidCursorError):
+        KeysetPagination.paginate(query, order_by, after=cursor, per_page=5)
+    with pytest.raises(InvalidCursorError):
+        KeysetPagination.paginate(query, order_by, before='tampered', per_page=5)
+
+
+def test_nulls_sort_as_the_smallest_values_on_every_database():
+    from sqlalchemy import select
+    from sqlalchemy.dialects import postgresql
+
+    order_by = [(User.role_id, 'asc'), (User.last_name, 'asc'), (User.verified_time, 'desc'), (User.id, 'desc')]
+    statement = str(select(User.id).order_by(*KeysetPagination.order_clauses(order_by)).compile(dialect=postgresql.dialect()))
+    # the NOT NULL columns keep a plain ORDER BY
+    assert statement.endswith('ORDER BY "User".role_id ASC, "User".last_name ASC NULLS FIRST, "User".verified_time DESC NULLS LAST, "User".id DESC')
+
+
+def test_listing_answers_400_to_a_tampered_cursor(tmp_path):
+    from src.tests.benchmark import create_benchmark_app, seed_users, ADMIN_EMAIL, ADMIN_PASSWORD
+
+    app = create_benchmark_app(f"sqlite:///{tmp_path / 'listing.sqlite3'}")
+    with app.app_context():
+        seed_users(db, 5)
+        db.session.remove()
+
+    client = app.test_client()
+    client.post('/login', data={'email': ADMIN_EMAIL, 'password': ADMIN_PASSWORD})
+    tampered = KeysetPagination.encode_cursor((1, [2], 3))
+    assert client.get(f'/users?after={tampered}').status_code == 400
+    assert client.get('/users/waiting?before=tampered').status_code == 400
+    assert client.get(f'/users/search?q=tuan&after={tampered}').status_code == 400
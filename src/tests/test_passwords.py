@@ -0,0 +1,83 @@
+import pytest
+
+from src import db
+from src.base.helpers import passwords
+from src.modules.auth import auth_commands
+from src.modules.user.user_model import User
+from src.tests.benchmark import create_benchmark_app, seed_users, ADMIN_EMAIL, ADMIN_PASSWORD
+
+
+@pytest.fixture
+def passwords_app(tmp_path):
+    # the cheapest work factors, the hashes of another cost are upgraded on login
+    app = create_benchmark_app(f"sqlite:///{tmp_path / 'test.sqlite3'}", {'BCRYPT_LOG_ROUNDS': 5})
+    with app.app_context():
+        seed_users(db, 1)
+        db.session.remove()
+    yield app
+    passwords.configure()
+
+
+def stored_hash(app, email: str = ADMIN_EMAIL):
+    with app.app_context():
+        return User.query.filter(User.email == email).one().password_hash
+
+
+def test_needs_rehash(passwords_app):
+    assert passwords.get_log_rounds(passwords.hash_password('secret')) == 5
+    assert not passwords.needs_rehash(passwords.hash_password('secret'))
+    assert passwords.needs_rehash(passwords.hash_password('secret', log_rounds=4))
+    assert passwords.get_log_rounds('legacy') is None and passwords.needs_rehash('legacy')
+    assert not passwords.needs_rehash(None)
+
+
+def test_login_rehashes_the_other_work_factors(passwords_app):
+    with passwords_app.app_context():
+        user = User.query.filter(User.email == ADMIN_EMAIL).one()
+        user.password_hash = passwords.hash_password(ADMIN_PASSWORD, log_rounds=4)
+        db.session.commit()
+    old_hash = stored_hash(passwords_app)
+
+    client = passwords_app.test_client()
+    # a failed login leaves the hash alone
+    client.post('/login', data={'email': ADMIN_EMAIL, 'password': 'wrong password'})
+    assert stored_hash(passwords_app) == old_hash
+
+    assert client.post('/login', data={'email': ADMIN_EMAIL, 'password': ADMIN_PASSWORD}).status_code == 302
+    new_hash = stored_hash(passwords_app)
+    assert passwords.get_log_rounds(new_hash) == 5
+    assert passwords.check_password(new_hash, ADMIN_PASSWORD)
+
+    # the upgraded hash is kept at the next login
+    client.post('/logout')
+    assert client.post('/login', data={'email': ADMIN_EMAIL, 'password': ADMIN_PASSWORD}).status_code == 302
+    assert stored_hash(passwords_app) == new_hash
+
+
+def test_hashing_pool(passwords_app):
+    passwords.configure(log_rounds=4, workers=2)
+    futures = [passwords.hash_password_async(f'secret-{index}') for index in range(4)]
+    assert all(passwords.check_password(future.result(), f'secret-{index}') for index, future in enumerate(futures))
+
+    # without a pool, hashed on the calling thread
+    passwords.configure(log_rounds=4, workers=0)
+    future = passwords.hash_password_async('secret')
+    assert future.done() and passwords.check_password(future.result(), 'secret')
+
+
+def test_calibrate_bcrypt_picks_the_slowest_factor_under_the_target(passwords_app, monkeypatch):
+    monkeypatch.setattr(auth_commands, 'calibrate_log_rounds', lambda target_ms: [(10, 60.0), (11, 120.0), (12, 240.0), (13, 480.0)])
+    result = passwords_app.test_cli_runner().invoke(args=['auth', 'calibrate-bcrypt', '--target-ms', '250'])
+
+    assert result.exit_code == 0
+    assert 'rounds=13: 480.0ms' in result.output
+    assert 'Set BCRYPT_LOG_ROUNDS = 12 in the config' in result.output
+
+
+def test_calibrate_bcrypt_on_this_host(passwords_app):
+    # every factor is over the target: the first measured one
+    result = passwords_app.test_cli_runner().invoke(args=['auth', 'calibrate-bcrypt', '--target-ms', '0.001'])
+
+    assert result.exit_code == 0
+    assert result.output.startswith('rounds=10: ')
+    assert 'Set BCRYPT_LOG_ROUNDS = 10 in the config' in result.output
@@ -0,0 +1,97 @@
+import pytest
+from limits import parse
+from limits.storage import storage_from_string
+from limits.strategies import FixedWindowRateLimiter, MovingWindowRateLimiter
+
+from src.base.helpers import ratelimit_storage
+from src.base.helpers.ratelimit_storage import SQLiteStorage
+
+
+class Clock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(ratelimit_storage.time, 'time', clock)
+    return clock
+
+
+@pytest.fixture
+def storage_uri(tmp_path):
+    return f"sqlite:///{tmp_path / 'ratelimit.sqlite3'}"
+
+
+def test_incr_counts_within_the_window(storage_uri, clock):
+    storage = SQLiteStorage(storage_uri)
+
+    assert [storage.incr('key', 60) for _ in range(3)] == [1, 2, 3]
+    assert storage.incr('key', 60, amount=2) == 5
+    assert storage.get('key') == 5
+    assert storage.get('other') == 0
+    assert storage.get_expiry('key') == 1060
+
+
+def test_expired_window_restarts(storage_uri, clock):
+    storage = SQLiteStorage(storage_uri)
+    storage.incr('key', 60)
+    storage.incr('key', 60)
+
+    clock.now += 60
+    assert storage.get('key') == 0
+    assert storage.incr('key', 60) == 1
+    assert storage.get_expiry('key') == 1120
+
+
+def test_elastic_expiry_extends_the_window(storage_uri, clock):
+    storage = SQLiteStorage(storage_uri)
+    storage.incr('key', 60)
+
+    clock.now += 30
+    storage.incr('key', 60, elastic_expiry=True)
+    assert storage.get_expiry('key') == 1090
+
+    clock.now += 40
+    assert storage.get('key') == 2
+
+
+def test_instances_share_the_file(storage_uri, clock):
+    # one storage per gunicorn worker
+    first, second = SQLiteStorage(storage_uri), SQLiteStorage(storage_uri)
+
+    first.incr('key', 60)
+    assert second.incr('key', 60) == 2
+    assert first.get('key') == 2
+
+    second.clear('key')
+    assert first.get('key') == 0
+
+
+def test_expired_counters_are_purged(storage_uri, clock, monkeypatch):
+    monkeypatch.setattr(SQLiteStorage, 'PURGE_INTERVAL', 3)
+    storage = SQLiteStorage(storage_uri)
+    storage.incr('old', 10)
+
+    clock.now += 10
+    storage.incr('new', 10)
+    storage.incr('new', 10)
+    rows = storage.connection().execute('SELECT key FROM ratelimit').fetchall()
+    assert rows == [('new',)]
+
+
+def test_registered_for_the_limiters(storage_uri, clock):
+    storage = storage_from_string(storage_uri)
+    assert isinstance(storage, SQLiteStorage)
+    assert storage.check()
+
+    limiter, limit = FixedWindowRateLimiter(storage), parse('2/minute')
+    assert [limiter.hit(limit, 'login') for _ in range(3)] == [True, True, False]
+
+    # fixed windows only: no acquire_entry for the moving window strategy
+    with pytest.raises(NotImplementedError):
+        MovingWindowRateLimiter(storage)
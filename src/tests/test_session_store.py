@@ -0,0 +1,141 @@
+import os
+
+import pytest
+from jinja2 import ChoiceLoader, DictLoader
+
+from src import db
+from src.base.helpers import session_store
+from src.base.helpers.session_store import MemorySessionStore, SQLiteSessionStore, new_session_id, open_session_store
+from src.modules.auth.auth_constants import *
+from src.modules.auth.auth_service import AuthService
+from src.modules.user.user_model import User
+from src.tests.benchmark import create_benchmark_app, seed_users
+
+
+class Clock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(session_store.time, 'time', clock)
+    return clock
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def store(request, tmp_path):
+    return open_session_store('memory://' if request.param == 'memory' else f"sqlite:///{tmp_path / 'sessions.sqlite3'}")
+
+
+def test_entries_expire_after_their_ttl(store, clock):
+    id = new_session_id()
+    data = {'email': 'envoy@student.bvu.edu.vn', 'code': '123456'}
+    store.set(id, data, ttl=60)
+
+    data['code'] = 'changed'
+    assert store.get(id) == {'email': 'envoy@student.bvu.edu.vn', 'code': '123456'}
+    assert store.get(new_session_id()) is None
+
+    clock.now += 60
+    assert store.get(id) is None
+    assert store.purge() == 1
+
+    store.set(id, data, ttl=60)
+    store.delete(id)
+    assert store.get(id) is None
+
+
+def test_sqlite_store_purges_every_interval(tmp_path, clock, monkeypatch):
+    monkeypatch.setattr(SQLiteSessionStore, 'PURGE_INTERVAL', 3)
+    store = SQLiteSessionStore(f"sqlite:///{tmp_path / 'sessions.sqlite3'}")
+    count = lambda: store.connection().execute('SELECT COUNT(*) FROM session').fetchone()[0]
+
+    store.set('old', {}, ttl=10)
+    clock.now += 10
+    store.set('new-1', {}, ttl=10)
+    assert count() == 2
+
+    # the third write purges the expired one
+    store.set('new-2', {}, ttl=10)
+    assert count() == 2
+    assert store.get('old') is None and store.get('new-1') == {}
+
+
+def test_sqlite_store_is_shared_and_reconnects_after_fork(tmp_path):
+    uri = f"sqlite:///{tmp_path / 'sessions.sqlite3'}"
+    store, other_worker = SQLiteSessionStore(uri), SQLiteSessionStore(uri)
+    store.set('registration', {'step': 1}, ttl=60)
+    assert other_worker.get('registration') == {'step': 1}
+
+    parent_connection = store.connection()
+    pid = os.fork()
+    if pid == 0:
+        # the child must not use the parent's sqlite3 connection
+        try:
+            ok = store.connection() is not parent_connection
+            store.set('registration', {'step': 2}, ttl=60)
+        finally:
+            os._exit(0 if ok else 1)
+
+    _, status = os.waitpid(pid, 0)
+    assert os.waitstatus_to_exitcode(status) == 0
+    assert store.connection() is parent_connection
+    assert store.get('registration') == {'step': 2}
+
+
+def test_unknown_store_scheme():
+    assert isinstance(open_session_store('memory://'), MemorySessionStore)
+    with pytest.raises(ValueError):
+        open_session_store('redis://localhost')
+
+
+@pytest.fixture
+def registration_app(tmp_path):
+    app = create_benchmark_app(f"sqlite:///{tmp_path / 'test.sqlite3'}", {
+        'SESSION_STORE_URI': f"sqlite:///{tmp_path / 'sessions.sqlite3'}",
+    })
+    app.jinja_env.loader = ChoiceLoader([DictLoader({
+        'verify-registration.html': '{{ email }}',
+        'registration-success.html': 'registered {{ email }}',
+    }), app.jinja_env.loader])
+    with app.app_context():
+        seed_users(db, 1)
+        db.session.remove()
+    return app
+
+
+def test_verified_registration_deletes_the_store_entry(registration_app):
+    email = 'new.envoy@student.bvu.edu.vn'
+    with registration_app.test_request_context():
+        # what the register view keeps after sending the confirmation email
+        registration_id = AuthService.save_pending_registration({
+            SESSION_REGISTRATION_EMAIL: email,
+            SESSION_REGISTRATION_PHONE: '0912345678',
+            SESSION_REGISTRATION_CONFIRMATION_CODE: '123456',
+        })
+
+    client = registration_app.test_client()
+    with client.session_transaction() as session:
+        session[SESSION_REGISTRATION_ID] = registration_id
+
+    assert client.get('/verify').get_data(as_text=True) == email
+    client.post('/verify', data={'verification_code': '654321'})
+    assert registration_app.session_store.get(registration_id) is not None
+
+    response = client.post('/verify', data={'verification_code': '123456'})
+    assert response.get_data(as_text=True) == f'registered {email}'
+    assert registration_app.session_store.get(registration_id) is None
+    with client.session_transaction() as session:
+        assert SESSION_REGISTRATION_ID not in session
+
+    with registration_app.app_context():
+        user = User.query.filter(User.email == email).one()
+        assert (user.role_id, user.activated) == (3, False)
+
+    # the id cannot be replayed
+    assert client.get('/verify').status_code == 302
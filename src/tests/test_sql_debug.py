@@ -0,0 +1,75 @@
+import pytest
+from flask import render_template_string
+
+from src import db
+from src.base.helpers.sql_debug import RepeatedQueriesError
+from src.modules.user.user_model import User
+from src.tests.benchmark import create_benchmark_app, seed_users
+
+
+@pytest.fixture
+def debug_app(tmp_path):
+    app = create_benchmark_app(f"sqlite:///{tmp_path / 'test.sqlite3'}", {
+        'TESTING': True, # propagating the RepeatedQueriesError to the test client
+        'SQL_DEBUG': True,
+        'SQL_DEBUG_RAISE': True,
+        'SQL_DEBUG_REPEATED_THRESHOLD': 5,
+    })
+    with app.app_context():
+        seed_users(db, 20)
+        ids = [row[0] for row in db.session.query(User.id).limit(10).all()]
+        db.session.remove()
+
+    @app.route('/one-query-per-id')
+    def one_query_per_id():
+        return ','.join(db.session.query(User.email).filter(User.id == id).scalar() for id in ids)
+
+    @app.route('/lazy-load-in-template')
+    def lazy_load_in_template():
+        users = db.session.query(User.id).filter(User.id.in_(ids)).all()
+        return render_template_string(
+            '{% for user in users %}\n{{ load(user.id).email }}\n{% endfor %}',
+            users=users, load=lambda id: db.session.query(User).filter(User.id == id).first(),
+        )
+
+    @app.route('/one-query')
+    def one_query():
+        return ','.join(email for email, in db.session.query(User.email).filter(User.id.in_(ids)).all())
+
+    return app
+
+
+def test_repeated_statements_raise_with_the_view_line(debug_app):
+    with pytest.raises(RepeatedQueriesError) as error:
+        debug_app.test_client().get('/one-query-per-id')
+
+    assert '10x SELECT "User".email' in str(error.value)
+    assert 'test_sql_debug.py' in str(error.value) and 'in <genexpr>()' in str(error.value)
+
+
+def test_repeated_statements_point_to_the_template_line(debug_app):
+    with pytest.raises(RepeatedQueriesError) as error:
+        debug_app.test_client().get('/lazy-load-in-template')
+
+    assert '10x from <template>:2' in str(error.value)
+
+
+def test_single_statement_passes(debug_app):
+    assert debug_app.test_client().get('/one-query').status_code == 200
+
+
+def test_metrics_and_debug_share_the_engine_listeners(debug_app):
+    from prometheus_client import REGISTRY
+    from sqlalchemy.engine import Engine
+    from src.base.helpers import metrics, sql_debug, sql_timing
+
+    assert metrics._record_statement in sql_timing._observers
+    assert sql_debug._inspect_statement in sql_timing._observers
+    # one timing listener on the engines for both
+    listeners = [fn for fn in Engine.dispatch.after_cursor_execute._clslevel[Engine] if fn.__module__.startswith('src.')]
+    assert listeners == [sql_timing._after_cursor_execute]
+
+    labels = {'blueprint': '', 'endpoint': 'one_query'}
+    before = REGISTRY.get_sample_value('http_request_sql_statements_sum', labels) or 0
+    assert debug_app.test_client().get('/one-query').status_code == 200
+    assert REGISTRY.get_sample_value('http_request_sql_statements_sum', labels) == before + 1
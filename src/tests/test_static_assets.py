@@ -0,0 +1,141 @@
+import gzip
+import os
+import time
+
+import pytest
+from flask import url_for
+
+from src.base.helpers.static_assets import StaticManifest, make_static_view
+from src.tests.benchmark import create_benchmark_app
+
+
+@pytest.fixture
+def static_app(tmp_path):
+    return create_benchmark_app(f"sqlite:///{tmp_path / 'test.sqlite3'}", {
+        'STATIC_FINGERPRINT': True,
+        'STATIC_PRECOMPRESSED': False,
+    })
+
+
+def test_fingerprint_goes_before_the_extension():
+    assert StaticManifest.fingerprint('fonts/Inter/Inter-Var.ttf', 'abc123') == 'fonts/Inter/Inter-Var.abc123.ttf'
+    assert StaticManifest.fingerprint('LICENSE', 'abc123') == 'LICENSE.abc123'
+
+
+def test_urls_carry_the_content_hash(static_app):
+    content_hash = StaticManifest.hash_file(f'{static_app.static_folder}/icons/microsoft.svg')
+
+    with static_app.test_request_context():
+        assert url_for('static', filename='icons/microsoft.svg') == f'/static/icons/microsoft.{content_hash}.svg'
+        assert url_for('auth.static', filename='default_user.jpg').startswith('/auth/static/default_user.')
+        # not a static file of the manifest
+        assert url_for('static', filename='missing.css') == '/static/missing.css'
+
+
+def test_hashed_urls_are_cached_forever(static_app):
+    client = static_app.test_client()
+    with static_app.test_request_context():
+        hashed_url, user_image_url = url_for('static', filename='icons/microsoft.svg'), url_for('auth.static', filename='default_user.jpg')
+
+    for url in (hashed_url, user_image_url):
+        response = client.get(url)
+        assert response.status_code == 200
+        assert response.headers['Cache-Control'] == f'public, max-age={365 * 24 * 3600}, immutable'
+    assert response.mimetype == 'image/jpeg'
+
+    # the plain url still works, without the immutable cache
+    plain = client.get('/static/icons/microsoft.svg')
+    assert plain.status_code == 200
+    assert plain.get_data() == client.get(hashed_url).get_data()
+    assert 'immutable' not in plain.headers.get('Cache-Control', '')
+
+    # a hash of another version of the file
+    assert client.get('/static/icons/microsoft.000000000000.svg').status_code == 404
+
+
+@pytest.fixture
+def assets_folder(tmp_path):
+    folder = tmp_path / 'assets'
+    (folder / 'css').mkdir(parents=True)
+    (folder / 'css' / 'site.css').write_text('body { color: red; }\n' * 100)
+    (folder / 'css' / 'site.css.gz').write_bytes(gzip.compress((folder / 'css' / 'site.css').read_bytes()))
+    (folder / 'css' / 'site.css.br').write_bytes(b'brotli bytes')
+    (folder / 'plain.txt').write_text('plain')
+    return folder
+
+
+def make_assets_app(tmp_path, folder, sendfile: str = 'wsgi'):
+    app = create_benchmark_app(f"sqlite:///{tmp_path / 'test.sqlite3'}", {
+        'STATIC_FINGERPRINT': False,
+        'STATIC_PRECOMPRESSED': True,
+        'STATIC_SENDFILE': sendfile,
+    })
+    manifest = StaticManifest.build({'assets': str(folder)})
+    app.add_url_rule('/assets/<path:filename>', 'assets', make_static_view(app, manifest, 'assets', str(folder)))
+    return app
+
+
+@pytest.mark.parametrize('accept_encoding, encoding', [
+    ('gzip, deflate, br', 'br'),
+    ('gzip;q=1.0, br;q=0.5', 'gzip'),
+    ('gzip', 'gzip'),
+    ('deflate', None),
+    (None, None),
+])
+def test_precompressed_sibling_choice(tmp_path, assets_folder, accept_encoding, encoding):
+    client = make_assets_app(tmp_path, assets_folder).test_client()
+    response = client.get('/assets/css/site.css', headers={'Accept-Encoding': accept_encoding} if accept_encoding else {})
+
+    assert response.status_code == 200
+    assert response.mimetype == 'text/css'
+    assert response.headers.get('Content-Encoding') == encoding
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert 'Content-Disposition' not in response.headers
+
+    body, source = response.get_data(), (assets_folder / 'css' / 'site.css').read_bytes()
+    if encoding == 'gzip':
+        assert gzip.decompress(body) == source
+    else:
+        assert body == (b'brotli bytes' if encoding == 'br' else source)
+
+
+def test_stale_siblings_and_plain_files(tmp_path, assets_folder):
+    # rebuilt after the last `flask assets compress`
+    source = assets_folder / 'css' / 'site.css'
+    source.write_text('body { color: blue; }\n' * 100)
+    os.utime(source, (time.time() + 10, time.time() + 10))
+
+    client = make_assets_app(tmp_path, assets_folder).test_client()
+    response = client.get('/assets/css/site.css', headers={'Accept-Encoding': 'gzip, br'})
+    assert 'Content-Encoding' not in response.headers
+    assert response.get_data() == source.read_bytes()
+
+    plain = client.get('/assets/plain.txt', headers={'Accept-Encoding': 'gzip'})
+    assert plain.get_data() == b'plain'
+    assert 'Accept-Encoding' not in plain.headers.get('Vary', '')
+    assert client.get('/assets/missing.css').status_code == 404
+
+
+def test_x_sendfile(tmp_path, assets_folder):
+    client = make_assets_app(tmp_path, assets_folder, sendfile='x-sendfile').test_client()
+    response = client.get('/assets/css/site.css', headers={'Accept-Encoding': 'gzip'})
+
+    assert response.headers['X-Sendfile'] == str(assets_folder / 'css' / 'site.css.gz')
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert response.get_data() == b''
+
+
+def test_x_accel_redirect(tmp_path):
+    app = create_benchmark_app(f"sqlite:///{tmp_path / 'accel.sqlite3'}", {
+        'STATIC_FINGERPRINT': False,
+        'STATIC_PRECOMPRESSED': True,
+        'STATIC_SENDFILE': 'x-accel-redirect',
+        'STATIC_X_ACCEL_LOCATION': '/_static_files/',
+    })
+    response = app.test_client().get('/static/icons/microsoft.svg')
+
+    # the nginx internal location aliases the src folder
+    assert response.headers['X-Accel-Redirect'] == '/_static_files/base/static/icons/microsoft.svg'
+    assert 'X-Sendfile' not in response.headers
+    assert response.mimetype == 'image/svg+xml'
+    assert response.get_data() == b''
@@ -0,0 +1,172 @@
+import pytest
+
+from src import db
+from src.modules.email.email_model import EmailOutbox
+from src.modules.email.email_service import EmailService
+from src.modules.user import user_service
+from src.modules.user.user_model import User
+from src.modules.user.user_service import UserService
+from src.tests.benchmark import create_benchmark_app, seed_users, ADMIN_EMAIL, ADMIN_PASSWORD, BENCHMARK_PASSWORD
+
+
+@pytest.fixture
+def bulk_app(tmp_path):
+    app = create_benchmark_app(f"sqlite:///{tmp_path / 'test.sqlite3'}", {'USER_BULK_MAX_IDS': 20})
+
+    @app.route('/csrf-token')
+    def csrf_token():
+        from flask_wtf.csrf import generate_csrf
+        return generate_csrf()
+
+    with app.app_context():
+        seed_users(db, 60)
+        db.session.remove()
+    return app
+
+
+@pytest.fixture
+def admin_client(bulk_app):
+    client = bulk_app.test_client()
+    assert client.post('/login', data={'email': ADMIN_EMAIL, 'password': ADMIN_PASSWORD}).status_code == 302
+    return client
+
+
+@pytest.fixture
+def invalidated(monkeypatch):
+    """
+    Recording the alternative_ids dropped from the user cache.
+    """
+    calls = []
+    original = user_service.UserCache.invalidate
+    monkeypatch.setattr(user_service.UserCache, 'invalidate', lambda *ids: (calls.extend(ids), original(*ids)))
+    return calls
+
+
+def waiting_users(app, limit: int = 5) -> list:
+    with app.app_context():
+        users = User.query.filter(User.role_id == 3, User.verified_time == None).limit(limit).all()
+        return [(user.id, user.alternative_id) for user in users]
+
+
+def users_version(app) -> int:
+    with app.app_context():
+        return UserService.get_version()[0]
+
+
+def test_bulk_verify_commits_everything_together(bulk_app, admin_client, invalidated):
+    users = waiting_users(bulk_app)
+    version = users_version(bulk_app)
+
+    response = admin_client.post('/users/bulk/verify', json={'ids': [id for id, _ in users]})
+    assert response.status_code == 200
+    assert response.json['succeeded'] == len(users) and response.json['failed'] == 0
+
+    with bulk_app.app_context():
+        verified = User.query.filter(User.id.in_([id for id, _ in users])).all()
+        assert all(user.activated and user.verified_time is not None for user in verified)
+        assert EmailOutbox.query.count() == len(users)
+    assert users_version(bulk_app) == version + 1
+    assert sorted(invalidated) == sorted(alternative_id for _, alternative_id in users)
+
+
+def test_bulk_verify_rolls_everything_back(bulk_app, admin_client, invalidated, monkeypatch):
+    users = waiting_users(bulk_app)
+    version = users_version(bulk_app)
+
+    def fail(emails, sender=None):
+        raise RuntimeError('outbox unavailable')
+    monkeypatch.setattr(EmailService, 'enqueue_many', staticmethod(fail))
+
+    response = admin_client.post('/users/bulk/verify', json={'ids': [id for id, _ in users]})
+    assert response.json['succeeded'] == 0 and response.json['failed'] == len(users)
+
+    # no verified user without its email, no version bump, the cache kept
+    with bulk_app.app_context():
+        assert User.query.filter(User.id.in_([id for id, _ in users]), User.verified_time != None).count() == 0
+        assert EmailOutbox.query.count() == 0
+    assert users_version(bulk_app) == version
+    assert invalidated == []
+
+
+def test_bulk_deactivate_spares_the_admins_and_revokes_the_sessions(bulk_app, admin_client, invalidated):
+    with bulk_app.app_context():
+        admin = User.query.filter(User.email == ADMIN_EMAIL).one()
+        envoys = User.query.filter(User.role_id == 3, User.activated == True).limit(3).all()
+        envoys = {user.id: user.alternative_id for user in envoys}
+        admin_id = admin.id
+
+    response = admin_client.post('/users/bulk/deactivate', data={'ids': ','.join(map(str, [admin_id, *envoys, 999999]))})
+    results = response.json['results']
+    assert results[str(admin_id)] == {'success': False, 'message': 'Cannot deactivate the admin user'}
+    assert results['999999']['success'] is False
+    assert all(results[str(id)] == {'success': True, 'message': 'Deactivated'} for id in envoys)
+
+    with bulk_app.app_context():
+        for user in User.query.filter(User.id.in_(envoys)).all():
+            assert not user.activated
+            assert user.alternative_id != envoys[user.id]
+    assert sorted(invalidated) == sorted(envoys.values())
+
+
+def test_bulk_activate_by_listing(bulk_app, admin_client):
+    with bulk_app.app_context():
+        disabled = User.query.filter(User.activated == False, User.verified_time != None).count()
+    assert disabled
+
+    response = admin_client.post('/users/bulk/activate', data={'filter': 'disabled'})
+    assert response.json['succeeded'] == min(disabled, 20)
+
+
+@pytest.mark.parametrize('data', [{'ids': 'a,b'}, {'ids': ','.join(map(str, range(1, 30)))}, {'filter': 'unknown'}, {}])
+def test_bulk_rejects_bad_targets(admin_client, data):
+    assert admin_client.post('/users/bulk/activate', data=data).status_code == 400
+
+
+@pytest.mark.parametrize('payload', [[1, 2], 12, 'ids', {'ids': '12'}, {'ids': [True]}, {'ids': [1.5]}, {'ids': [[1]]}, {'filter': ['active']}, {'ids': []}])
+def test_bulk_rejects_bad_json_payloads(admin_client, payload):
+    assert admin_client.post('/users/bulk/deactivate', json=payload).status_code == 400
+
+
+def test_bulk_requires_the_csrf_token(bulk_app, admin_client):
+    bulk_app.config['WTF_CSRF_ENABLED'] = True
+    id = waiting_users(bulk_app, limit=1)[0][0]
+
+    # a cross-site form post carries the session cookie, not the token
+    assert admin_client.post('/users/bulk/verify', data={'ids': str(id)}).status_code == 400
+    assert admin_client.post('/users/bulk/verify', json={'ids': [id]}, headers={'X-CSRFToken': 'forged'}).status_code == 400
+    with bulk_app.app_context():
+        assert User.query.filter(User.id == id, User.verified_time != None).count() == 0
+
+    token = admin_client.get('/csrf-token').get_data(as_text=True)
+    assert admin_client.post('/users/bulk/deactivate', data={'ids': '999999', 'csrf_token': token}).status_code == 200
+    response = admin_client.post('/users/bulk/verify', json={'ids': [id]}, headers={'X-CSRFToken': token})
+    assert response.json['succeeded'] == 1
+
+
+def test_activate_verifies_a_waiting_envoy(bulk_app, admin_client, invalidated):
+    from src.base.helpers.passwords import check_password
+
+    (id, alternative_id), = waiting_users(bulk_app, limit=1)
+    response = admin_client.post(f'/users/activate/{id}')
+    assert response.status_code == 302
+
+    with bulk_app.app_context():
+        user = db.session.get(User, id)
+        assert user.activated and user.verified_time is not None
+        email, = EmailOutbox.query.all()
+        assert email.recipients == user.email
+        assert user.full_name in email.html
+
+        # the password sent is the stored one
+        password = email.html.split('<h1>')[1].split('</h1>')[0]
+        assert check_password(user.password_hash, password)
+    assert alternative_id in invalidated
+
+
+def test_bulk_is_admin_only(bulk_app):
+    with bulk_app.app_context():
+        envoy = User.query.filter(User.role_id == 3, User.activated == True).first().email
+
+    client = bulk_app.test_client()
+    client.post('/login', data={'email': envoy, 'password': BENCHMARK_PASSWORD})
+    assert client.post('/users/bulk/deactivate', data={'ids': '1'}).status_code == 403
@@ -0,0 +1,117 @@
+import csv
+import io
+import json
+from collections import namedtuple
+from datetime import datetime
+
+import pytest
+from sqlalchemy import event
+
+from src import db
+from src.modules.user.user_export import UserExport
+from src.modules.user.user_model import User, Role
+from src.modules.user.user_service import UserService, USER_EXPORT_COLUMNS
+from src.tests.benchmark import create_benchmark_app, seed_users, ADMIN_EMAIL, ADMIN_PASSWORD
+
+Row = namedtuple('Row', ['id', 'email', 'first_name', 'created_time'])
+
+
+@pytest.fixture
+def export_app(db_app):
+    db.session.add_all([Role(name='Quản trị viên', code='admin'), Role(name='Người quản lý', code='manager'), Role(name='Đại sứ', code='envoy')])
+    for index in range(12):
+        user = User(email=f'envoy{index}@example.com', phone_number=f'09{index:08d}')
+        user.alternative_id = f'alternative-{index}'
+        user.first_name = f'Tuấn, "{index}"\nBVU'
+        user.role_id = 3
+        user.activated = index % 2 == 0
+        user.created_time = datetime(2022, 1, 1, 8, 30, index)
+        db.session.add(user)
+    db.session.commit()
+    return db_app
+
+
+def test_csv_chunks_quote_the_values(monkeypatch):
+    monkeypatch.setattr(UserExport, 'CHUNK_ROWS', 2)
+    rows = [Row(index, f'envoy{index}@example.com', 'Tuấn, "Anh"\nBVU', datetime(2022, 1, 1, 8, 30)) for index in range(5)]
+
+    chunks = [*UserExport.csv_chunks(iter(rows), [*Row._fields])]
+    # the header alone, then CHUNK_ROWS rows per chunk
+    assert chunks[0] == 'id,email,first_name,created_time\r\n'
+    assert len(chunks) == 4
+
+    parsed = [*csv.reader(io.StringIO(''.join(chunks)))]
+    assert parsed[0] == [*Row._fields]
+    assert parsed[1] == ['0', 'envoy0@example.com', 'Tuấn, "Anh"\nBVU', '2022-01-01 08:30:00']
+    assert len(parsed) == 6
+
+
+def test_csv_cells_are_not_read_as_formulas():
+    names = ['=HYPERLINK("http://evil.example","x")', '+cmd|\' /C calc\'!A0', '-2+3', '@SUM(A1)', '\t=1', '\r=1', 'Tuấn = BVU', '']
+    rows = [Row(index, f'envoy{index}@example.com', name, None) for index, name in enumerate(names)]
+
+    parsed = [*csv.reader(io.StringIO(''.join(UserExport.csv_chunks(iter(rows), [*Row._fields]))))][1:]
+    assert [row[2] for row in parsed] == ["'" + name for name in names[:6]] + ['Tuấn = BVU', '']
+    # the numbers are not text cells
+    assert parsed[0][0] == '0'
+
+
+def test_ndjson_chunks_write_one_object_per_line(export_app, monkeypatch):
+    monkeypatch.setattr(UserExport, 'CHUNK_ROWS', 5)
+    chunks = [*UserExport.ndjson_chunks(UserService.iter_export_rows())]
+    assert len(chunks) == 3
+    assert all(chunk.endswith('\n') for chunk in chunks)
+
+    lines = ''.join(chunks).splitlines()
+    assert len(lines) == 12
+    first = json.loads(lines[0])
+    assert [*first] == [column.key for column in USER_EXPORT_COLUMNS]
+    assert first['first_name'] == 'Tuấn, "0"\nBVU'
+    assert first['role'] == 'envoy'
+    assert first['created_time'] == '2022-01-01 08:30:00'
+    assert 'Tuấn' in lines[0] # not \u escaped
+
+
+def test_export_rows_are_streamed(export_app):
+    statements = []
+    capture = lambda conn, cursor, statement, parameters, context, executemany: statements.append(statement)
+
+    rows = UserService.iter_export_rows('active', chunk_size=4)
+    assert rows.load_options._yield_per == 4
+
+    event.listen(db.engine, 'before_cursor_execute', capture)
+    try:
+        chunks = UserExport.csv_chunks(rows, [column.key for column in USER_EXPORT_COLUMNS])
+        next(chunks)
+        # the header goes out before the query runs
+        assert statements == []
+        body = ''.join(chunks)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', capture)
+
+    assert len(statements) == 1
+    assert len([*csv.reader(io.StringIO(body))]) == 6
+
+
+def test_export_endpoint(tmp_path):
+    app = create_benchmark_app(f"sqlite:///{tmp_path / 'test.sqlite3'}")
+    with app.app_context():
+        seed_users(db, 30)
+        total = User.query.count()
+        db.session.remove()
+
+    client = app.test_client()
+    client.post('/login', data={'email': ADMIN_EMAIL, 'password': ADMIN_PASSWORD})
+
+    response = client.get('/users/export?format=ndjson')
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    assert response.headers['Content-Disposition'] == 'attachment; filename=users-all.ndjson'
+    assert len(response.get_data(as_text=True).splitlines()) == total
+
+    response = client.get('/users/export?format=csv&filter=active')
+    assert response.headers['Cache-Control'] == 'no-store'
+    assert response.get_data(as_text=True).startswith('id,email,')
+
+    assert client.get('/users/export?format=xml').status_code == 400
+    assert client.get('/users/export?filter=unknown').status_code == 400
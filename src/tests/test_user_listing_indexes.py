@@ -0,0 +1,81 @@
+import importlib.util
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
+from sqlalchemy import event
+
+from src import db
+from src.base.helpers.pagination import KeysetPagination
+from src.modules.user.user_model import User, Role
+from src.modules.user.user_service import UserService, USER_LISTINGS
+
+MIGRATION_PATH = Path(__file__).parents[2] / 'migrations/versions/8d4b6e0f2c17_add_user_listing_indexes.py'
+
+
+def load_migration():
+    spec = importlib.util.spec_from_file_location('add_user_listing_indexes', MIGRATION_PATH)
+    migration = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(migration)
+    return migration
+
+
+def seed_users(count: int = 200):
+    db.session.add_all([Role(name='Quản trị viên', code='admin'), Role(name='Người quản lý', code='manager'), Role(name='Đại sứ', code='envoy')])
+    started = datetime(2022, 1, 1)
+    for index in range(count):
+        user = User(email=f'envoy{index}@example.com', phone_number=f'09{index:08d}')
+        user.alternative_id = f'alternative-{index}'
+        user.role_id = 1 + index % 3
+        user.activated = index % 2 == 0
+        user.created_time = started + timedelta(minutes=index)
+        user.verified_time = started + timedelta(minutes=index) if index % 4 else None
+        db.session.add(user)
+    db.session.commit()
+
+
+def capture_listing_statements(listing: str):
+    """
+    Returning the (sql, params) of the first page and of a page after a cursor.
+    """
+    statements = []
+    capture = lambda conn, cursor, statement, parameters, context, executemany: statements.append((statement, parameters))
+
+    query, order_by = UserService.get_listing(listing)
+    event.listen(db.engine, 'before_cursor_execute', capture)
+    try:
+        first_page = KeysetPagination.paginate(query, order_by, per_page=5)
+        KeysetPagination.paginate(query, order_by, after=first_page.next_cursor, per_page=5)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', capture)
+    return statements
+
+
+def explain(statement: str, parameters) -> str:
+    connection = db.engine.raw_connection()
+    try:
+        rows = connection.cursor().execute(f'EXPLAIN QUERY PLAN {statement}', parameters).fetchall()
+        return '\n'.join(row[-1] for row in rows)
+    finally:
+        connection.close()
+
+
+@pytest.mark.parametrize('listing', USER_LISTINGS.keys())
+def test_listing_queries_use_the_migration_indexes(db_app, listing):
+    # rebuilding the listing indexes through the shipped migration
+    migration = load_migration()
+    with db.engine.begin() as connection:
+        with Operations.context(MigrationContext.configure(connection)):
+            migration.downgrade()
+            migration.upgrade()
+
+    seed_users()
+    statements = capture_listing_statements(listing)
+    assert len(statements) == 2
+
+    for statement, parameters in statements:
+        plan = explain(statement, parameters)
+        assert f'INDEX ix_User_listing_{listing}' in plan, plan
+        assert 'TEMP B-TREE' not in plan, plan
@@ -0,0 +1,108 @@
+import pytest
+
+from src import db
+from src.base.helpers.pagination import KeysetPagination
+from src.modules.user.user_model import User
+from src.modules.user.user_search import UserSearch, SQLiteFTS5UserSearch, PrefixLikeUserSearch, normalize_search_text, split_search_terms
+
+
+def add_user(index: int, last_name: str, first_name: str, email: str = None, phone_number: str = None) -> User:
+    user = User(email=email or f'envoy{index}@example.com', phone_number=phone_number or f'09{index:08d}')
+    user.alternative_id = f'alternative-{index}'
+    user.last_name, user.first_name = last_name, first_name
+    user.role_id = 3
+    db.session.add(user)
+    return user
+
+
+@pytest.fixture
+def search_app(db_app):
+    db_app.config.update(USER_SEARCH_BACKEND=None, USER_SEARCH_MAX_TERMS=5)
+    add_user(1, 'Nguyễn', 'Tuấn', email='tuan.nguyen@student.bvu.edu.vn', phone_number='0912345678')
+    add_user(2, 'Trần', 'Đạt', email='dat.tran@student.bvu.edu.vn', phone_number='0987654321')
+    add_user(3, 'Lê', 'Tú')
+    db.session.commit()
+    return db_app
+
+
+def search_ids(query_string: str) -> list:
+    query, order_by = UserSearch.search(query_string)
+    return [user.id for user in query.order_by(*KeysetPagination.order_clauses(order_by)).all()]
+
+
+def test_query_folding():
+    assert normalize_search_text('Nguyễn Tuấn Đạt') == 'nguyen tuan dat'
+    assert split_search_terms('  tuấn, "bvu"* OR-09 ', 5) == ['tuấn', 'bvu', 'OR', '09']
+    assert split_search_terms('a b c', 2) == ['a', 'b']
+
+
+def test_fts5_is_the_sqlite_backend(search_app):
+    assert UserSearch.get_backend() is SQLiteFTS5UserSearch
+    assert UserSearch.search(' -- ') is None
+
+
+@pytest.mark.parametrize('query_string, expected', [
+    ('Tuan', [1]),
+    ('tuấn', [1]),
+    ('dat', [2]),
+    ('Đạt', [2]),
+    ('nguyen tu', [1]),
+    ('tu', [1, 3]),
+])
+def test_names_match_without_accents(search_app, query_string, expected):
+    assert sorted(search_ids(query_string)) == expected
+
+
+@pytest.mark.parametrize('query_string, expected', [
+    ('dat.tran', [2]),
+    ('tuan.ng', [1]),
+    ('student.bvu', [1, 2]),
+    ('09123', [1]),
+    ('0987654321', [2]),
+])
+def test_email_and_phone_prefixes(search_app, query_string, expected):
+    assert sorted(search_ids(query_string)) == expected
+
+
+def test_triggers_follow_the_user_changes(search_app):
+    user = db.session.get(User, 3)
+    user.first_name, user.email = 'Hùng', 'hung.le@example.com'
+    db.session.commit()
+    assert search_ids('tu') == [1]
+    assert search_ids('hung') == [3]
+    assert search_ids('hung.le') == [3]
+
+    db.session.delete(db.session.get(User, 1))
+    db.session.commit()
+    assert search_ids('tuan') == []
+    assert search_ids('student') == [2]
+
+    add_user(4, 'Phạm', 'Tuấn')
+    db.session.commit()
+    assert search_ids('tuan') == [4]
+
+
+def test_cursors_walk_through_rank_ties(search_app):
+    # identical documents share the same bm25 rank
+    added = [add_user(index, 'Võ', 'Thành', email=f'thanh{index:02d}@example.com') for index in range(10, 23)]
+    db.session.commit()
+
+    query, order_by = UserSearch.search('thanh')
+    pages, page = [], KeysetPagination.paginate(query, order_by, per_page=5)
+    while True:
+        pages.extend(user.id for user in page)
+        if not page.has_next:
+            break
+        page = KeysetPagination.paginate(query, order_by, after=page.next_cursor, per_page=5)
+
+    assert sorted(pages) == sorted(user.id for user in added)
+    assert pages == search_ids('thanh')
+
+
+def test_like_backend(search_app):
+    search_app.config['USER_SEARCH_BACKEND'] = 'like'
+    assert UserSearch.get_backend() is PrefixLikeUserSearch
+    assert search_ids('tuấn') == [1]
+    assert search_ids('dat') == [2] # from the email: no accent folding on SQLite
+    assert search_ids('0987') == [2]
+
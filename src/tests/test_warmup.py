@@ -0,0 +1,69 @@
+import os
+
+import pytest
+from jinja2 import DictLoader, Environment
+from sqlalchemy import create_engine, event
+from sqlalchemy.pool import NullPool, QueuePool
+
+from src.base.helpers.warmup import AtomicBytecodeCache, compile_templates, open_db_connections
+
+TEMPLATES = {
+    'users.html': '{% for user in users %}<td>{{ user }}</td>{% endfor %}',
+    'email.txt': 'Hello {{ name }}',
+    'broken.html': '{% for user in users %}',
+    'script.js': 'not a template',
+}
+
+
+def make_env(cache_dir) -> Environment:
+    return Environment(loader=DictLoader(TEMPLATES), bytecode_cache=AtomicBytecodeCache(str(cache_dir)))
+
+
+def test_compile_templates_fills_the_caches(tmp_path):
+    env = make_env(tmp_path / 'bytecode')
+    failures = compile_templates(env)
+
+    assert [name for name, _ in failures] == ['broken.html']
+    assert {name for _, name in env.cache} == {'users.html', 'email.txt'}
+
+    files = os.listdir(tmp_path / 'bytecode')
+    assert len(files) == 2 and not any(name.endswith('.tmp') for name in files)
+
+    # an other worker loads the compiled code instead of compiling
+    other_env = make_env(tmp_path / 'bytecode')
+    other_env.compile = lambda *args, **kwargs: pytest.fail('compiled again')
+    assert other_env.get_template('users.html').render(users=[1]) == '<td>1</td>'
+
+
+def test_failed_dump_leaves_no_temporary_file(tmp_path):
+    cache = AtomicBytecodeCache(str(tmp_path))
+
+    class FailingBucket:
+        key = 'users'
+
+        def write_bytecode(self, file):
+            file.write(b'partial')
+            raise OSError('disk full')
+
+    with pytest.raises(OSError):
+        cache.dump_bytecode(FailingBucket())
+    assert os.listdir(tmp_path) == []
+
+
+def test_open_db_connections_fills_the_pool(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'pool.sqlite3'}", poolclass=QueuePool, pool_size=3)
+    assert open_db_connections(engine, 2) == 2
+    assert engine.pool.checkedin() == 2
+
+    # never more than the pool keeps
+    assert open_db_connections(engine, 10) == 3
+    assert engine.pool.checkedin() == 3
+
+
+def test_open_db_connections_skips_the_unpooled_engines(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'nopool.sqlite3'}", poolclass=NullPool)
+    connects = []
+    event.listen(engine, 'connect', lambda *args: connects.append(args))
+
+    assert open_db_connections(engine, 2) == 0
+    assert connects == []